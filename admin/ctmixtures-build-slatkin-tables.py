@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Builds exact Slatkin test tables for the sample sizes studied in an experiment configuration, and writes them
+to an .npz file which simulations load through SLATKIN_TABLE_PATH.  Sample sizes larger than --maxsize are
+skipped, and tests at those sizes continue to use Monte Carlo.
+
+"""
+
+import logging as log
+import argparse
+
+import ctmixtures.utils as utils
+import ctmixtures.analysis as analysis
+
+
+def setup():
+    global args, simconfig
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--debug", help="turn on debugging output")
+    parser.add_argument("--configuration", help="Configuration file for experiment", required=True)
+    parser.add_argument("--output", help="Path of the .npz file to write", required=True)
+    parser.add_argument("--maxsize", type=int, help="Largest sample size to tabulate, defaults to 50", default=50)
+
+    args = parser.parse_args()
+
+    simconfig = utils.MixtureConfiguration(args.configuration)
+
+    if args.debug == '1':
+        log.basicConfig(level=log.DEBUG, format='%(asctime)s %(levelname)s: %(message)s')
+    else:
+        log.basicConfig(level=log.INFO, format='%(asctime)s %(levelname)s: %(message)s')
+
+
+def main():
+    tables = analysis.SlatkinExactTables.build(simconfig.SAMPLE_SIZES_STUDIED, args.maxsize)
+    tables.save(args.output)
+    log.info("Wrote exact Slatkin tables for sample sizes %s to %s", tables.get_sample_sizes(), args.output)
+
+
+if __name__ == "__main__":
+    setup()
+    main()
@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Merges the SQLite files written by simulation runs with --storage sqlite (one per worker process) into a single
+file, which analytics/ctmixtures-export-data.py reads with --storage sqlite --storagepath.  Records already in the
+output file are skipped, so files can be merged in as further runs complete.
+
+"""
+
+import logging as log
+import argparse
+
+import ctmixtures.data as data
+
+
+def setup():
+    global args
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--debug", help="turn on debugging output")
+    parser.add_argument("--output", help="Path of the merged SQLite file", required=True)
+    parser.add_argument("files", nargs="+", help="SQLite files written by simulation runs")
+
+    args = parser.parse_args()
+
+    if args.debug == '1':
+        log.basicConfig(level=log.DEBUG, format='%(asctime)s %(levelname)s: %(message)s')
+    else:
+        log.basicConfig(level=log.INFO, format='%(asctime)s %(levelname)s: %(message)s')
+
+
+def main():
+    added = data.merge_sqlite_stores(args.output, args.files)
+    log.info("Merged %s records from %s files into %s", added, len(args.files), args.output)
+
+
+if __name__ == "__main__":
+    setup()
+    main()
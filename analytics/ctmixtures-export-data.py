@@ -8,9 +8,12 @@ import ming
 import csv
 import logging as log
 import argparse
+import multiprocessing
+import os
+import shutil
 import ctmixtures.data as data
-import ctmixtures.analysis as analysis
-import numpy as np
+from bson import json_util
+from collections import namedtuple, OrderedDict
 
 
 ############################################################################
@@ -21,10 +24,21 @@ def setup():
     parser.add_argument("--debug", help="turn on debugging output")
     parser.add_argument("--dbhost", help="database hostname, defaults to localhost", default="localhost")
     parser.add_argument("--dbport", help="database port, defaults to 27017", default="27017")
+    parser.add_argument("--storage", help="storage backend, defaults to mongodb", choices=[data.MONGODB, data.SQLITE], default=data.MONGODB)
+    parser.add_argument("--storagepath", help="SQLite file to export with --storage sqlite, merged from the simulation files by admin/ctmixtures-merge-sqlite.py")
     parser.add_argument("--configuration", help="Path to configuration file")
     parser.add_argument("--filename", help="path and base filename for exports (DO NOT include *.csv extension)", required=True)
+    parser.add_argument("--exports", help="comma separated list of files to export, from: %s; defaults to population,tasampled" % ",".join(exports.keys()), default="population,tasampled")
+    parser.add_argument("--full", action="store_true", help="rewrite each export file from every record, rather than appending the records stored since the file was last exported")
+    parser.add_argument("--processes", type=int, help="number of worker processes, each exporting a range of simulation run ids, defaults to 1", default=1)
 
     args = parser.parse_args()
+    if args.storage == data.SQLITE and args.storagepath is None:
+        parser.error("--storagepath is required with --storage sqlite")
+    args.exports = args.exports.split(",")
+    for name in args.exports:
+        if name not in exports:
+            parser.error("unknown export: %s" % name)
 
     if int(args.debug) == 1:
         log.basicConfig(level=log.DEBUG, format='%(asctime)s %(levelname)s: %(message)s')
@@ -36,35 +50,34 @@ def setup():
     data.set_experiment_name(args.experiment)
     data.set_database_hostname(args.dbhost)
     data.set_database_port(args.dbport)
-    config = data.getMingConfiguration(data.modules)
-    ming.configure(**config)
+    # Ming (and so a MongoDB server) is only needed when exporting records from MongoDB
+    if args.storage == data.MONGODB:
+        config = data.getMingConfiguration(data.modules)
+        ming.configure(**config)
+    data.configure_storage(args.storage, args.storagepath)
 
 
 
 ############################################################################
-def export_simulation_record():
+def simulation_record_columns():
     # ## Export a simulation record file, with all params and classes used, random
     ### seed, whatever is needed to replicate the simulations
-    full_filename = ''
-    full_filename += args.filename
-    full_filename += "-simulation-data.csv"
     sim_fields = data.mixture_model_stats.sim_record_columns_to_export()
-    ofile = open(full_filename, "wb")
-    writer = csv.DictWriter(ofile, fieldnames=sim_fields, quotechar='"', quoting=csv.QUOTE_ALL)
-    headers = dict((n, n) for n in sim_fields)
-    writer.writerow(headers)
-    cursor = data.MixtureModelStats.m.find(dict(), dict(timeout=False))
-    for sample in cursor:
-        row = dict()
-        for field in sim_fields:
-            row[field] = sample[field]
+    return sim_fields
 
-        # correct kandler_interval from timesteps to generations
-        row['kandler_interval'] = int(row['kandler_interval']) / int(row['population_size'])
 
-        #log.info("sim data row: %s", row)
-        writer.writerow(row)
-    ofile.close()
+def simulation_record_rows(sample):
+    rows = []
+    row = dict()
+    for field in simulation_record_columns():
+        row[field] = sample[field]
+
+    # correct kandler_interval from timesteps to generations
+    row['kandler_interval'] = int(row['kandler_interval']) / int(row['population_size'])
+
+    #log.info("sim data row: %s", row)
+    rows.append(row)
+    return rows
 
 
 
@@ -80,11 +93,8 @@ def export_simulation_record():
 # unlabeled_counts = Field([])
 # pop_richness = Field([int])
 
-def export_population_stats():
+def population_stats_columns():
     # ## Export a full population census statistics file ###
-    full_filename = ''
-    full_filename += args.filename
-    full_filename += "-population-data.csv"
     pop_fields = data.mixture_model_stats.pop_columns_to_export()
 
     # adjust the fields for the new summary statistics
@@ -114,91 +124,25 @@ def export_population_stats():
     #pop_fields.append('powerlaw_locus_mean')
     #pop_fields.append('powerlaw_locus_max')
     #pop_fields.append('config_powerlaw_exponent')
+    return pop_fields
 
 
-    ofile = open(full_filename, "wb")
-    writer = csv.DictWriter(ofile, fieldnames=pop_fields, quotechar='"', quoting=csv.QUOTE_ALL)
-    headers = dict((n, n) for n in pop_fields)
-    writer.writerow(headers)
-
-    cursor = data.MixtureModelStats.m.find(dict(), dict(timeout=False))
-    for sample in cursor:
-        row = dict()
-        row['simulation_run_id'] = sample['simulation_run_id']
-        row['model_class_label'] = sample['model_class_label']
-        row['num_trait_configurations'] = sample['num_trait_configurations']
-        row['configuration_slatkin'] = sample['configuration_slatkin']
-        row['innovation_rate'] = sample['innovation_rate']
-
-        # slatkin exact
-        slatkin_values = sample['slatkin_exact']
-        row['slatkin_locus_max'] = max(slatkin_values)
-        row['slatkin_locus_min'] = min(slatkin_values)
-        row['slatkin_locus_mean'] = np.average(slatkin_values)
-
-        # shannon entropy
-        entropy_list = sample['shannon_entropy']
-        row['entropy_locus_max'] = max(entropy_list)
-        row['entropy_locus_min'] = min(entropy_list)
-        row['entropy_locus_mean'] = np.average(entropy_list)
-
-        # IQV
-        iqv_list = sample['iqv_diversity']
-        row['iqv_locus_max'] = max(iqv_list)
-        row['iqv_locus_min'] = min(iqv_list)
-        row['iqv_locus_mean'] = np.average(iqv_list)
-
-        # Per-locus richness
-        richness_list = sample['pop_richness']
-        row['richness_locus_max'] = max(richness_list)
-        row['richness_locus_min'] = min(richness_list)
-        row['richness_locus_mean'] = np.average(richness_list)
-
-        # Kandler remaining per locus
-        kandler_list = sample['kandler_remaining_count']
-        row['kandler_locus_max'] = max(kandler_list)
-        row['kandler_locus_min'] = min(kandler_list)
-        row['kandler_locus_mean'] = np.average(kandler_list)
-
-        # Now calculate entropy and IQV from the trait configuration counts
-        freqlist = []
-        countlist = sample['trait_configuration_counts']
-        total = sum(countlist)
+def population_stats_rows(sample):
+    rows = []
+    row = dict()
+    row['simulation_run_id'] = sample['simulation_run_id']
+    row['model_class_label'] = sample['model_class_label']
+    row['num_trait_configurations'] = sample['num_trait_configurations']
+    row['configuration_slatkin'] = sample['configuration_slatkin']
+    row['innovation_rate'] = sample['innovation_rate']
 
-        for count in countlist:
-            freq = float(count) / float(total)
-            freqlist.append(freq)
+    # per-locus min, max, and mean of slatkin exact, entropy, IQV, richness, Kandler remaining, and Neiman's t_f,
+    # and entropy, IQV and Neiman's t_f of the trait configuration counts, computed when the record was stored
+    row.update(get_summary(sample, 'population_summary', data.get_population_summary))
 
-        row['config_entropy'] = analysis.diversity_shannon_entropy(freqlist)
-        row['config_iqv'] = analysis.diversity_iqv(freqlist)
-
-        # config_neiman_tf is easy since we have the frequency list
-
-        row['config_neiman_tf'] = analysis.neiman_tf(freqlist)
-
-        # Calculate Neiman's t_f statistic
-        # Neiman fields are (1 / sum(freq^2)) - 1
-        tflist = []
-        num_loci = int(sample['num_features'])
-
-        for locus in xrange(0, num_loci):
-            locus_freq_list = sample['unlabeled_frequencies'][locus]
-            tflist.append(analysis.neiman_tf(locus_freq_list))
-
-        row['neiman_tf_locus_max'] = max(tflist)
-        row['neiman_tf_locus_min'] = min(tflist)
-        row['neiman_tf_locus_mean'] = np.average(tflist)
-
-
-
-
-
-
-
-
-        #log.info("sim data row: %s", row)
-        writer.writerow(row)
-    ofile.close()
+    #log.info("sim data row: %s", row)
+    rows.append(row)
+    return rows
 
 ############################################################################
 # # results by sample size
@@ -213,11 +157,8 @@ def export_population_stats():
 # slatkin_ssize = Field(schema.Anything)
 # kandler_remaining_count = Field([int])
 
-def export_sampled_stats():
+def sampled_stats_columns():
     ## export a file with sampled statistics
-    full_filename = ''
-    full_filename += args.filename
-    full_filename += "-sampled-data.csv"
 
     sim_fields = data.mixture_model_stats.ssize_columns_to_export()
 
@@ -239,54 +180,22 @@ def export_sampled_stats():
     sim_fields.append('iqv_locus_mean')
     #sim_fields.append('config_entropy_ssize')    TODO
     #sim_fields.append('config_iqv_ssize')   TODO
+    return sim_fields
 
-    ofile = open(full_filename, "wb")
-    writer = csv.DictWriter(ofile, fieldnames=sim_fields, quotechar='"', quoting=csv.QUOTE_ALL)
-    headers = dict((n, n) for n in sim_fields)
-    writer.writerow(headers)
-    cursor = data.MixtureModelStats.m.find(dict(), dict(timeout=False))
 
-    for sample in cursor:
-        row = dict()
-        row['simulation_run_id'] = sample['simulation_run_id']
-        row['model_class_label'] = sample['model_class_label']
-        row['innovation_rate'] = sample['innovation_rate']
-
-        # all of the other fields require iterating over sample sizes.
-        ssizes = sample['sample_size']
-        #log.debug("ssizes: %s", ssizes)
-        for ssize in ssizes:
-            #log.debug("processing sample size: %s", ssize)
-            row['sample_size'] = ssize
-            row['config_slatkin_ssize'] = sample['config_slatkin_ssize'][str(ssize)]
-
-            config_cnt = sample['unlabeled_config_counts_ssize'][str(ssize)]
-            row['num_configurations_ssize'] = len(config_cnt)
-
-            richness_list = sample['richness_ssize'][str(ssize)]
-            row['richness_locus_min'] = min(richness_list)
-            row['richness_locus_max'] = max(richness_list)
-            row['richness_locus_mean'] = np.average(richness_list)
-
-            slatkin_list = sample['slatkin_ssize'][str(ssize)]
-            row['slatkin_locus_min'] = min(slatkin_list)
-            row['slatkin_locus_max'] = max(slatkin_list)
-            row['slatkin_locus_mean'] = np.average(slatkin_list)
-
-            entropy_list = sample['entropy_ssize'][str(ssize)]
-            row['entropy_locus_min'] = min(entropy_list)
-            row['entropy_locus_max'] = max(entropy_list)
-            row['entropy_locus_mean'] = np.average(entropy_list)
-
-            iqv_list = sample['iqv_ssize'][str(ssize)]
-            row['iqv_locus_min'] = min(iqv_list)
-            row['iqv_locus_max'] = max(iqv_list)
-            row['iqv_locus_mean'] = np.average(iqv_list)
-
-            #log.debug("sampled data row: %s", row)
-            writer.writerow(row)
+def sampled_stats_rows(sample):
+    rows = []
+    row = dict()
+    row['simulation_run_id'] = sample['simulation_run_id']
+    row['model_class_label'] = sample['model_class_label']
+    row['innovation_rate'] = sample['innovation_rate']
 
-    ofile.close()
+    # all of the other fields are summaries for each sample size, in the order of the sample sizes
+    for summary in get_summary(sample, 'sampled_summary', data.get_sampled_summary):
+        row.update(summary)
+        #log.debug("sampled data row: %s", row)
+        rows.append(dict(row))
+    return rows
 
 ############################################################################
 # # results for TA intervals over all sample sizes
@@ -306,12 +215,9 @@ def export_sampled_stats():
 #
 
 
-def export_ta_sampled_stats():
+def ta_sampled_stats_columns():
 
     ## export a file with sampled statistics
-    full_filename = ''
-    full_filename += args.filename
-    full_filename += "-tasampled-data.csv"
 
     sim_fields = data.mixture_model_stats.tassize_columns_to_export()
     sim_fields.append('innovation_rate')
@@ -340,121 +246,41 @@ def export_ta_sampled_stats():
     sim_fields.append('neiman_tf_locus_min_tassize')
     sim_fields.append('neiman_tf_locus_max_tassize')
     sim_fields.append('neiman_tf_locus_mean_tassize')
+    return sim_fields
 
 
-    ofile = open(full_filename, "wb")
-    writer = csv.DictWriter(ofile, fieldnames=sim_fields, quotechar='"', quoting=csv.QUOTE_ALL)
-    headers = dict((n, n) for n in sim_fields)
-    writer.writerow(headers)
-    cursor = data.MixtureModelStats.m.find(dict(), dict(timeout=False))
+def ta_sampled_stats_rows(sample):
+    rows = []
+    log.debug("sample %s", sample['simulation_run_id'])
+
+    # all of the other fields are summaries for each TA interval and sample size, ordered by interval
+    for summary in get_summary(sample, 'ta_sampled_summary', data.get_ta_sampled_summary):
+        row = dict()
+        row['simulation_run_id'] = sample['simulation_run_id']
+        row['model_class_label'] = sample['model_class_label']
+        row['innovation_rate'] = sample['innovation_rate']
+        row.update(summary)
+        #log.debug("sampled data row: %s", row)
+        rows.append(row)
+    return rows
 
-    for sample in cursor:
-        log.debug("sample %s", sample['simulation_run_id'])
-        # all of the other fields require iterating over sample sizes and TA intervals
-        # TODO TA interval isn't explicitly recorded in the database, so must infer
-        ssizes = sample['sample_size']
-        ta_intervals = sample['config_slatkin_ta_ssize'].keys()
-        num_loci = sample['num_features']
-
-        # first handle those statistics which do not have per-locus measurements
-        for tadur in ta_intervals:
-            for ssize in ssizes:
-                row = dict()
-                row['simulation_run_id'] = sample['simulation_run_id']
-                row['model_class_label'] = sample['model_class_label']
-                row['innovation_rate'] = sample['innovation_rate']
-                log.debug("Processing duration %s and ssize %s", tadur, ssize)
-                row['ta_duration'] = tadur
-                row['sample_size'] = ssize
-
-                row['config_slatkin_ta_ssize'] = sample['config_slatkin_ta_ssize'][str(tadur)][str(ssize)]
-                row['num_configurations_ta_ssize'] = sample['num_configurations_ta_ssize'][str(tadur)][str(ssize)]
-                row['config_iqv_ta_ssize'] = sample['config_iqv_ta_ssize'][str(tadur)][str(ssize)]
-                row['config_entropy_ta_ssize'] = sample['config_entropy_ta_ssize'][str(tadur)][str(ssize)]
-
-                # now handle statistics that have per-locus measurements
-                # The first set are screwed up and have the locus before the ssize, which makes processing them a pain in the butt
-
-                richness = sample['richness_ta_ssize'][str(tadur)]
-                richness_list = get_list_of_stats_for_locus_and_ssize(richness, ssize, num_loci)
-                row['richness_locus_min_tassize'] = min(richness_list)
-                row['richness_locus_max_tassize'] = max(richness_list)
-                row['richness_locus_mean_tassize'] = np.average(richness_list)
-
-                entropy = sample['entropy_ta_ssize'][str(tadur)]
-                entropy_list = get_list_of_stats_for_locus_and_ssize(entropy, ssize, num_loci)
-                row['entropy_locus_min_tassize'] = min(entropy_list)
-                row['entropy_locus_max_tassize'] = max(entropy_list)
-                row['entropy_locus_mean_tassize'] = np.average(entropy_list)
-
-                iqv = sample['iqv_ta_ssize'][str(tadur)]
-                iqv_list = get_list_of_stats_for_locus_and_ssize(iqv, ssize, num_loci)
-                row['iqv_locus_min_tassize'] = min(iqv_list)
-                row['iqv_locus_max_tassize'] = max(iqv_list)
-                row['iqv_locus_mean_tassize'] = np.average(iqv_list)
-
-                slatkin = sample['slatkin_ta_ssize'][str(tadur)]
-                slatkin_list = get_list_of_stats_for_locus_and_ssize(slatkin, ssize, num_loci)
-                row['slatkin_locus_min_tassize'] = min(slatkin_list)
-                row['slatkin_locus_max_tassize'] = max(slatkin_list)
-                row['slatkin_locus_mean_tassize'] = np.average(slatkin_list)
-                
-                # kandler is structured to have locus data last, which is the way I did sampled and it works well
-                # don't do it this way again!!
-                
-                kandler_list = sample['kandler_remaining_tassize'][str(tadur)][str(ssize)]
-                row['kandler_locus_min_tassize'] = min(kandler_list)
-                row['kandler_locus_max_tassize'] = max(kandler_list)
-                row['kandler_locus_mean_tassize'] = np.average(kandler_list)
-
-
-                # config neiman tf
-                config_count_map = sample['unlabeled_config_counts_ta_ssize'][str(tadur)][str(ssize)]
-                config_count_list = config_count_map.values()
-                total = sum(config_count_list)
-                config_freq_list = [(float(x)/float(total)) for x in config_count_list]
-                row['config_neiman_tf_tassize'] = analysis.neiman_tf(config_freq_list)
-
-                # neiman locus min, max, mean TODO
-                locus_freq = sample['unlabeled_freq_ta_ssize'][str(tadur)]
-                locus_tf_list = get_locus_stats_for_ssize(locus_freq, analysis.neiman_tf, ssize, num_loci)
-                row['neiman_tf_locus_min_tassize'] = min(locus_tf_list)
-                row['neiman_tf_locus_max_tassize'] = max(locus_tf_list)
-                row['neiman_tf_locus_mean_tassize'] = np.average(locus_tf_list)
-
-                #log.debug("sampled data row: %s", row)
-                writer.writerow(row)
-
-    ofile.close()
-
-
-def get_list_of_stats_for_locus_and_ssize(duration_map, ssize, num_loci):
-    vals = []
-    for locus in xrange(0, num_loci):
-        vals.append(duration_map[str(locus)][str(ssize)])
-    return vals
-
-def get_locus_stats_for_ssize(locus_map, stat_function, ssize, num_loci):
-    vals = []
-    for locus in xrange(0, num_loci):
-        locus_values = locus_map[str(locus)][str(ssize)]
-        log.debug("locus_values: %s", locus_values)
-        stat = stat_function(locus_values)
-        log.debug("stat: %s", stat)
-        vals.append(stat)
-    return vals
 
+def get_summary(sample, field, summarize):
+    """
+    Returns the summary statistics stored in a sample record, or for records stored before summaries were
+    computed at write time, computes them from the raw statistics with the same function.
+    """
+    if field in sample:
+        return sample[field]
+    return summarize(sample)
 
 
 ############################################################################
 # # misc exports
 
 
-def export_slatkin_locus_values():
+def slatkin_locus_values_columns():
     # ## Export a full population census statistics file ###
-    full_filename = ''
-    full_filename += args.filename
-    full_filename += "-pop-slatkin-locus-data.csv"
     pop_fields = []
 
     # adjust the fields for the new summary statistics
@@ -462,34 +288,27 @@ def export_slatkin_locus_values():
     pop_fields.append('model_class_label')
     pop_fields.append('innovation_rate')
     pop_fields.append('slatkin_locus_value')
+    return pop_fields
 
-    ofile = open(full_filename, "wb")
-    writer = csv.DictWriter(ofile, fieldnames=pop_fields, quotechar='"', quoting=csv.QUOTE_ALL)
-    headers = dict((n, n) for n in pop_fields)
-    writer.writerow(headers)
-
-    cursor = data.MixtureModelStats.m.find(dict(), dict(timeout=False))
-    for sample in cursor:
-        # slatkin exact
-        slatkin_values = sample['slatkin_exact']
 
-        for value in slatkin_values:
-            row = dict()
-            row['simulation_run_id'] = sample['simulation_run_id']
-            row['model_class_label'] = sample['model_class_label']
-            row['innovation_rate'] = sample['innovation_rate']
-            row['slatkin_locus_value'] = value
+def slatkin_locus_values_rows(sample):
+    rows = []
+    # slatkin exact
+    slatkin_values = sample['slatkin_exact']
 
-            #log.info("sim data row: %s", row)
-            writer.writerow(row)
+    for value in slatkin_values:
+        row = dict()
+        row['simulation_run_id'] = sample['simulation_run_id']
+        row['model_class_label'] = sample['model_class_label']
+        row['innovation_rate'] = sample['innovation_rate']
+        row['slatkin_locus_value'] = value
 
-    ofile.close()
+        #log.info("sim data row: %s", row)
+        rows.append(row)
+    return rows
 
-def export_richness_locus_values():
+def richness_locus_values_columns():
     # ## Export a full population census statistics file ###
-    full_filename = ''
-    full_filename += args.filename
-    full_filename += "-pop-richness-locus-data.csv"
     pop_fields = []
 
     # adjust the fields for the new summary statistics
@@ -497,44 +316,202 @@ def export_richness_locus_values():
     pop_fields.append('model_class_label')
     pop_fields.append('innovation_rate')
     pop_fields.append('richness_locus_value')
+    return pop_fields
 
-    ofile = open(full_filename, "wb")
-    writer = csv.DictWriter(ofile, fieldnames=pop_fields, quotechar='"', quoting=csv.QUOTE_ALL)
-    headers = dict((n, n) for n in pop_fields)
-    writer.writerow(headers)
-
-    cursor = data.MixtureModelStats.m.find(dict(), dict(timeout=False))
-    for sample in cursor:
-        # slatkin exact
-        richness_values = sample['pop_richness']
-
-        for value in richness_values:
-            row = dict()
-            row['simulation_run_id'] = sample['simulation_run_id']
-            row['model_class_label'] = sample['model_class_label']
-            row['innovation_rate'] = sample['innovation_rate']
-            row['richness_locus_value'] = value
 
-            #log.info("sim data row: %s", row)
-            writer.writerow(row)
+def richness_locus_values_rows(sample):
+    rows = []
+    # slatkin exact
+    richness_values = sample['pop_richness']
 
-    ofile.close()
+    for value in richness_values:
+        row = dict()
+        row['simulation_run_id'] = sample['simulation_run_id']
+        row['model_class_label'] = sample['model_class_label']
+        row['innovation_rate'] = sample['innovation_rate']
+        row['richness_locus_value'] = value
 
+        #log.info("sim data row: %s", row)
+        rows.append(row)
+    return rows
 
 
+############################################################################
+# # single pass export of all requested files
+
+# each export is a CSV file suffix, a function returning its columns, the fields of the simulation record it reads,
+# and a function returning its rows for a simulation record.  Exports of summary statistics read the summary
+# field stored with each record, and for records stored without one, the raw fields it is computed from.
+Export = namedtuple('Export', ['suffix', 'columns', 'record_fields', 'rows', 'summary_field', 'raw_fields'])
+
+exports = OrderedDict([
+    ('simulation', Export("-simulation-data.csv", simulation_record_columns,
+                          data.mixture_model_stats.sim_record_columns_to_export(), simulation_record_rows, None, [])),
+    ('population', Export("-population-data.csv", population_stats_columns,
+                          ['simulation_run_id', 'model_class_label', 'num_trait_configurations', 'configuration_slatkin',
+                           'innovation_rate', 'population_summary'], population_stats_rows, 'population_summary',
+                          ['slatkin_exact', 'shannon_entropy', 'iqv_diversity', 'pop_richness', 'kandler_remaining_count',
+                           'trait_configuration_counts', 'num_features', 'unlabeled_frequencies'])),
+    ('sampled', Export("-sampled-data.csv", sampled_stats_columns,
+                       ['simulation_run_id', 'model_class_label', 'innovation_rate', 'sampled_summary'],
+                       sampled_stats_rows, 'sampled_summary',
+                       ['sample_size', 'config_slatkin_ssize', 'unlabeled_config_counts_ssize', 'richness_ssize',
+                        'slatkin_ssize', 'entropy_ssize', 'iqv_ssize'])),
+    ('tasampled', Export("-tasampled-data.csv", ta_sampled_stats_columns,
+                         ['simulation_run_id', 'model_class_label', 'innovation_rate', 'ta_sampled_summary'],
+                         ta_sampled_stats_rows, 'ta_sampled_summary',
+                         ['sample_size', 'num_features', 'config_slatkin_ta_ssize', 'num_configurations_ta_ssize',
+                          'config_iqv_ta_ssize', 'config_entropy_ta_ssize', 'richness_ta_ssize', 'entropy_ta_ssize',
+                          'iqv_ta_ssize', 'slatkin_ta_ssize', 'kandler_remaining_tassize',
+                          'unlabeled_config_counts_ta_ssize', 'unlabeled_freq_ta_ssize'])),
+    ('slatkinlocus', Export("-pop-slatkin-locus-data.csv", slatkin_locus_values_columns,
+                            ['simulation_run_id', 'model_class_label', 'innovation_rate', 'slatkin_exact'],
+                            slatkin_locus_values_rows, None, [])),
+    ('richnesslocus', Export("-pop-richness-locus-data.csv", richness_locus_values_columns,
+                             ['simulation_run_id', 'model_class_label', 'innovation_rate', 'pop_richness'],
+                             richness_locus_values_rows, None, [])),
+])
+
+
+def write_csv_files(names, filename, write_headers=True, append=False, run_id_range=None, insertion_range=None):
+    """
+    Writes the CSV file for each of the named exports, in one pass over the simulation records, reading only
+    the record fields which those exports use, and handing each record to every export in turn.  Records stored
+    without summary statistics are read again for the raw fields, from which the summaries are computed.  If
+    run_id_range or insertion_range are given, only records in those ranges (see data.find_documents()) are
+    exported.  If append is True, rows are added to the end of existing files.  Returns the paths written.
+    """
+    selected = [exports[name] for name in names]
+    record_fields = set()
+    summary_fields = set()
+    raw_fields = set()
+    paths = []
+    files = []
+    writers = []
+    for export in selected:
+        columns = export.columns()
+        paths.append(filename + export.suffix)
+        ofile = open(paths[-1], "ab" if append else "wb")
+        writer = csv.DictWriter(ofile, fieldnames=columns, quotechar='"', quoting=csv.QUOTE_ALL)
+        if write_headers and not append:
+            headers = dict((n, n) for n in columns)
+            writer.writerow(headers)
+        files.append(ofile)
+        writers.append(writer)
+        record_fields.update(export.record_fields)
+        if export.summary_field is not None:
+            summary_fields.add(export.summary_field)
+            raw_fields.update(export.raw_fields)
+
+    cursor = data.find_documents(data.MixtureModelStats, sorted(record_fields), run_id_range, insertion_range)
+    for sample in cursor:
+        if not summary_fields.issubset(sample):
+            sample.update(data.find_document(data.MixtureModelStats, sample['_id'], sorted(raw_fields)))
+        for export, writer in zip(selected, writers):
+            writer.writerows(export.rows(sample))
+
+    for ofile in files:
+        ofile.close()
+    return paths
+
+
+def export_shard(task):
+    # runs in a worker process, writing headerless part files for one range of simulation run ids
+    (names, shard, run_id_range, insertion_range) = task
+    log.debug("Exporting shard %s: %s", shard, run_id_range)
+    return write_csv_files(names, "%s-part%s" % (args.filename, shard), False, False, run_id_range, insertion_range)
+
+
+def export_records(names, processes, insertion_range, append):
+    """
+    Writes the CSV file for each of the named exports, from the records in insertion_range.  With more than one
+    process, the simulation records are split into ranges of simulation_run_id, each range is exported by a
+    worker process, and the parts are concatenated in range order, so the output does not depend on the order
+    in which the workers finish.
+    """
+    if processes <= 1:
+        write_csv_files(names, args.filename, True, append, None, insertion_range)
+        return
+
+    run_id_ranges = data.get_run_id_ranges(data.MixtureModelStats, processes)
+    pool = multiprocessing.Pool(processes)
+    try:
+        shard_paths = pool.map(export_shard, [(names, shard, run_id_range, insertion_range)
+                                              for shard, run_id_range in enumerate(run_id_ranges)])
+    finally:
+        pool.close()
+        pool.join()
+
+    for i, name in enumerate(names):
+        columns = exports[name].columns()
+        ofile = open(args.filename + exports[name].suffix, "ab" if append else "wb")
+        if not append:
+            writer = csv.DictWriter(ofile, fieldnames=columns, quotechar='"', quoting=csv.QUOTE_ALL)
+            headers = dict((n, n) for n in columns)
+            writer.writerow(headers)
+        for paths in shard_paths:
+            with open(paths[i], "rb") as part:
+                shutil.copyfileobj(part, ofile)
+            os.remove(paths[i])
+        ofile.close()
+
+
+def get_watermark_path(name):
+    return args.filename + exports[name].suffix + ".watermark"
+
+
+def read_watermark(name):
+    """
+    Returns the insertion watermark of the last record in an export file, as recorded when it was exported, or
+    None if the file must be exported from every record.
+    """
+    path = get_watermark_path(name)
+    if not os.path.exists(path) or not os.path.exists(args.filename + exports[name].suffix):
+        return None
+    with open(path) as wfile:
+        recorded = json_util.loads(wfile.read())
+    if recorded['storage'] != data.get_storage_label():
+        log.info("%s was exported from %s, exporting every record", name, recorded['storage'])
+        return None
+    return recorded['watermark']
+
+
+def write_watermark(name, watermark):
+    with open(get_watermark_path(name), "w") as wfile:
+        wfile.write(json_util.dumps(dict(storage=data.get_storage_label(), watermark=watermark)))
+
+
+def export_data(names, processes=1, full=False):
+    """
+    Writes the CSV file for each of the named exports.  Each file's insertion watermark (see
+    data.get_insertion_watermark()) is recorded next to it, and unless full is True, records stored since the
+    last export are appended to the file, rather than the file being rewritten.  Files whose watermarks differ
+    (e.g., one not exported before) are exported in separate passes.  With MongoDB, records stored in the last
+    data.INSERTION_WATERMARK_LAG seconds are left for the next export (see data.get_insertion_watermark()).
+    """
+    upper = data.get_insertion_watermark(data.MixtureModelStats)
+    groups = OrderedDict()
+    for name in names:
+        lower = None if full else read_watermark(name)
+        groups.setdefault(lower, []).append(name)
+
+    for lower, group in groups.items():
+        # with MongoDB, an exporter whose clock was set back can take a watermark below the last one
+        if lower is not None and lower >= upper:
+            log.info("No records stored since the last export of %s", ",".join(group))
+            continue
+        log.info("Exporting %s %s", ",".join(group), "in full" if lower is None else "from watermark %s" % lower)
+        export_records(group, processes, (lower, upper), lower is not None)
+        if upper is not None:
+            for name in group:
+                write_watermark(name, upper)
 
 
 ############################################################################
 
 if __name__ == "__main__":
     setup()
-    #export_simulation_record()
-    export_population_stats()
-    #export_sampled_stats()
-    export_ta_sampled_stats()
-
-    #export_slatkin_locus_values()
-    #export_richness_locus_values()
+    export_data(args.exports, args.processes, args.full)
 
 
 
@@ -14,3 +14,15 @@ from ctmixtures.analysis.overlap import (calc_overlap_locusallele, calc_overlap_
 from ctmixtures.analysis.descriptive_stats import (PopulationTraitAnalyzer, SampledTraitAnalyzer,
                                                    TimeAveragedPopulationTraitAnalyzer, TimeAveragedSampledTraitAnalyzer,
                                                     diversity_iqv, diversity_shannon_entropy, neiman_tf)
+from ctmixtures.analysis.diversity import (padded_matrix, frequency_matrix, batch_richness, batch_sum_squares,
+                                           batch_shannon_entropy, batch_iqv, batch_neiman_tf, batch_diversity)
+from ctmixtures.analysis.rarefaction import (RarefactionTraitAnalyzer, TimeAveragedRarefactionTraitAnalyzer, rarefy,
+                                             expected_richness, expected_entropy, expected_sum_squares, log_gamma,
+                                             rarefy_statistic_arrays, expected_richness_array)
+from ctmixtures.analysis.subsampling import sample_count_matrix, sample_counters, get_sampled_counter
+from ctmixtures.analysis.statistic_array import StatisticArray
+from ctmixtures.analysis.time_averaging import PiecewiseConstantTimeAverager
+from ctmixtures.analysis.slatkin_cache import SlatkinResultCache, configure_slatkin_cache, get_slatkin_cache
+from ctmixtures.analysis.slatkin_montecarlo import (configure_slatkin_montecarlo, adaptive_montecarlo, slatkin_test,
+                                                    wilson_half_width, precompute_slatkin_tests)
+from ctmixtures.analysis.slatkin_tables import SlatkinExactTables, configure_slatkin_tables, get_slatkin_tables
@@ -10,10 +10,12 @@ Description here
 
 import logging as log
 from collections import defaultdict
-import slatkin
 import random
-import math as m
-import pytransmission.utils as ptu
+from ctmixtures.analysis.slatkin_montecarlo import slatkin_test
+from ctmixtures.analysis.subsampling import sample_counters
+from ctmixtures.analysis.statistic_array import StatisticArray, INTERVAL, LOCUS, SSIZE
+from ctmixtures.analysis.diversity import (batch_shannon_entropy, batch_iqv, batch_sum_squares, batch_neiman_tf,
+                                           batch_richness)
 
 
 
@@ -25,56 +27,67 @@ import pytransmission.utils as ptu
 
 #################################################################################
 
-def convert_keys_to_string(dictionary):
-    """Recursively converts dictionary keys to strings."""
-    if not isinstance(dictionary, dict):
-        return dictionary
-    return dict((str(k), convert_keys_to_string(v))
-        for k, v in dictionary.items())
+def labeled_counts(counter, scale=1):
+    """
+    Returns a count map with its keys (traits or configurations) as strings, as stored in the database, and its
+    values divided by scale, if given (e.g., to convert counts to frequencies).
+    """
+    if scale == 1:
+        return dict((str(key), count) for key, count in counter.items())
+    scale = float(scale)
+    return dict((str(key), count / scale) for key, count in counter.items())
 
 def slatkin_exact_test(count_list):
-    (prob, theta) = slatkin.montecarlo(100000, count_list, len(count_list))
-    #log.debug("slatkin prob: %s  theta: %s", prob, theta)
-    return prob
+    """
+    Returns a tuple (probability, replicates) for the Slatkin exact test on a list of counts, where replicates
+    is the number of Monte Carlo replicates behind the estimate, or zero if exact tables answered the test.
+    """
+    # fixed or adaptive Monte Carlo, as configured, memoized on the sorted count vector
+    (prob, theta, reps) = slatkin_test(count_list)
+    return (prob, reps)
 
 
-def diversity_shannon_entropy(freq_list):
-    k = len(freq_list)
-    sw = 0.0
-    for i in range(0, k):
-        sw += freq_list[i] * m.log(freq_list[i])
-    if sw == 0:
-        return 0.0
-    else:
-        return sw * -1.0
+def slatkin_statistic_arrays(axes, keyed_count_lists):
+    """
+    Runs the Slatkin exact test on each (key, count list) pair, and returns a tuple of StatisticArrays over
+    axes, (probabilities, replicates).
+    """
+    prob_items = []
+    rep_items = []
+    for key, count_list in keyed_count_lists:
+        (prob, reps) = slatkin_exact_test(count_list)
+        prob_items.append((key, prob))
+        rep_items.append((key, reps))
+    return (StatisticArray.from_items(axes, prob_items), StatisticArray.from_items(axes, rep_items))
 
 
-def diversity_iqv(freq_list):
-    k = len(freq_list)
+# the scalar statistics are single-row calls to the batch kernels in ctmixtures.analysis.diversity; callers with
+# many frequency lists (loci, sample sizes, records) should call the kernels directly
 
-    if k <= 1:
-        return 0.0
+def diversity_shannon_entropy(freq_list):
+    return float(batch_shannon_entropy([freq_list])[0])
 
-    isum = 1.0 - _sum_squares(freq_list)
-    factor = float(k) / (float(k) - 1.0)
-    iqv = factor * isum
 
-    #logger.debug("k: %s  isum: %s  factor: %s  iqv:  %s", k, isum, factor, iqv)
-    return iqv
+def diversity_iqv(freq_list):
+    return float(batch_iqv([freq_list])[0])
 
 
 def _sum_squares(freq_list):
-    ss = 0.0
-    for p in freq_list:
-        ss += p ** 2.0
-    return ss
+    return float(batch_sum_squares([freq_list])[0])
+
 
 def neiman_tf(count_list):
-    tfsum = 0
-    for val in count_list:
-        tfsum += float(val)**2
-    tf = (1.0 / tfsum) - 1.0
-    return tf
+    return float(batch_neiman_tf([count_list])[0])
+
+
+def batch_statistic_array(kernel, axes, keys, rows):
+    """
+    Evaluates a batch kernel over a list of rows in one call, and returns the values as a StatisticArray,
+    where each key is a tuple of labels, one for each of the named axes.
+    """
+    if len(rows) == 0:
+        return StatisticArray.from_items(axes, [])
+    return StatisticArray.from_items(axes, zip(keys, kernel(rows).tolist()))
 
 
 #################################################################################
@@ -96,11 +109,12 @@ class PopulationTraitAnalyzer(object):
 
     def __init__(self, model):
         self.model = model
-        self.total_traits = model.agentgraph.number_of_nodes()
+        self.total_traits = model.get_population_size()
 
         # snapshots for calculating trait survival between two points or intervals
         self._snapshot_one = dict()
         self._snapshot_two = dict()
+        self.slatkin_replicates = dict()
 
     def __getattr__(self, name):
         """
@@ -138,29 +152,23 @@ class PopulationTraitAnalyzer(object):
         """
         Returns the number of traits with non-zero frequencies
         """
-        richness = []
-        for locus in self.freq:
-            richness.append(len([freq for freq in locus.values() if freq > 0]))
-        return richness
+        return batch_richness([locus.values() for locus in self.freq]).tolist()
 
     def get_trait_evenness_entropy(self):
-        entropy = []
-        for locus in self.freq:
-            entropy.append(diversity_shannon_entropy(locus.values()))
-        return entropy
+        return batch_shannon_entropy([locus.values() for locus in self.freq]).tolist()
 
     def get_trait_evenness_iqv(self):
-        iqv = []
-        for locus in self.freq:
-            iqv.append(diversity_iqv(locus.values()))
-        return iqv
+        return batch_iqv([locus.values() for locus in self.freq]).tolist()
 
     def get_slatkin_exact_probability(self):
         slatkin = []
+        replicates = []
         for locus in self.counts:
             cnt = sorted(locus.values(), reverse=True)
-            #log.info("cnt: %s", cnt)
-            slatkin.append(slatkin_exact_test(cnt))
+            (prob, reps) = slatkin_exact_test(cnt)
+            slatkin.append(prob)
+            replicates.append(reps)
+        self.slatkin_replicates['slatkin_exact'] = replicates
         return slatkin
 
     def get_unlabeled_frequency_lists(self):
@@ -190,37 +198,35 @@ class PopulationTraitAnalyzer(object):
 
     def get_configuration_slatkin_test(self):
         config = self.get_unlabeled_configuration_counts()
-        return slatkin_exact_test(config)
+        (prob, reps) = slatkin_exact_test(config)
+        self.slatkin_replicates['configuration_slatkin'] = reps
+        return prob
 
-    def update(self, timestep):
-        nf = self.model.simconfig.num_features
-        self.counts = None
-        self.freq = None
-        self.culture_counts = None
-
-        #spectra = dict()  # spectra will be locus as key, value will be dicts of popcount, numtraits
-        self.counts = []  # counts will be locus as index to list, each list position is dict with key=trait, value=count
-        self.freq = []  # frequencies will be locus as index to list, each list position is dict with key=trait, value=freq
-        self.culture_counts = defaultdict(int)
-
-        # set up data structures for counts and frequencies
-        for i in xrange(0, nf):
-            self.counts.append(defaultdict(int))
-            self.freq.append(defaultdict(int))
-
-        total = self.model.agentgraph.number_of_nodes()
-
-        for agent_id in self.model.agentgraph.nodes():
-            agent_traits = self.model.agentgraph.node[agent_id]['agent'].traits
-            culture = self.model.get_traits_packed(agent_traits)
-            self.culture_counts[culture] += 1
-            for i in xrange(0, nf):
-                self.counts[i][agent_traits[i]] += 1
+    def get_slatkin_replicates(self):
+        """
+        Returns the number of Monte Carlo replicates behind each Slatkin statistic computed since the last
+        update(), in a dict keyed by the statistic's field in the stored record, and shaped like the statistic.
+        """
+        return self.slatkin_replicates
+
+    @property
+    def freq(self):
+        """
+        Frequencies of the traits at each locus (a list indexed by locus, of dicts of trait:frequency), computed
+        from the counts when a statistic asks for them, rather than on every update().
+        """
+        total = float(self.model.get_population_size())
+        return [dict((trait, float(count) / total) for trait, count in locus.iteritems()) for locus in self.counts]
 
-        for i in xrange(0, nf):
-            cnt = self.counts[i]
-            for trait,count in cnt.items():
-                self.freq[i][trait] = float(count) / float(total)
+    def update(self, timestep):
+        # the population maintains per-locus trait counts and configuration counts as traits are copied and
+        # innovated, so we keep references to those live counts, rather than copying them (or scanning every
+        # agent) on every update.  counts is a list indexed by locus, of dicts of trait:count, and like
+        # culture_counts, reflects the population until it next changes, so statistics are read right after
+        # update().  Neither is modified by the analyzer.
+        self.counts = self.model.get_locus_trait_counts()
+        self.culture_counts = self.model.get_configuration_counts()
+        self.slatkin_replicates = dict()
 
 
     def kandler_survival_start(self, timestep):
@@ -268,6 +274,42 @@ class PopulationTraitAnalyzer(object):
 
 #################################################################################
 
+def record_time_averaged_counts(analyzer, timestep):
+    """
+    Passes the counts from an analyzer's most recent update() to each of its time averagers whose intervals
+    include timestep.  Time averagers which record count changes (e.g., PiecewiseConstantTimeAverager) are
+    given a full sample the first time, and thereafter only the changes journaled by the population since
+    the previous update, so no count map is built or copied on the ticks in between.  Other time averagers
+    are given a copy of the full counts on every tick, since they may keep the maps they are given.  The
+    analyzer reads the journal through its own position, so other analyzers of the same population do not
+    take its changes.
+    """
+    model = analyzer.model
+    changes = model.drain_trait_change_journal(analyzer)
+
+    # if the timestep is within the intervals of any of the timeaverager objects, we record
+    # both trait counts for all loci/dimensions, and the intersected configurations/cultures/class counts
+    for tatracker in analyzer.ta_trackers:
+        if not tatracker.is_within_intervals(timestep):
+            continue
+        records_changes = getattr(tatracker, 'records_trait_count_changes', False)
+        if records_changes and tatracker.is_started():
+            tatracker.record_trait_count_changes(timestep, changes)
+            continue
+
+        # The TA trackers expect a map with loci as keys, and dicts as values, where the value
+        # dicts are dicts of trait:count. The original pop/sample trait analyzers keep a list
+        # of dicts, where locus is implicit in the list position.
+        if records_changes:
+            # the tracker copies the counts it starts from, and follows the journal from here on
+            tatracker.record_trait_count_sample(timestep, dict(enumerate(analyzer.counts)), analyzer.culture_counts)
+            if changes is None:
+                model.enable_trait_change_journal(analyzer)
+        else:
+            countmap = dict((locus, dict(counts)) for locus, counts in enumerate(analyzer.counts))
+            tatracker.record_trait_count_sample(timestep, countmap, dict(analyzer.culture_counts))
+
+
 class TimeAveragedPopulationTraitAnalyzer(PopulationTraitAnalyzer):
     """
     Decorates a normal PopulationTraitAnalyzer class with additional tracking of
@@ -294,6 +336,8 @@ class TimeAveragedPopulationTraitAnalyzer(PopulationTraitAnalyzer):
         self.ta_trackers.append(ending_timeaverager)
         self.ending_ta = ending_timeaverager
         self.starting_ta = starting_timeaverager
+        # statistics computed from the time averagers, cached between updates
+        self.ta_report = None
 
     def __getattr__(self, name):
         """
@@ -311,176 +355,122 @@ class TimeAveragedPopulationTraitAnalyzer(PopulationTraitAnalyzer):
     # decorate update from the superclass to pass its results to the list of time averaging objects
     def update(self, timestep):
         super(TimeAveragedPopulationTraitAnalyzer, self).update(timestep)
+        record_time_averaged_counts(self, timestep)
+        self.ta_report = None
 
-        # The TA trackers expect a map with loci as keys, and dicts as values, where the value
-        # dicts are dicts of trait:count. The original pop/sample trait analyzers keep a list
-        # of dicts, where locus is implicit in the list position.  TODO:  commensurate data structures in the population analyzer & tatracker
-        locus = 0
-        countmap = dict()
-        for locus_map in self.counts:
-            countmap[locus] = locus_map
-            locus += 1
-
-
-        # if the timestep is within the intervals of any of the timeaverager objects, we record
-        # both trait counts for all loci/dimensions, and the intersected configurations/cultures/class counts
-        for tatracker in self.ta_trackers:
-            if tatracker.is_within_intervals(timestep):
-                # pass the count map to the tracker
-                tatracker.record_trait_count_sample(timestep,countmap,self.culture_counts)
 
+    def compute_ta_report(self):
+        """
+        Walks the time averaged counts once, and computes every time averaged statistic together, in the
+        formats returned by the get_ta_* methods (which read from the report).  The report is cached until
+        the next call to update().
 
+        :return: dict of statistic name:StatisticArray over (interval, locus) or (interval)
+        """
+        if self.ta_report is not None:
+            return self.ta_report
 
-    def get_ta_trait_frequencies(self):
         counts = self.ending_ta.get_counts_for_generation_intervals()
+        start_counts = self.starting_ta.get_counts_for_generation_intervals()
+        config_counts = self.ending_ta.get_configuration_counts_for_generation_intervals()
         # we use the measured, not configured population size in case we do population dynamics
-        popsize = self.model.agentgraph.number_of_nodes()
-        freqmap = dict()
+        popsize = self.model.get_population_size()
+
+        trait_counts = []
+        freqmap = []
+        freq_lists = []
+        count_lists = []
+        richness = []
+        remaining = []
+        keys = []
+        rows = []
         for interval, counts_by_locus in counts.items():
-            locimap = dict()
+            scale = float(popsize ** 2) * float(interval)
             # the value of the dict for each locus should be a Counter
             for locus, counter in counts_by_locus.items():
-                locusmap = dict()
-                for trait, cnt in counter.items():
-                    freq = float(cnt) / (float(popsize ** 2) * float(interval))
-                    locusmap[trait] = freq
-                locimap[locus] = locusmap
-            freqmap[interval] = locimap
-        #log.debug("ending TA frequency map: %s", freqmap)
-        return convert_keys_to_string(freqmap)
+                locusmap = labeled_counts(counter, scale)
+                trait_counts.append(((interval, locus), labeled_counts(counter)))
+                freqmap.append(((interval, locus), locusmap))
+                freq_lists.append(((interval, locus), sorted(locusmap.values(), reverse=True)))
+                count_lists.append(((interval, locus), counter.values()))
+                richness.append(((interval, locus), len([count for count in counter.values() if count > 0])))
+                if len(counter) > 0:
+                    keys.append((interval, locus))
+                    rows.append(locusmap.values())
+
+        for interval, counts_by_locus in start_counts.items():
+            for locus, start_counter in counts_by_locus.items():
+                remaining_set = start_counter & counts[interval][locus]
+                remaining.append(((interval, locus), len(remaining_set)))
+
+        self.ta_report = dict(
+            trait_counts=StatisticArray.from_items((INTERVAL, LOCUS), trait_counts),
+            trait_frequencies=StatisticArray.from_items((INTERVAL, LOCUS), freqmap),
+            unlabeled_frequency_lists=StatisticArray.from_items((INTERVAL, LOCUS), freq_lists),
+            unlabeled_count_lists=StatisticArray.from_items((INTERVAL, LOCUS), count_lists),
+            trait_richness=StatisticArray.from_items((INTERVAL, LOCUS), richness),
+            trait_evenness_entropy=batch_statistic_array(batch_shannon_entropy, (INTERVAL, LOCUS), keys, rows),
+            trait_evenness_iqv=batch_statistic_array(batch_iqv, (INTERVAL, LOCUS), keys, rows),
+            configuration_counts=StatisticArray.from_items((INTERVAL,), [((interval,), labeled_counts(ccounts))
+                                                                         for interval, ccounts in config_counts.items()]),
+            number_configurations=StatisticArray.from_items((INTERVAL,), [((interval,), len(ccounts))
+                                                                          for interval, ccounts in config_counts.items()]),
+            configuration_count_lists=StatisticArray.from_items((INTERVAL,),
+                                                                [((interval,), sorted(ccounts.values(), reverse=True))
+                                                                 for interval, ccounts in config_counts.items()]),
+            kandler_remaining=StatisticArray.from_items((INTERVAL, LOCUS), remaining)
+        )
+        return self.ta_report
+
+
+    def get_ta_trait_frequencies(self):
+        return self.compute_ta_report()['trait_frequencies']
 
 
     def get_ta_trait_counts(self):
-        return convert_keys_to_string(self.ending_ta.get_counts_for_generation_intervals())
+        return self.compute_ta_report()['trait_counts']
 
 
     def get_ta_trait_richness(self):
-        richness_map = {}
-        counts = self.ending_ta.get_counts_for_generation_intervals()
-        for interval, counts_by_locus in counts.items():
-            richness_by_locus = dict()
-            for locus, counter in counts_by_locus.items():
-                nt = len([count for count in counter.values() if count > 0])
-                #log.debug("richness for interval %s locus: %: %s", interval, locus, nt)
-                richness_by_locus[locus] = nt
-            richness_map[interval] = richness_by_locus
-        #log.debug("richness_map: %s", richness_map)
-        return convert_keys_to_string(richness_map)
+        return self.compute_ta_report()['trait_richness']
 
 
     def get_ta_trait_evenness_entropy(self):
-        freqmap = self.get_ta_trait_frequencies()
-        popsize = self.model.agentgraph.number_of_nodes()
-        entropy_map = {}
-        counts = self.ending_ta.get_counts_for_generation_intervals()
-        for interval, counts_by_locus in counts.items():
-            entropy_by_locus = dict()
-            for locus, counter in counts_by_locus.items():
-                freqlist = []
-                for trait, cnt in counter.items():
-                    freq = float(cnt) / (float(popsize ** 2) * float(interval))
-                    freqlist.append(freq)
-                    entropy_by_locus[locus] = diversity_shannon_entropy(freqlist)
-            entropy_map[interval] = entropy_by_locus
-        #log.debug("entropy_map: %s", entropy_map)
-        return convert_keys_to_string(entropy_map)
+        return self.compute_ta_report()['trait_evenness_entropy']
 
 
     def get_ta_trait_evenness_iqv(self):
-        freqmap = self.get_ta_trait_frequencies()
-        popsize = self.model.agentgraph.number_of_nodes()
-        entropy_map = {}
-        counts = self.ending_ta.get_counts_for_generation_intervals()
-        for interval, counts_by_locus in counts.items():
-            entropy_by_locus = dict()
-            for locus, counter in counts_by_locus.items():
-                freqlist = []
-                for trait, cnt in counter.items():
-                    freq = float(cnt) / (float(popsize ** 2) * float(interval))
-                    freqlist.append(freq)
-                    entropy_by_locus[locus] = diversity_iqv(freqlist)
-            entropy_map[interval] = entropy_by_locus
-        #log.debug("entropy_map: %s", entropy_map)
-        return convert_keys_to_string(entropy_map)
+        return self.compute_ta_report()['trait_evenness_iqv']
 
     def get_ta_slatkin_exact_probability(self):
-        slatkin_map = {}
-        counts = self.ending_ta.get_counts_for_generation_intervals()
-        for interval, counts_by_locus in counts.items():
-            slatkin_by_locus = dict()
-            for locus, counter in counts_by_locus.items():
-                counts = [count for count in counter.values()]
-                slatkin_by_locus[locus] = slatkin_exact_test(counts)
-            slatkin_map[interval] = slatkin_by_locus
-        #log.debug("slatkin_map: %s", slatkin_map)
-        return convert_keys_to_string(slatkin_map)
+        # the Slatkin tests are run here rather than in the report, so that only callers who need them pay for them
+        count_lists = self.compute_ta_report()['unlabeled_count_lists'].entries()
+        (slatkin, replicates) = slatkin_statistic_arrays((INTERVAL, LOCUS), count_lists)
+        self.slatkin_replicates['slatkin_ta'] = replicates
+        return slatkin
 
     def get_ta_unlabeled_configuration_counts(self):
-        return convert_keys_to_string(self.ending_ta.get_configuration_counts_for_generation_intervals())
+        return self.compute_ta_report()['configuration_counts']
 
     def get_ta_unlabeled_frequency_lists(self):
-        counts = self.ending_ta.get_counts_for_generation_intervals()
-        # we use the measured, not configured population size in case we do population dynamics
-        popsize = self.model.agentgraph.number_of_nodes()
-        freqmap = dict()
-        for interval, counts_by_locus in counts.items():
-            locifreq = []
-            # the value of the dict for each locus should be a Counter
-            for locus, counter in counts_by_locus.items():
-                locival = []
-                for trait, cnt in counter.items():
-                    freq = float(cnt) / (float(popsize ** 2) * float(interval))
-                    locival.append(freq)
-                locifreq.append(sorted(locival, reverse=True))
-            freqmap[interval] = locifreq
-            #log.debug("ending TA unlabeled frequencies: %s", freqmap)
-        return convert_keys_to_string(freqmap)
+        return self.compute_ta_report()['unlabeled_frequency_lists']
 
     def get_ta_number_configurations(self):
-        counts = self.ending_ta.get_configuration_counts_for_generation_intervals()
-        num_config_map = dict()
-        for interval, map in counts.items():
-            num_config_map[interval] = len(map)
-        return convert_keys_to_string(num_config_map)
+        return self.compute_ta_report()['number_configurations']
 
 
     def get_ta_unlableled_count_lists(self):
-        ulc_map = dict()
-        counts = self.ending_ta.get_counts_for_generation_intervals()
-        for interval, counts_by_locus in counts.items():
-            ulc_by_locus = dict()
-            for locus, counter in counts_by_locus.items():
-                counts = [count for count in counter.values()]
-                ulc_by_locus[locus] = [count for count in counter.values()]
-            ulc_map[interval] = ulc_by_locus
-        #log.debug("unlabeled counts: %s", ulc_map)
-        return convert_keys_to_string(ulc_map)
+        return self.compute_ta_report()['unlabeled_count_lists']
 
 
     def get_ta_configuration_slatkin_test(self):
-        slatkin_map = dict()
-        counts = self.ending_ta.get_configuration_counts_for_generation_intervals()
-        for interval, map in counts.items():
-            slatkin_map[interval] = slatkin_exact_test(sorted(map.values(), reverse=True))
-        return convert_keys_to_string(slatkin_map)
+        count_lists = self.compute_ta_report()['configuration_count_lists'].entries()
+        (slatkin, replicates) = slatkin_statistic_arrays((INTERVAL,), count_lists)
+        self.slatkin_replicates['config_slatkin_ta'] = replicates
+        return slatkin
 
     def get_ta_kandler_remaining_traits_per_locus(self):
-        start_counts = self.starting_ta.get_counts_for_generation_intervals()
-        #log.debug("start_counts: %s", start_counts)
-        end_counts = self.ending_ta.get_counts_for_generation_intervals()
-        #log.debug("end_counts: %s", start_counts)
-        remaining_by_interval = dict()
-
-        for interval, counts_by_locus in start_counts.items():
-            remaining = []
-            for locus, counter in counts_by_locus.items():
-                start_counter = start_counts[interval][locus]
-                end_counter = end_counts[interval][locus]
-                remaining_set = start_counter & end_counter
-                remaining.append(len(remaining_set))
-            remaining_by_interval[interval] = remaining
-        #log.debug("ta kandler remaining: %s", remaining_by_interval)
-        return convert_keys_to_string(remaining_by_interval)
+        return self.compute_ta_report()['kandler_remaining']
 
 
 
@@ -501,7 +491,8 @@ class SampledTraitAnalyzer(object):
         self.model = model
         self.sc = self.model.simconfig
         self.sample_sizes = self.sc.SAMPLE_SIZES_STUDIED
-        self.total_traits = model.agentgraph.number_of_nodes()
+        self.total_traits = model.get_population_size()
+        self.slatkin_replicates = dict()
 
     def __getattr__(self, name):
         """
@@ -525,12 +516,17 @@ class SampledTraitAnalyzer(object):
         The goal here is to make as few passes as possible, given that we have three nested loops in the
         main counting operation, and at least two nested loops for everything else.
 
+        If NESTED_SAMPLES is set in the configuration, a single sample of the largest size is drawn, and the
+        smaller samples are its prefixes (see _count_nested_samples()), so the samples at different sizes are
+        no longer independent of each other.
+
         :return: void
         """
 
         self.counts = defaultdict(int)
         self.freq = defaultdict(int)
         self.culture_counts = dict()
+        self.slatkin_replicates = dict()
         nf = self.model.simconfig.num_features
 
         # set up data structures, which have several levels:  {ssize -> [list of loci]}  where
@@ -546,18 +542,13 @@ class SampledTraitAnalyzer(object):
 
         # take all of the samples and store them for use
         # and then process each one for counts and
-        for ssize in self.sample_sizes:
-            #log.debug("sampling ssize: %s", ssize)
-            sample_ids = random.sample(self.model.agentgraph.nodes(), ssize)
-            for id in sample_ids:
-                # for each agent, first look at the multilocus configuration and count
-                # then iterate over loci and count each separately
-                agent_traits = self.model.get_agent_by_id(id).traits
-                culture = self.model.get_traits_packed(agent_traits)
-                self.culture_counts[ssize][culture] += 1
-                for locus in xrange(0, nf):
-                    trait = agent_traits[locus]
-                    self.counts[ssize][locus][trait] += 1
+        if self.sc.NESTED_SAMPLES:
+            self._count_nested_samples(nf)
+        else:
+            for ssize in self.sample_sizes:
+                #log.debug("sampling ssize: %s", ssize)
+                sample_ids = random.sample(self.model.get_agent_ids(), ssize)
+                self._count_agents(sample_ids, self.counts[ssize], self.culture_counts[ssize], nf)
 
 
         #log.info("counts for all sample sizes: %s", pp.pformat(self.counts))
@@ -574,78 +565,96 @@ class SampledTraitAnalyzer(object):
     #### END update()
 
 
+    def _count_agents(self, sample_ids, counts, culture_counts, nf):
+        for id in sample_ids:
+            # for each agent, first look at the multilocus configuration and count
+            # then iterate over loci and count each separately
+            agent_traits = self.model.get_agent_traits(id)
+            culture = self.model.get_agent_configuration_key(id)
+            culture_counts[culture] += 1
+            for locus in xrange(0, nf):
+                trait = agent_traits[locus]
+                counts[locus][trait] += 1
+
+
+    def _count_nested_samples(self, nf):
+        """
+        Draws one sample of the largest sample size, and takes each smaller sample as a prefix of it.
+        random.sample() returns agents in selection order, so the sample is the start of a random permutation
+        of the agents, and every prefix is itself a uniform random sample.  Each agent is counted once, and
+        the counts for each sample size carry over to the next larger one, so all of the sample sizes cost
+        little more than the largest alone.
+        """
+        ordered_sizes = sorted(set(self.sample_sizes))
+        sample_ids = random.sample(self.model.get_agent_ids(), ordered_sizes[-1])
+        counts = [defaultdict(int) for i in xrange(0, nf)]
+        culture_counts = defaultdict(int)
+        counted = 0
+        for ssize in ordered_sizes:
+            self._count_agents(sample_ids[counted:ssize], counts, culture_counts, nf)
+            counted = ssize
+            self.counts[ssize] = [defaultdict(int, locus) for locus in counts]
+            self.culture_counts[ssize] = defaultdict(int, culture_counts)
+
+
+    def _unlabeled_by_ssize(self, stats):
+        # the values of each locus of each sample size, sorted in descending order
+        return StatisticArray.from_items((SSIZE, LOCUS), [((ssize, locus), sorted(values.values(), reverse=True))
+                                                          for ssize in self.sample_sizes
+                                                          for locus, values in enumerate(stats[ssize])])
+
     def get_unlabeled_freq_by_ssize(self):
-        res = dict()
-        for ssize in self.sample_sizes:
-            res[ssize] = []
-            for locus in self.freq[ssize]:
-                vals = sorted(locus.values(),reverse=True)
-                res[ssize].append(vals)
-        return convert_keys_to_string(res)
+        return self._unlabeled_by_ssize(self.freq)
 
 
     def get_unlabeled_counts_by_ssize(self):
-        res = dict()
-        for ssize in self.sample_sizes:
-            res[ssize] = []
-            for locus in self.counts[ssize]:
-                vals = sorted(locus.values(),reverse=True)
-                res[ssize].append(vals)
-        return convert_keys_to_string(res)
+        return self._unlabeled_by_ssize(self.counts)
 
     def get_unlabeled_configuration_counts_by_ssize(self):
-        res = dict()
-        for ssize in self.sample_sizes:
-            res[ssize] = sorted(self.culture_counts[ssize].values(), reverse=True)
-        return convert_keys_to_string(res)
+        return StatisticArray.from_items((SSIZE,), [((ssize,), sorted(self.culture_counts[ssize].values(), reverse=True))
+                                                    for ssize in self.sample_sizes])
 
     def get_num_configurations_by_ssize(self):
-        res = dict()
-        for ssize in self.sample_sizes:
-            res[ssize] = len(self.culture_counts[ssize])
-        return convert_keys_to_string(res)
+        return StatisticArray.from_items((SSIZE,), [((ssize,), len(self.culture_counts[ssize]))
+                                                    for ssize in self.sample_sizes])
 
     def get_configuration_slatkin_by_ssize(self):
-        res = dict()
-        for ssize in self.sample_sizes:
-            cnt = sorted(self.culture_counts[ssize].values(), reverse=True)
-            res[ssize] = slatkin_exact_test(cnt)
-        return convert_keys_to_string(res)
+        count_lists = [((ssize,), sorted(self.culture_counts[ssize].values(), reverse=True))
+                       for ssize in self.sample_sizes]
+        (slatkin, replicates) = slatkin_statistic_arrays((SSIZE,), count_lists)
+        self.slatkin_replicates['config_slatkin_ssize'] = replicates
+        return slatkin
+
+    def _by_ssize(self, kernel, stats):
+        # evaluates a batch kernel over every locus of every sample size in one call
+        keys = [(ssize, locus) for ssize in self.sample_sizes for locus in xrange(len(stats[ssize]))]
+        rows = [locus.values() for ssize in self.sample_sizes for locus in stats[ssize]]
+        return batch_statistic_array(kernel, (SSIZE, LOCUS), keys, rows)
 
     def get_entropy_by_ssize(self):
-        res = dict()
-        for ssize in self.sample_sizes:
-            res[ssize] = []
-            for locus in self.freq[ssize]:
-                res[ssize].append(diversity_shannon_entropy(locus.values()))
-        return convert_keys_to_string(res)
+        return self._by_ssize(batch_shannon_entropy, self.freq)
 
 
     def get_iqv_by_ssize(self):
-        res = dict()
-        for ssize in self.sample_sizes:
-            res[ssize] = []
-            for locus in self.freq[ssize]:
-                res[ssize].append(diversity_iqv(locus.values()))
-        return convert_keys_to_string(res)
+        return self._by_ssize(batch_iqv, self.freq)
 
 
     def get_richness_by_ssize(self):
-        res = dict()
-        for ssize in self.sample_sizes:
-            res[ssize] = []
-            for locus in self.counts[ssize]:
-                res[ssize].append(len([freq for freq in locus.values() if freq > 0]))
-        return convert_keys_to_string(res)
+        return self._by_ssize(batch_richness, self.counts)
 
     def get_slatkin_by_ssize(self):
-        res = dict()
-        for ssize in self.sample_sizes:
-            res[ssize] = []
-            for locus in self.counts[ssize]:
-                cnt = sorted(locus.values(), reverse=True)
-                res[ssize].append(slatkin_exact_test(cnt))
-        return convert_keys_to_string(res)
+        count_lists = [((ssize, locus), sorted(counts.values(), reverse=True))
+                       for ssize in self.sample_sizes for locus, counts in enumerate(self.counts[ssize])]
+        (slatkin, replicates) = slatkin_statistic_arrays((SSIZE, LOCUS), count_lists)
+        self.slatkin_replicates['slatkin_ssize'] = replicates
+        return slatkin
+
+    def get_slatkin_replicates(self):
+        """
+        Returns the number of Monte Carlo replicates behind each Slatkin statistic computed since the last
+        update(), in a dict keyed by the statistic's field in the stored record, and shaped like the statistic.
+        """
+        return self.slatkin_replicates
 
 
 #################################################################################
@@ -696,23 +705,7 @@ class TimeAveragedSampledTraitAnalyzer(PopulationTraitAnalyzer):
     def update(self, timestep):
         #log.debug("entering TASTA update for step %s", timestep)
         super(TimeAveragedSampledTraitAnalyzer, self).update(timestep)
-
-        # The TA trackers expect a map with loci as keys, and dicts as values, where the value
-        # dicts are dicts of trait:count. The original pop/sample trait analyzers keep a list
-        # of dicts, where locus is implicit in the list position.  TODO:  commensurate data structures in the population analyzer & tatracker
-        locus = 0
-        countmap = dict()
-        for locus_map in self.counts:
-            countmap[locus] = locus_map
-            locus += 1
-
-
-        # if the timestep is within the intervals of any of the timeaverager objects, we record
-        # both trait counts for all loci/dimensions, and the intersected configurations/cultures/class counts
-        for tatracker in self.ta_trackers:
-            if tatracker.is_within_intervals(timestep):
-                # pass the count map to the tracker
-                tatracker.record_trait_count_sample(timestep,countmap,self.culture_counts)
+        record_time_averaged_counts(self, timestep)
 
 
 
@@ -722,6 +715,9 @@ class TimeAveragedSampledTraitAnalyzer(PopulationTraitAnalyzer):
         Samples of the population, in a configured set of sizes, are taken.  As normal, the samples
         are taken from the ending time averager, although for Kandler survival calculations, a set of
         samples are taken from the starting time averager as well.
+
+        Every interval, locus and sample size, for both averagers and for configurations, is sampled in a single
+        batched multivariate hypergeometric draw (see ctmixtures.analysis.subsampling).
         :return:  None
         """
         self.starting_ssize_counts = dict()
@@ -731,25 +727,25 @@ class TimeAveragedSampledTraitAnalyzer(PopulationTraitAnalyzer):
         ending_raw_counts = self.ending_ta.get_counts_for_generation_intervals()
         config_counts = self.ending_ta.get_configuration_counts_for_generation_intervals()
 
-        # process the ending counts
-        for interval, counts_by_locus in ending_raw_counts.items():
-            loci_map = dict()
-            for locus, counter in counts_by_locus.items():
-                sampled_counters = ptu.get_sampled_counter(self.ssize_list, counter)
-                loci_map[locus] = sampled_counters
-            self.ending_ssize_counts[interval] = loci_map
-
-        # process the starting counts
-        for interval, counts_by_locus in starting_raw_counts.items():
-            loci_map = dict()
-            for locus, counter in counts_by_locus.items():
-                sampled_counters = ptu.get_sampled_counter(self.ssize_list, counter)
-                loci_map[locus] = sampled_counters
-            self.starting_ssize_counts[interval] = loci_map
-
-        # take a sample of configuration counts
+        # gather every count map with the place its samples go, and draw them all at once
+        destinations = []
+        counters = []
+        for (raw_counts, ssize_counts) in [(ending_raw_counts, self.ending_ssize_counts),
+                                           (starting_raw_counts, self.starting_ssize_counts)]:
+            for interval, counts_by_locus in raw_counts.items():
+                loci_map = dict()
+                ssize_counts[interval] = loci_map
+                for locus, counter in counts_by_locus.items():
+                    destinations.append((loci_map, locus))
+                    counters.append(counter)
+
+        # and the configuration counts
         for interval, ccounts in config_counts.items():
-            self.config_ssize_counts[interval] = ptu.get_sampled_dict_counts(self.ssize_list, ccounts)
+            destinations.append((self.config_ssize_counts, interval))
+            counters.append(ccounts)
+
+        for (destination, key), sampled_counters in zip(destinations, sample_counters(counters, self.ssize_list)):
+            destination[key] = sampled_counters
 
 
         #log.debug("ending sampled snapshot of counts: %s", self.ending_ssize_counts)
@@ -763,27 +759,14 @@ class TimeAveragedSampledTraitAnalyzer(PopulationTraitAnalyzer):
         """
         Calculates trait frequencies for each locus across all TA intervals and sample sizes
 
-        :return: nested dict of the form {interval: {locus: {ssize: {trait: frequency}}}}
+        :return: StatisticArray over (interval, locus, ssize) of dicts of trait:frequency
         """
-        freqmap = dict()
-
+        items = []
         for interval, counts_by_locus in self.ending_ssize_counts.items():
-            locimap = dict()
-
             for locus, ssize_dict in counts_by_locus.items():
-                locusmap = dict()
-
                 for ssize, counter in ssize_dict.items():
-                    traits = dict()
-                    for trait, cnt in counter.items():
-                        freq = float(cnt) / float(ssize)
-                        traits[trait] = freq
-                    locusmap[ssize] = traits
-
-                locimap[locus] = locusmap
-            freqmap[interval] = locimap
-        #log.debug("ending sampled TA frequency map: %s", freqmap)
-        return convert_keys_to_string(freqmap)
+                    items.append(((interval, locus, ssize), labeled_counts(counter, ssize)))
+        return StatisticArray.from_items((INTERVAL, LOCUS, SSIZE), items)
 
 
 
@@ -791,103 +774,83 @@ class TimeAveragedSampledTraitAnalyzer(PopulationTraitAnalyzer):
         """
         Returns trait counts for each locus across all TA intervals and sample sizes
 
-        :return: nested dict of the form {interval: {locus: {ssize: {trait: count}}}}
+        :return: StatisticArray over (interval, locus, ssize) of dicts of trait:count
         """
-        return convert_keys_to_string(self.ending_ssize_counts)
+        items = []
+        for interval, counts_by_locus in self.ending_ssize_counts.items():
+            for locus, ssize_dict in counts_by_locus.items():
+                for ssize, counter in ssize_dict.items():
+                    items.append(((interval, locus, ssize), labeled_counts(counter)))
+        return StatisticArray.from_items((INTERVAL, LOCUS, SSIZE), items)
 
 
     def get_ta_trait_richness(self):
         """
         Calculates trait richness for each locus across all TA intervals and sample sizes
 
-        :return: nested dict of the form {interval: {locus: {ssize: richness}}}
+        :return: StatisticArray over (interval, locus, ssize)
         """
-        richness_map = {}
-        popsize = self.model.agentgraph.number_of_nodes()
-
+        items = []
         for interval, counts_by_locus in self.ending_ssize_counts.items():
-            locimap = dict()
-
             for locus, ssize_dict in counts_by_locus.items():
-                locusmap = dict()
-
                 for ssize, counter in ssize_dict.items():
                     nt = len([count for count in counter.values() if count > 0])
-                    locusmap[ssize] = nt
-                locimap[locus] = locusmap
-            richness_map[interval] = locimap
-        #log.debug("ending sampled TA richness map: %s", richness_map)
-        return convert_keys_to_string(richness_map)
+                    items.append(((interval, locus, ssize), nt))
+        #log.debug("ending sampled TA richness: %s", items)
+        return StatisticArray.from_items((INTERVAL, LOCUS, SSIZE), items)
 
 
     def get_ta_trait_evenness_entropy(self):
         """
         Calculates the Shannon entropy evenness statistic for each locus across all TA intervals and sample sizes.
 
-        :return: nested dict of the form {interval: {locus: {ssize: entropy value}}}
+        :return: StatisticArray over (interval, locus, ssize)
         """
-        entropy_map = {}
-        popsize = self.model.agentgraph.number_of_nodes()
-
+        keys = []
+        rows = []
         for interval, counts_by_locus in self.ending_ssize_counts.items():
-            locimap = dict()
-
             for locus, ssize_dict in counts_by_locus.items():
-                locusmap = dict()
-
                 for ssize, counter in ssize_dict.items():
-                    freqlist = [float(cnt) / float(ssize) for cnt in counter.values() if cnt > 0]
-
-                    locusmap[ssize] = diversity_shannon_entropy(freqlist)
-                locimap[locus] = locusmap
-            entropy_map[interval] = locimap
+                    keys.append((interval, locus, ssize))
+                    rows.append([float(cnt) / float(ssize) for cnt in counter.values() if cnt > 0])
+        entropy_map = batch_statistic_array(batch_shannon_entropy, (INTERVAL, LOCUS, SSIZE), keys, rows)
         #log.debug("ending sampled TA entropy map: %s", entropy_map)
-        return convert_keys_to_string(entropy_map)
+        return entropy_map
 
 
     def get_ta_trait_evenness_iqv(self):
         """
         Calculates the IQV evenness statistic for each locus across all TA intervals and sample sizes.
 
-        :return: nested dict of the form {interval: {locus: {ssize: IQV value}}}
+        :return: StatisticArray over (interval, locus, ssize)
         """
-        entropy_map = {}
-        popsize = self.model.agentgraph.number_of_nodes()
-
+        keys = []
+        rows = []
         for interval, counts_by_locus in self.ending_ssize_counts.items():
-            locimap = dict()
-
             for locus, ssize_dict in counts_by_locus.items():
-                locusmap = dict()
-
                 for ssize, counter in ssize_dict.items():
-                    freqlist = [float(cnt) / float(ssize) for cnt in counter.values() if cnt > 0]
-
-                    locusmap[ssize] = diversity_iqv(freqlist)
-                locimap[locus] = locusmap
-            entropy_map[interval] = locimap
+                    keys.append((interval, locus, ssize))
+                    rows.append([float(cnt) / float(ssize) for cnt in counter.values() if cnt > 0])
+        entropy_map = batch_statistic_array(batch_iqv, (INTERVAL, LOCUS, SSIZE), keys, rows)
         #log.debug("ending sampled TA iqv map: %s", entropy_map)
-        return convert_keys_to_string(entropy_map)
+        return entropy_map
 
     def get_ta_configuration_evenness_iqv(self):
         """
         Calculates the IQV evenness for configurations of traits, for all TA intervals and sample sizes.
 
-        :return: nested dict of the form {interval: { ssize: iqv value }}
+        :return: StatisticArray over (interval, ssize)
         """
-        entropy_map = dict()
-
+        keys = []
+        rows = []
         for interval, counts_by_ssize in self.config_ssize_counts.items():
-            interval_d = dict()
-
             for ssize, ccounts in counts_by_ssize.items():
-                freqlist = [float(cnt) / float(ssize) for cnt in ccounts.values() if cnt > 0]
-                interval_d[ssize] = diversity_iqv(freqlist)
-
-            entropy_map[interval] = interval_d
+                keys.append((interval, ssize))
+                rows.append([float(cnt) / float(ssize) for cnt in ccounts.values() if cnt > 0])
+        entropy_map = batch_statistic_array(batch_iqv, (INTERVAL, SSIZE), keys, rows)
 
         #log.debug("ending sampled TA config iqv: %s", entropy_map)
-        return convert_keys_to_string(entropy_map)
+        return entropy_map
 
 
 
@@ -895,52 +858,47 @@ class TimeAveragedSampledTraitAnalyzer(PopulationTraitAnalyzer):
         """
         Calculates the Shannon entropy for configurations of traits, for all TA intervals and sample sizes.
 
-        :return: nested dict of the form {interval: { ssize: entropy value }}
+        :return: StatisticArray over (interval, ssize)
         """
-        entropy_map = dict()
-
+        keys = []
+        rows = []
         for interval, counts_by_ssize in self.config_ssize_counts.items():
-            interval_d = dict()
-
             for ssize, ccounts in counts_by_ssize.items():
-                freqlist = [float(cnt) / float(ssize) for cnt in ccounts.values() if cnt > 0]
-                interval_d[ssize] = diversity_shannon_entropy(freqlist)
-
-            entropy_map[interval] = interval_d
+                keys.append((interval, ssize))
+                rows.append([float(cnt) / float(ssize) for cnt in ccounts.values() if cnt > 0])
+        entropy_map = batch_statistic_array(batch_shannon_entropy, (INTERVAL, SSIZE), keys, rows)
 
         #log.debug("ending sampled TA config entropy: %s", entropy_map)
-        return convert_keys_to_string(entropy_map)
+        return entropy_map
 
     def get_ta_slatkin_exact_probability(self):
         """
         Calculates the Slatkin exact test for each locus across all TA intervals and sample sizes.
 
-        :return: nested dict of the form {interval: {locus: {ssize: Slatkin p-value}}}
+        :return: StatisticArray over (interval, locus, ssize)
         """
-        slatkin_map = {}
-
+        count_lists = []
         for interval, counts_by_locus in self.ending_ssize_counts.items():
-            locimap = dict()
-
             for locus, ssize_dict in counts_by_locus.items():
-                locusmap = dict()
-
                 for ssize, counter in ssize_dict.items():
                     count_list = [count for count in counter.values() if count > 0]
-                    locusmap[ssize] = slatkin_exact_test(count_list)
-                locimap[locus] = locusmap
-            slatkin_map[interval] = locimap
-        #log.debug("ending sampled TA slatkin map: %s", slatkin_map)
-        return convert_keys_to_string(slatkin_map)
+                    count_lists.append(((interval, locus, ssize), count_list))
+        (slatkin, replicates) = slatkin_statistic_arrays((INTERVAL, LOCUS, SSIZE), count_lists)
+        self.slatkin_replicates['slatkin_ta_ssize'] = replicates
+        return slatkin
 
 
     def get_ta_unlabeled_configuration_counts(self):
         """
         Returns counts of trait configurations, across all TA intervals and sample sizes.
 
-        :return: nested dict of the form {interval: {ssize: {configuration: count}}}
+        :return: StatisticArray over (interval, ssize) of dicts of configuration:count
         """
-        return convert_keys_to_string(self.config_ssize_counts)
+        items = []
+        for interval, counts_by_ssize in self.config_ssize_counts.items():
+            for ssize, ccounts in counts_by_ssize.items():
+                items.append(((interval, ssize), labeled_counts(ccounts)))
+        return StatisticArray.from_items((INTERVAL, SSIZE), items)
 
     def get_ta_unlabeled_frequency_lists(self):
         """
@@ -949,69 +907,45 @@ class TimeAveragedSampledTraitAnalyzer(PopulationTraitAnalyzer):
         themselves, without identifying the exact traits to which they belong; this is commonly used
         in population genetics models for K- and infinite-alleles models (see Ewens 2004).
 
-        :return: nested dict of the form {interval: {locus: { ssize: [frequency list]}}}
+        :return: StatisticArray over (interval, locus, ssize) of frequency lists
         """
-        freqmap = dict()
-
+        items = []
         for interval, counts_by_locus in self.ending_ssize_counts.items():
-            locimap = dict()
-
             for locus, ssize_dict in counts_by_locus.items():
-                locusmap = dict()
-
                 for ssize, counter in ssize_dict.items():
-                    traits = []
-                    for trait, cnt in counter.items():
-                        freq = float(cnt) / float(ssize)
-                        traits.append(freq)
-
-                    locusmap[ssize] = sorted(traits, reverse=True)
-
-                locimap[locus] = locusmap
-            freqmap[interval] = locimap
-        #log.debug("ending sampled TA unlabeled freq map: %s", freqmap)
-        return convert_keys_to_string(freqmap)
+                    freqs = [float(cnt) / float(ssize) for cnt in counter.values()]
+                    items.append(((interval, locus, ssize), sorted(freqs, reverse=True)))
+        return StatisticArray.from_items((INTERVAL, LOCUS, SSIZE), items)
 
 
     def get_ta_number_configurations(self):
         """
         Calculates the number of configurations of traits, for all TA intervals and sample sizes.
 
-        :return: nested dict of the form {interval: {ssize: richness}}
+        :return: StatisticArray over (interval, ssize)
         """
-        ccount_richness = dict()
-
+        items = []
         for interval, counts_by_ssize in self.config_ssize_counts.items():
-            interval_richness = dict()
-
             for ssize, ccounts in counts_by_ssize.items():
-                interval_richness[ssize] = len([trait for trait, count in ccounts.items() if count > 0])
-
-            ccount_richness[interval] = interval_richness
-
-        #log.debug("ending sampled TA config richness: %s", ccount_richness)
-        return convert_keys_to_string(ccount_richness)
+                items.append(((interval, ssize), len([trait for trait, count in ccounts.items() if count > 0])))
+        #log.debug("ending sampled TA config richness: %s", items)
+        return StatisticArray.from_items((INTERVAL, SSIZE), items)
 
 
     def get_ta_configuration_slatkin_test(self):
         """
         Calculates the Slatkin exact test for configurations of traits, for all TA intervals and sample sizes.
 
-        :return: nested dict of the form {interval: { ssize: Slatkin p-value }}
+        :return: StatisticArray over (interval, ssize)
         """
-        slatkin_map = dict()
-
+        count_lists = []
         for interval, counts_by_ssize in self.config_ssize_counts.items():
-            interval_slatkin = dict()
-
             for ssize, ccounts in counts_by_ssize.items():
                 cc = [count for count in ccounts.values() if count > 0]
-                interval_slatkin[ssize] = slatkin_exact_test(cc)
-
-            slatkin_map[interval] = interval_slatkin
-
-        #log.debug("ending sampled TA config slatkin: %s", slatkin_map)
-        return convert_keys_to_string(slatkin_map)
+                count_lists.append(((interval, ssize), cc))
+        (slatkin, replicates) = slatkin_statistic_arrays((INTERVAL, SSIZE), count_lists)
+        self.slatkin_replicates['config_slatkin_ta_ssize'] = replicates
+        return slatkin
 
     def get_ta_kandler_remaining_traits_per_locus(self):
         """
@@ -1019,28 +953,20 @@ class TimeAveragedSampledTraitAnalyzer(PopulationTraitAnalyzer):
         between two samples.  Survival is always calculated over "paired" samples which share the same parameters
         (e.g., sample size and TA interval).
 
-        :return: nested dict and list of the form {interval: {ssize: [remaining for locus 0, ... locus N]}}
+        :return: StatisticArray over (interval, ssize, locus)
         """
         start_counts = self.starting_ssize_counts
         end_counts = self.ending_ssize_counts
 
-        remaining_by_interval_ssize = dict()
-
+        items = []
         for interval, counts_by_locus_ssize in start_counts.items():
-            ssize_map = dict()
-            for ss in self.ssize_list:
-                ssize_map[ss] = []
-
             for locus, counts_by_ssize in counts_by_locus_ssize.items():
                 for ssize, counter in counts_by_ssize.items():
                     start_counter = start_counts[interval][locus][ssize]
                     end_counter = end_counts[interval][locus][ssize]
                     remaining_set = start_counter & end_counter
-                    (ssize_map[ssize]).append(len(remaining_set))
-
-
-            remaining_by_interval_ssize[interval] = ssize_map
-        return convert_keys_to_string(remaining_by_interval_ssize)
+                    items.append(((interval, ssize, locus), len(remaining_set)))
+        return StatisticArray.from_items((INTERVAL, SSIZE, LOCUS), items)
 
 
 
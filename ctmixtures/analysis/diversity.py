@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Vectorized diversity statistics over many count or frequency lists at once (e.g., every locus of a sample, every
+sample size, or every exported record).  Each kernel takes a ragged list of lists, or a 2D array in which each
+row is zero padded, and returns a 1D array with one value per row.  Zero entries are treated as padding, so
+traits with a zero count or frequency do not contribute to any statistic.
+
+"""
+
+import numpy as np
+
+
+def padded_matrix(rows):
+    """
+    Returns a 2D float array from a ragged list of count or frequency lists (or other iterables), with each
+    row padded with zeros to the length of the longest.  A 2D array is returned as a float array.
+    """
+    if isinstance(rows, np.ndarray):
+        return np.atleast_2d(rows).astype(np.float64)
+    rows = [list(row) for row in rows]
+    width = max([len(row) for row in rows] + [0])
+    matrix = np.zeros((len(rows), width), dtype=np.float64)
+    for i, row in enumerate(rows):
+        matrix[i, :len(row)] = row
+    return matrix
+
+
+def frequency_matrix(rows):
+    """
+    Returns the rows of a count matrix (ragged or padded) normalized to frequencies.
+    """
+    counts = padded_matrix(rows)
+    totals = counts.sum(axis=1)
+    totals[totals == 0] = 1.0
+    return counts / totals[:, np.newaxis]
+
+
+def batch_richness(rows):
+    """
+    Returns the number of nonzero entries in each row.
+    """
+    return np.count_nonzero(padded_matrix(rows), axis=1)
+
+
+def batch_sum_squares(rows):
+    freqs = padded_matrix(rows)
+    return (freqs * freqs).sum(axis=1)
+
+
+def batch_shannon_entropy(rows):
+    """
+    Returns the Shannon entropy, -sum(p ln p), of each row of frequencies.
+    """
+    freqs = padded_matrix(rows)
+    present = freqs > 0
+    plogp = np.zeros(freqs.shape)
+    plogp[present] = freqs[present] * np.log(freqs[present])
+    # subtracting from zero, rather than negating, gives 0.0 and not -0.0 for a single trait
+    return 0.0 - plogp.sum(axis=1)
+
+
+def batch_iqv(rows):
+    """
+    Returns the index of qualitative variation, (k / (k - 1)) * (1 - sum(p^2)), of each row of frequencies,
+    where k is the number of nonzero frequencies in the row, and zero where k <= 1.
+    """
+    freqs = padded_matrix(rows)
+    k = np.count_nonzero(freqs, axis=1).astype(np.float64)
+    iqv = np.zeros(len(k))
+    varied = k > 1
+    iqv[varied] = (k[varied] / (k[varied] - 1.0)) * (1.0 - batch_sum_squares(freqs[varied]))
+    return iqv
+
+
+def batch_neiman_tf(rows):
+    """
+    Returns Neiman's t_f, (1 / sum(p^2)) - 1, of each row of frequencies.
+    """
+    return (1.0 / batch_sum_squares(rows)) - 1.0
+
+
+def batch_diversity(rows):
+    """
+    Returns a tuple of arrays (entropy, iqv, richness, neiman_tf), with one value per row of a count matrix
+    (ragged or padded), after normalizing each row to frequencies.
+    """
+    counts = padded_matrix(rows)
+    freqs = frequency_matrix(counts)
+    return (batch_shannon_entropy(freqs), batch_iqv(freqs), batch_richness(counts), batch_neiman_tf(freqs))
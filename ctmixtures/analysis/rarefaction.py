@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Analytic rarefaction of trait counts.  Rather than drawing a random subsample of each size and measuring it, the
+statistics of a sample of n drawn without replacement from counts N_1..N_k (total N) are computed as their
+expectations under hypergeometric sampling:
+
+    E[richness]  = sum_i 1 - C(N - N_i, n) / C(N, n)
+    E[entropy]   = - sum_i sum_x P(X_i = x) (x/n) ln(x/n),  with X_i ~ Hypergeometric(N, N_i, n)
+    E[sum p^2]   = sum_i (Var(X_i) + E[X_i]^2) / n^2
+
+IQV is not linear in the counts, so it is reported as a plug-in value, (R / (R - 1)) * (1 - E[sum p^2]) with
+R = E[richness].  The expectations are exact (up to floating point), so they carry no sampling noise, and are
+computed in vectorized passes over the counts.  The hypergeometric probabilities are built in log space from
+ratios of falling factorials, one draw at a time:  the log probability that draw j misses trait i, given that the
+draws before it did, is log1p(-N_i / (N - j)).  Differences of log gamma values of the totals would lose most of
+their precision at the totals of time averaged counts (e.g., 1e12), while these terms keep it.
+
+RarefactionTraitAnalyzer and TimeAveragedRarefactionTraitAnalyzer report these expectations in place of the
+statistics measured on random samples, for the population's counts and for time averaged counts.  The simulation
+scripts use them if RAREFACTION is set in the configuration.
+
+"""
+
+import math as m
+
+import numpy as np
+
+from ctmixtures.analysis.descriptive_stats import SampledTraitAnalyzer, TimeAveragedSampledTraitAnalyzer
+from ctmixtures.analysis.statistic_array import StatisticArray, INTERVAL, LOCUS, SSIZE
+
+
+# Stirling series coefficients for log gamma, which is accurate to double precision once the argument is
+# shifted above _LGAMMA_SHIFT
+_STIRLING = [1.0 / 12.0, -1.0 / 360.0, 1.0 / 1260.0, -1.0 / 1680.0, 1.0 / 1188.0]
+_LGAMMA_SHIFT = 15
+
+
+def log_gamma(x):
+    """
+    Returns log Gamma(x) elementwise, for an array of positive x, without a Python loop over the elements.
+    Arguments below _LGAMMA_SHIFT are shifted up with Gamma(x) = Gamma(x + k) / (x (x + 1) ... (x + k - 1)),
+    and the Stirling series is evaluated at the shifted argument.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    small = x < _LGAMMA_SHIFT
+    z = np.where(small, x + _LGAMMA_SHIFT, x)
+    inverse = 1.0 / z
+    inverse_squared = inverse * inverse
+    series = np.zeros(z.shape)
+    for coefficient in reversed(_STIRLING):
+        series = series * inverse_squared + coefficient
+    result = (z - 0.5) * np.log(z) - z + 0.5 * m.log(2.0 * m.pi) + series * inverse
+    if small.any():
+        shifted = x[small]
+        result[small] -= np.log(np.prod([shifted + k for k in xrange(_LGAMMA_SHIFT)], axis=0))
+    return result
+
+
+def log_binomial(a, b):
+    """
+    Returns log C(a, b) elementwise, with -inf where b < 0 or b > a.
+    """
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    (a, b) = np.broadcast_arrays(a, b)
+    valid = (b >= 0) & (b <= a)
+    result = np.empty(a.shape)
+    result.fill(-np.inf)
+    result[valid] = log_gamma(a[valid] + 1) - log_gamma(b[valid] + 1) - log_gamma(a[valid] - b[valid] + 1)
+    return result
+
+
+def _prepare(count_list, sample_sizes):
+    counts = np.array([c for c in count_list if c > 0], dtype=np.float64)
+    total = counts.sum()
+    # a sample cannot be larger than the counts it is drawn from
+    sizes = np.minimum(np.asarray(sample_sizes, dtype=np.float64), total)
+    return (counts, total, sizes)
+
+
+def _log_absent(counts, total, length):
+    # traits x (length + 1) matrix whose column m is log P(trait i absent from a sample of size m), the sum of
+    # log1p(-N_i / (N - j)) over draws j < m, the log probability that draw j misses trait i given that the
+    # draws before it did; length is at most N
+    remaining = total - np.arange(length, dtype=np.float64)
+    ratio = np.minimum(counts[:, np.newaxis] / remaining[np.newaxis, :], 1.0)
+    with np.errstate(divide='ignore'):
+        terms = np.log1p(-ratio)
+    return np.hstack([np.zeros((len(counts), 1)), np.cumsum(terms, axis=1)])
+
+
+def expected_richness(count_list, sample_sizes):
+    """
+    Returns an array of the expected number of distinct traits in a sample of each size.
+    """
+    (counts, total, sizes) = _prepare(count_list, sample_sizes)
+    if total == 0 or len(sizes) == 0:
+        return np.zeros(len(sizes))
+    log_absent = _log_absent(counts, total, int(sizes.max()))[:, sizes.astype(np.int64)]
+    return (1.0 - np.exp(log_absent)).sum(axis=0)
+
+
+def expected_sum_squares(count_list, sample_sizes):
+    """
+    Returns an array of the expected sum of squared sample frequencies in a sample of each size.
+    """
+    (counts, total, sizes) = _prepare(count_list, sample_sizes)
+    if total == 0:
+        return np.zeros(len(sizes))
+    p = (counts / total)[:, np.newaxis]
+    n = sizes[np.newaxis, :]
+    correction = np.where(total > 1, (total - n) / max(total - 1.0, 1.0), 0.0)
+    second_moment = n * p * (1.0 - p) * correction + (n * p) ** 2
+    return (second_moment / (n * n)).sum(axis=0)
+
+
+def expected_entropy(count_list, sample_sizes):
+    """
+    Returns an array of the expected Shannon entropy of sample frequencies in a sample of each size.
+    """
+    (counts, total, sizes) = _prepare(count_list, sample_sizes)
+    if total == 0 or len(sizes) == 0:
+        return np.zeros(len(sizes))
+    log_absent = _log_absent(counts, total, int(sizes.max()))
+
+    entropy = np.zeros(len(sizes))
+    for i, n in enumerate(sizes.astype(np.int64)):
+        if n == 0:
+            continue
+        # P(X_i = x) = C(n, x) * (N - N_i)_(n-x) / (N)_(n-x) * (N_i)_x / (N - n + 1)^(x), with falling and
+        # rising factorials:  the first ratio is P(trait i absent from a sample of size n - x), and the second
+        # the product of (N_i - j) / (N - n + 1 + j) over j < x
+        j = np.arange(n, dtype=np.float64)
+        hits = np.maximum(counts[:, np.newaxis] - j[np.newaxis, :], 0.0)
+        with np.errstate(divide='ignore'):
+            log_present = np.cumsum(np.log(hits / (total - n + 1.0 + j)[np.newaxis, :]), axis=1)
+        x = np.arange(1, n + 1)
+        log_pmf = log_binomial(float(n), x)[np.newaxis, :] + log_absent[:, n - x] + log_present
+        freq = x / float(n)
+        entropy[i] = 0.0 - (np.exp(log_pmf) * (freq * np.log(freq))[np.newaxis, :]).sum()
+    return entropy
+
+
+def rarefy(count_list, sample_sizes):
+    """
+    Returns a tuple of arrays (richness, entropy, iqv), with the expected value of each statistic for a
+    sample of each size drawn without replacement from a list of counts.
+    """
+    richness = expected_richness(count_list, sample_sizes)
+    entropy = expected_entropy(count_list, sample_sizes)
+    ss = expected_sum_squares(count_list, sample_sizes)
+    iqv = np.zeros(len(richness))
+    varied = richness > 1
+    iqv[varied] = (richness[varied] / (richness[varied] - 1.0)) * (1.0 - ss[varied])
+    return (richness, entropy, iqv)
+
+
+def _item_key(axes, labels, ssize):
+    return tuple(ssize if axis == SSIZE else labels[axis] for axis in axes)
+
+
+def rarefy_statistic_arrays(axes, labeled_count_lists, sample_sizes):
+    """
+    Takes a list of (labels, count list) pairs, where labels is a dict of axis:label for every axis but the
+    sample size, and returns a tuple of StatisticArrays over axes (richness, entropy, iqv), with the expected
+    value of each statistic for a sample of each size from each count list (see rarefy()).
+    """
+    items = ([], [], [])
+    for labels, count_list in labeled_count_lists:
+        expected = rarefy(count_list, sample_sizes)
+        for statistic_items, values in zip(items, expected):
+            statistic_items.extend((_item_key(axes, labels, ssize), value)
+                                   for ssize, value in zip(sample_sizes, values.tolist()))
+    return tuple(StatisticArray.from_items(axes, statistic_items) for statistic_items in items)
+
+
+def expected_richness_array(axes, labeled_count_lists, sample_sizes):
+    """
+    Returns a StatisticArray over axes with the expected richness of a sample of each size from each count list,
+    given as for rarefy_statistic_arrays().
+    """
+    items = []
+    for labels, count_list in labeled_count_lists:
+        richness = expected_richness(count_list, sample_sizes)
+        items.extend((_item_key(axes, labels, ssize), value) for ssize, value in zip(sample_sizes, richness.tolist()))
+    return StatisticArray.from_items(axes, items)
+
+
+class RarefactionTraitAnalyzer(SampledTraitAnalyzer):
+    """
+    SampledTraitAnalyzer whose richness, entropy, IQV and number of configurations by sample size are the
+    expected values of those statistics for samples of each of SAMPLE_SIZES_STUDIED, computed analytically
+    from the trait counts of the whole population at each update() (see rarefy()), so repeated updates of the
+    same population give the same values.  The getters return StatisticArrays over the same axes as those of
+    SampledTraitAnalyzer.  The samples drawn by SampledTraitAnalyzer.update() are still used for the statistics
+    which have no analytic form here (e.g., the Slatkin exact test and the unlabeled count lists).
+    """
+
+    def update(self, timestep):
+        super(RarefactionTraitAnalyzer, self).update(timestep)
+        labeled_counts = [({LOCUS: locus}, counts.values())
+                          for locus, counts in enumerate(self.model.get_locus_trait_counts())]
+        (self.expected_richness, self.expected_entropy, self.expected_iqv) = rarefy_statistic_arrays(
+            (SSIZE, LOCUS), labeled_counts, self.sample_sizes)
+        self.expected_configurations = expected_richness_array(
+            (SSIZE,), [({}, self.model.get_configuration_counts().values())], self.sample_sizes)
+
+    def get_richness_by_ssize(self):
+        return self.expected_richness
+
+    def get_entropy_by_ssize(self):
+        return self.expected_entropy
+
+    def get_iqv_by_ssize(self):
+        return self.expected_iqv
+
+    def get_num_configurations_by_ssize(self):
+        return self.expected_configurations
+
+
+class TimeAveragedRarefactionTraitAnalyzer(TimeAveragedSampledTraitAnalyzer):
+    """
+    TimeAveragedSampledTraitAnalyzer whose richness, entropy, IQV and number of configurations, for each TA
+    interval and sample size, are the expected values of those statistics for samples drawn from the time
+    averaged counts of the ending time averager, computed analytically when the final sample is taken (see
+    rarefy()).  The getters return StatisticArrays over the same axes as those of
+    TimeAveragedSampledTraitAnalyzer, and the other statistics are still measured on the sampled snapshot.
+    """
+
+    def take_sample_snapshot(self):
+        super(TimeAveragedRarefactionTraitAnalyzer, self).take_sample_snapshot()
+        raw_counts = self.ending_ta.get_counts_for_generation_intervals()
+        config_counts = self.ending_ta.get_configuration_counts_for_generation_intervals()
+
+        labeled_counts = [({INTERVAL: interval, LOCUS: locus}, counter.values())
+                          for interval, counts_by_locus in raw_counts.items()
+                          for locus, counter in counts_by_locus.items()]
+        (self.expected_richness, self.expected_entropy, self.expected_iqv) = rarefy_statistic_arrays(
+            (INTERVAL, LOCUS, SSIZE), labeled_counts, self.ssize_list)
+        self.expected_configurations = expected_richness_array(
+            (INTERVAL, SSIZE), [({INTERVAL: interval}, ccounts.values()) for interval, ccounts in config_counts.items()],
+            self.ssize_list)
+
+    def get_ta_trait_richness(self):
+        return self.expected_richness
+
+    def get_ta_trait_evenness_entropy(self):
+        return self.expected_entropy
+
+    def get_ta_trait_evenness_iqv(self):
+        return self.expected_iqv
+
+    def get_ta_number_configurations(self):
+        return self.expected_configurations
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Memoization of Slatkin exact test results.  Final samples call the test per locus, per sample size, per time
+averaging interval, and for configurations, and small count vectors such as (18,2) recur constantly within and
+across simulation runs.  Results are cached in a bounded in-process LRU, and optionally in an SQLite database
+file which concurrent simulation processes share.
+
+"""
+
+import logging as log
+import os
+import sqlite3
+from collections import OrderedDict
+
+
+class SlatkinResultCache(object):
+    """
+    Cache of Slatkin exact test results, keyed by the count vector (sorted in descending order) and a label for
+    the Monte Carlo mode (e.g., the number of replicates).  Values are (probability, theta, replicates) tuples.
+
+    Lookups check an in-process LRU of at most max_entries results, and then the on-disk tier, if a path is
+    given.  Results computed in any process are written to the on-disk tier, so every process sharing the file
+    benefits.  SQLite serializes writers with file locks, so the file is safe to share among processes on one
+    host, although not over NFS.  Writes use INSERT OR IGNORE, since two processes computing the same result at
+    the same time is harmless.  Connections are opened lazily, and reopened in a forked child process.
+    """
+
+    def __init__(self, max_entries=10000, path=None):
+        self.max_entries = max_entries
+        self.path = path
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._connection = None
+        self._connection_pid = None
+
+    @staticmethod
+    def make_key(count_list, mode):
+        return (tuple(sorted(count_list, reverse=True)), str(mode))
+
+    def get(self, key):
+        """
+        Returns the cached (probability, theta, replicates) tuple for a key, or None.
+        """
+        value = self.entries.pop(key, None)
+        if value is not None:
+            self.entries[key] = value
+            self.hits += 1
+            return value
+
+        value = self._get_from_disk(key)
+        if value is not None:
+            self._put_in_memory(key, value)
+            self.disk_hits += 1
+            return value
+
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self._put_in_memory(key, value)
+        self._put_on_disk(key, value)
+
+    def _put_in_memory(self, key, value):
+        self.entries[key] = value
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def _get_connection(self):
+        if self.path is None:
+            return None
+        if self._connection is None or self._connection_pid != os.getpid():
+            self._connection = sqlite3.connect(self.path, timeout=60)
+            self._connection.execute("CREATE TABLE IF NOT EXISTS slatkin (counts TEXT, mode TEXT, "
+                                     "prob REAL, theta REAL, reps INTEGER, PRIMARY KEY (counts, mode))")
+            self._connection.commit()
+            self._connection_pid = os.getpid()
+        return self._connection
+
+    @staticmethod
+    def _counts_to_text(counts):
+        return ",".join(str(c) for c in counts)
+
+    def _get_from_disk(self, key):
+        conn = self._get_connection()
+        if conn is None:
+            return None
+        (counts, mode) = key
+        try:
+            row = conn.execute("SELECT prob, theta, reps FROM slatkin WHERE counts = ? AND mode = ?",
+                               (self._counts_to_text(counts), mode)).fetchone()
+        except sqlite3.Error as e:
+            log.warn("Slatkin cache read from %s failed: %s", self.path, e)
+            return None
+        if row is None:
+            return None
+        return tuple(row)
+
+    def _put_on_disk(self, key, value):
+        conn = self._get_connection()
+        if conn is None:
+            return
+        (counts, mode) = key
+        try:
+            conn.execute("INSERT OR IGNORE INTO slatkin (counts, mode, prob, theta, reps) VALUES (?, ?, ?, ?, ?)",
+                         (self._counts_to_text(counts), mode) + tuple(value))
+            conn.commit()
+        except sqlite3.Error as e:
+            log.warn("Slatkin cache write to %s failed: %s", self.path, e)
+
+
+# the cache used by slatkin_exact_test(); simulation scripts configure it from the simulation configuration
+slatkin_cache = SlatkinResultCache()
+
+
+def configure_slatkin_cache(max_entries, path=None):
+    """
+    Replaces the module-level cache used by slatkin_exact_test(), with an LRU of at most max_entries results
+    and, if path is given, an on-disk tier stored in the SQLite file at path.
+    """
+    global slatkin_cache
+    slatkin_cache = SlatkinResultCache(max_entries, path)
+
+
+def get_slatkin_cache():
+    return slatkin_cache
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Monte Carlo evaluation of the Slatkin exact test, either with a fixed number of replicates, or adaptively, drawing
+replicates in batches until a confidence interval on the tail probability is narrower than a precision target.
+
+"""
+
+import logging as log
+import math as m
+from collections import OrderedDict
+
+import slatkin
+
+from ctmixtures.analysis.slatkin_cache import get_slatkin_cache
+from ctmixtures.analysis.slatkin_tables import get_slatkin_tables
+
+
+# 95% normal quantile, for the Wilson score interval
+_Z = 1.959964
+
+# the fixed number of replicates, which is also the most the adaptive mode will draw
+montecarlo_replicates = 100000
+
+# if precision is None, the adaptive mode is off
+adaptive_precision = None
+adaptive_batch_size = 2000
+
+# while not None, slatkin_test() records the count lists it would run, instead of running them
+_collected_inputs = None
+
+# while not None, results computed by precompute_slatkin_tests(), which slatkin_test() uses before the cache
+_precomputed_results = None
+
+
+def configure_slatkin_montecarlo(replicates, precision=None, batch_size=2000):
+    """
+    Sets the number of Monte Carlo replicates used by slatkin_test(), and turns on the adaptive mode if
+    precision is given.  In adaptive mode, replicates are drawn in batches of batch_size, until the half-width
+    of the 95% confidence interval on the tail probability is at most precision, or replicates have been drawn
+    in total.
+    """
+    global montecarlo_replicates, adaptive_precision, adaptive_batch_size
+    montecarlo_replicates = replicates
+    adaptive_precision = precision
+    adaptive_batch_size = batch_size
+
+
+def wilson_half_width(prob, reps):
+    """
+    Returns the half-width of the 95% Wilson score interval for a proportion prob estimated from reps trials.
+    """
+    z2 = _Z * _Z
+    return _Z * m.sqrt(prob * (1.0 - prob) / reps + z2 / (4.0 * reps * reps)) / (1.0 + z2 / reps)
+
+
+def adaptive_montecarlo(count_list, precision, batch_size, max_replicates):
+    """
+    Estimates the Slatkin exact test tail probability by drawing batches of batch_size replicates, and pooling
+    them, until the 95% confidence interval is within precision of the estimate, or max_replicates are drawn.
+    Returns a tuple (probability, theta, replicates used).
+    """
+    num_alleles = len(count_list)
+    hits = 0.0
+    reps = 0
+    while reps < max_replicates:
+        batch = min(batch_size, max_replicates - reps)
+        (prob, theta) = slatkin.montecarlo(batch, count_list, num_alleles)
+        hits += prob * batch
+        reps += batch
+        if wilson_half_width(hits / reps, reps) <= precision:
+            break
+    return (hits / reps, theta, reps)
+
+
+def _get_mode():
+    if adaptive_precision is None:
+        return "fixed:%s" % montecarlo_replicates
+    else:
+        return "adaptive:%s:%s" % (adaptive_precision, montecarlo_replicates)
+
+
+def _run_montecarlo(counts, replicates, precision, batch_size):
+    if precision is None:
+        (prob, theta) = slatkin.montecarlo(replicates, counts, len(counts))
+        return (prob, theta, replicates)
+    else:
+        return adaptive_montecarlo(counts, precision, batch_size, replicates)
+
+
+def _run_montecarlo_task(task):
+    # top level function so that it can be sent to pool workers
+    return _run_montecarlo(*task)
+
+
+def slatkin_test(count_list):
+    """
+    Returns a tuple (probability, theta, replicates used) for the Slatkin exact test on a list of counts.
+    If exact tables are loaded for the sample size (the total of the counts), the exact tail probability is
+    returned, with zero replicates.  Otherwise the fixed or adaptive Monte Carlo is used, as configured, and
+    results are memoized in the Slatkin result cache, under a mode label which distinguishes the settings.
+    """
+    tables = get_slatkin_tables()
+    if tables is not None:
+        exact = tables.lookup(count_list)
+        if exact is not None:
+            return (exact[0], exact[1], 0)
+
+    cache = get_slatkin_cache()
+    key = cache.make_key(count_list, _get_mode())
+    if _precomputed_results is not None and key in _precomputed_results:
+        return _precomputed_results[key]
+    result = cache.get(key)
+    if result is None:
+        counts = list(key[0])
+        if _collected_inputs is not None:
+            _collected_inputs.append(counts)
+            return (0.0, 0.0, 0)
+        result = _run_montecarlo(counts, montecarlo_replicates, adaptive_precision, adaptive_batch_size)
+        log.debug("slatkin counts: %s prob: %s replicates: %s", counts, result[0], result[2])
+        cache.put(key, result)
+    return result
+
+
+def precompute_slatkin_tests(pool, collect, compute=None):
+    """
+    Runs, in a multiprocessing pool, every Slatkin test which collect() (a function of no arguments) would run,
+    and stores the results in the Slatkin result cache.  collect() is called once to discover the tests, with
+    slatkin_test() returning placeholder values, so it should only make the calls to slatkin_test(), and must
+    not have other side effects.  If compute() (a function of no arguments) is given, it is then called with the
+    results available to slatkin_test() even if the cache is too small to hold all of them, and its value is
+    returned.
+    """
+    global _collected_inputs, _precomputed_results
+    _collected_inputs = []
+    try:
+        collect()
+        inputs = _collected_inputs
+    finally:
+        _collected_inputs = None
+
+    cache = get_slatkin_cache()
+    mode = _get_mode()
+    keys = OrderedDict()
+    for counts in inputs:
+        keys[cache.make_key(counts, mode)] = True
+
+    log.debug("Running %s Slatkin tests in parallel", len(keys))
+    tasks = [(list(key[0]), montecarlo_replicates, adaptive_precision, adaptive_batch_size) for key in keys]
+    results = dict()
+    for key, result in zip(keys, pool.map(_run_montecarlo_task, tasks)):
+        cache.put(key, result)
+        results[key] = result
+
+    if compute is None:
+        return None
+    _precomputed_results = results
+    try:
+        return compute()
+    finally:
+        _precomputed_results = None
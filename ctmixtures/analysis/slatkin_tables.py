@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Precomputed exact tables for the Slatkin exact test, at the (small, fixed) sample sizes studied.
+
+For a sample of n genes holding k alleles, the Ewens sampling formula conditional on k gives the probability of
+an allele configuration with a_j alleles represented j times as
+
+    P(a | k) = n! / ( |S(n,k)| * prod_j j^a_j a_j! )
+
+where S(n,k) is a Stirling number of the first kind.  Slatkin's test statistic is the tail probability: the sum
+of P(a' | k) over all configurations a' with k alleles and P(a' | k) <= P(a | k).  Since the configurations of n
+genes are the integer partitions of n, the tail probability of every configuration can be computed exactly by
+enumerating the partitions once, and stored in an array indexed by the rank of each partition.  The number of
+partitions grows quickly (p(50) = 204,226, but p(80) is nearly 16 million), so tables are built only for sample
+sizes up to a limit, and larger samples fall back to Monte Carlo.
+
+"""
+
+import logging as log
+import math as m
+
+import numpy as np
+
+
+# partitions up to this size are enumerated by default
+DEFAULT_MAX_TABULATED_SIZE = 50
+
+# relative tolerance for treating two configuration probabilities as equal
+_TIE_TOLERANCE = 1e-9
+
+
+def partition_counts_table(nmax):
+    """
+    Returns a table t where t[n][m] is the number of partitions of n into parts no larger than m, for
+    0 <= n, m <= nmax.
+    """
+    table = [[0] * (nmax + 1) for n in xrange(nmax + 1)]
+    for part_max in xrange(nmax + 1):
+        table[0][part_max] = 1
+    for n in xrange(1, nmax + 1):
+        for part_max in xrange(1, nmax + 1):
+            table[n][part_max] = table[n][part_max - 1]
+            if part_max <= n:
+                table[n][part_max] += table[n - part_max][part_max]
+    return table
+
+
+def partitions(n, part_max=None):
+    """
+    Generates the partitions of n as lists of parts in descending order, with the largest first part first.
+    The position of a partition in this sequence is its rank (see partition_rank()).
+    """
+    if part_max is None:
+        part_max = n
+    if n == 0:
+        yield []
+        return
+    for first in xrange(min(n, part_max), 0, -1):
+        for rest in partitions(n - first, first):
+            yield [first] + rest
+
+
+def partition_rank(parts, table):
+    """
+    Returns the position of a partition (a list of parts in descending order) in the sequence generated
+    by partitions(), using a table from partition_counts_table().
+    """
+    n = sum(parts)
+    part_max = n
+    rank = 0
+    for part in parts:
+        # partitions of the remainder which start with a larger part come first
+        rank += sum(table[n - larger][larger] for larger in xrange(part + 1, min(n, part_max) + 1))
+        n -= part
+        part_max = part
+    return rank
+
+
+def log_unsigned_stirling_first_kind(n):
+    """
+    Returns a list of log |S(n,k)| for k = 0..n (with -inf where the number is zero).
+    """
+    row = [1]
+    for i in xrange(n):
+        # |S(i+1,k)| = i * |S(i,k)| + |S(i,k-1)|
+        row = [i * (row[k] if k < len(row) else 0) + (row[k - 1] if k > 0 else 0) for k in xrange(len(row) + 1)]
+    return [m.log(s) if s > 0 else float('-inf') for s in row]
+
+
+def estimate_theta(n, k):
+    """
+    Returns the estimate of theta given by solving k = sum_{i=0}^{n-1} theta / (theta + i), as in Ewens (1972).
+    """
+    if k <= 1:
+        return 0.0
+    if k >= n:
+        return float('inf')
+    expected = lambda theta: sum(theta / (theta + i) for i in xrange(n))
+    (low, high) = (0.0, 1.0)
+    while expected(high) < k:
+        high *= 2.0
+    for i in xrange(100):
+        mid = (low + high) / 2.0
+        if expected(mid) < k:
+            low = mid
+        else:
+            high = mid
+    return (low + high) / 2.0
+
+
+def build_slatkin_table(n):
+    """
+    Returns a tuple of arrays (tail, theta), where tail[r] is the Slatkin exact test tail probability of the
+    partition of n with rank r, and theta[k] is the estimate of theta for k alleles.
+    """
+    log_stirling = log_unsigned_stirling_first_kind(n)
+    log_nfact = m.lgamma(n + 1)
+
+    num_alleles = []
+    log_prob = []
+    for parts in partitions(n):
+        multiplicities = dict()
+        for part in parts:
+            multiplicities[part] = multiplicities.get(part, 0) + 1
+        k = len(parts)
+        lp = log_nfact - log_stirling[k]
+        for j, a_j in multiplicities.iteritems():
+            lp -= a_j * m.log(j) + m.lgamma(a_j + 1)
+        num_alleles.append(k)
+        log_prob.append(lp)
+
+    num_alleles = np.array(num_alleles)
+    log_prob = np.array(log_prob)
+    tail = np.empty(len(log_prob))
+    for k in xrange(1, n + 1):
+        ranks = np.nonzero(num_alleles == k)[0]
+        order = ranks[np.argsort(log_prob[ranks], kind='mergesort')]
+        cumulative = np.cumsum(np.exp(log_prob[order]))
+        # configurations tied in probability all take the tail probability through the last of the tie
+        sorted_lp = log_prob[order]
+        group_end = np.empty(len(order), dtype=np.int64)
+        end = len(order) - 1
+        for i in xrange(len(order) - 1, -1, -1):
+            if i < len(order) - 1 and sorted_lp[i + 1] - sorted_lp[i] > _TIE_TOLERANCE:
+                end = i
+            group_end[i] = end
+        tail[order] = np.minimum(cumulative[group_end], 1.0)
+
+    theta = np.array([estimate_theta(n, k) for k in xrange(n + 1)])
+    return (tail, theta)
+
+
+class SlatkinExactTables(object):
+    """
+    Exact Slatkin test tail probabilities for every configuration at a set of sample sizes, stored in a single
+    numpy .npz file with one array of tail probabilities (indexed by partition rank) and one array of theta
+    estimates (indexed by number of alleles) per sample size.
+    """
+
+    def __init__(self, tables):
+        self.tables = tables
+        nmax = max(tables.keys()) if tables else 0
+        self._partition_counts = partition_counts_table(nmax)
+
+    @classmethod
+    def build(cls, sample_sizes, max_size=DEFAULT_MAX_TABULATED_SIZE):
+        tables = dict()
+        for n in sorted(set(sample_sizes)):
+            if n > max_size:
+                log.info("Not tabulating Slatkin test for sample size %s, larger than %s", n, max_size)
+                continue
+            log.info("Tabulating Slatkin test for sample size %s", n)
+            tables[n] = build_slatkin_table(n)
+        return cls(tables)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        tables = dict()
+        for n in data['sample_sizes'].tolist():
+            tables[n] = (data['tail_%s' % n], data['theta_%s' % n])
+        return cls(tables)
+
+    def save(self, path):
+        arrays = dict(sample_sizes=np.array(sorted(self.tables.keys()), dtype=np.int64))
+        for n, (tail, theta) in self.tables.iteritems():
+            arrays['tail_%s' % n] = tail
+            arrays['theta_%s' % n] = theta
+        np.savez_compressed(path, **arrays)
+
+    def get_sample_sizes(self):
+        return sorted(self.tables.keys())
+
+    def lookup(self, count_list):
+        """
+        Returns a tuple (probability, theta) for a list of counts, or None if their total is not tabulated.
+        """
+        parts = sorted([int(c) for c in count_list if c > 0], reverse=True)
+        n = sum(parts)
+        if n not in self.tables:
+            return None
+        (tail, theta) = self.tables[n]
+        return (float(tail[partition_rank(parts, self._partition_counts)]), float(theta[len(parts)]))
+
+
+# the tables consulted by slatkin_test(), if any; simulation scripts load them from the simulation configuration
+slatkin_tables = None
+
+
+def configure_slatkin_tables(path):
+    """
+    Loads the tables used by slatkin_test() from an .npz file written by SlatkinExactTables.save(), or
+    stops using tables if path is None.
+    """
+    global slatkin_tables
+    if path is None:
+        slatkin_tables = None
+    else:
+        slatkin_tables = SlatkinExactTables.load(path)
+        log.debug("Loaded exact Slatkin tables for sample sizes: %s", slatkin_tables.get_sample_sizes())
+
+
+def get_slatkin_tables():
+    return slatkin_tables
@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Columnar container for statistics measured over several dimensions (e.g., TA interval x locus x sample size),
+replacing nested string-keyed dicts such as {interval: {locus: {ssize: value}}}.  Values are held in one numpy
+array, with a name and a list of labels for each axis, and are stored in the database as a compact document of
+flat lists, which the exporter reads back without walking nested dicts.
+
+"""
+
+import numpy as np
+
+
+# axis names used by the analyzers
+INTERVAL = 'interval'
+LOCUS = 'locus'
+SSIZE = 'ssize'
+
+
+def _value(value):
+    # numpy scalars to Python values, while the list and dict entries of object arrays are returned as they are
+    if isinstance(value, (np.generic, np.ndarray)):
+        return value.item()
+    return value
+
+
+def _normalize_label(label):
+    # labels from stored documents and nested dicts are strings, so integer labels are kept as integers
+    try:
+        return int(label)
+    except (TypeError, ValueError):
+        return label
+
+
+class StatisticArray(object):
+    """
+    A numpy array of statistic values with labelled axes.  axes is a tuple of axis names, labels a list with the
+    sorted labels of each axis, and values an array whose shape matches the labels.  Integer statistics (e.g.,
+    richness) are held in an integer array, other statistics in a float array, with NaN for missing entries.
+    Entries which are lists or dicts (e.g., the unlabeled frequency list, or the trait counts, of each interval,
+    locus and sample size) are held in an object array, with None for missing entries.  Dict entries are stored
+    in the database as they are, so their keys should be strings.
+
+    Indexing by a label of the first axis (as a string or integer) returns the values for that label, so code
+    written for the nested dicts (e.g., stats[str(interval)][str(locus)]) continues to work.
+    """
+
+    def __init__(self, axes, labels, values):
+        self.axes = tuple(axes)
+        self.labels = [[_normalize_label(label) for label in axis_labels] for axis_labels in labels]
+        self.values = np.asarray(values)
+        self._positions = [dict((label, i) for i, label in enumerate(axis_labels)) for axis_labels in self.labels]
+
+    @classmethod
+    def from_items(cls, axes, items):
+        """
+        Constructs an array from a list of (key tuple, value) pairs, with one key per axis.
+        """
+        items = [(tuple(_normalize_label(k) for k in key), value) for key, value in items]
+        labels = [sorted(set(key[i] for key, value in items)) for i in xrange(len(axes))]
+        positions = [dict((label, i) for i, label in enumerate(axis_labels)) for axis_labels in labels]
+        shape = tuple(len(axis_labels) for axis_labels in labels)
+
+        integral = all(isinstance(value, (int, long, np.integer)) for key, value in items)
+        if any(isinstance(value, (list, dict)) for key, value in items):
+            values = np.empty(shape, dtype=object)
+        elif integral and len(items) == int(np.prod(shape)):
+            values = np.zeros(shape, dtype=np.int64)
+        else:
+            values = np.empty(shape, dtype=np.float64)
+            values.fill(np.nan)
+        for key, value in items:
+            values[tuple(positions[i][k] for i, k in enumerate(key))] = value
+        return cls(axes, labels, values)
+
+    @classmethod
+    def from_nested(cls, nested, axes):
+        """
+        Constructs an array from nested dicts (and lists, whose positions are their labels), one level per axis.
+        """
+        items = []
+
+        def walk(level, key):
+            if len(key) == len(axes):
+                items.append((key, level))
+                return
+            entries = level.items() if isinstance(level, dict) else enumerate(level)
+            for label, sublevel in entries:
+                walk(sublevel, key + (label,))
+
+        walk(nested, ())
+        return cls.from_items(axes, items)
+
+    @classmethod
+    def from_document(cls, document, axes=None):
+        """
+        Constructs an array from a document written by to_document(), or from nested dicts in the format stored
+        before this container existed, in which case axes must be given.
+        """
+        if isinstance(document, dict) and 'axes' in document and 'values' in document:
+            shape = tuple(len(axis_labels) for axis_labels in document['labels'])
+            dtype = document.get('dtype', 'float64')
+            if dtype == 'object':
+                # element by element, so that lists of equal length are not made into another axis
+                values = np.empty(len(document['values']), dtype=object)
+                for i, value in enumerate(document['values']):
+                    values[i] = value
+                values = values.reshape(shape)
+            else:
+                values = np.array(document['values'], dtype=dtype).reshape(shape)
+            return cls(document['axes'], document['labels'], values)
+        return cls.from_nested(document, axes)
+
+    def to_document(self):
+        """
+        Returns a compact, database-ready representation:  axis names, labels, and the values as a flat list.
+        """
+        return dict(axes=list(self.axes),
+                    labels=[list(axis_labels) for axis_labels in self.labels],
+                    dtype=str(self.values.dtype),
+                    values=self.values.ravel().tolist())
+
+    def to_nested(self):
+        """
+        Returns the values as nested dicts with string keys, in the format the analyzers used to return.
+        """
+        def build(values, depth):
+            if depth == len(self.axes):
+                return _value(values)
+            return dict((str(label), build(values[i], depth + 1)) for i, label in enumerate(self.labels[depth]))
+        return build(self.values, 0)
+
+    def entries(self):
+        """
+        Returns a list of (key tuple, value) pairs, one for each entry, in the form taken by from_items().
+        """
+        keys = [()]
+        for axis_labels in self.labels:
+            keys = [key + (label,) for key in keys for label in axis_labels]
+        return zip(keys, [_value(value) for value in self.values.ravel()])
+
+    def get_labels(self, axis):
+        return list(self.labels[self.axes.index(axis)])
+
+    def select(self, **labels):
+        """
+        Returns the values for the given label of each named axis, e.g., select(interval=10, ssize=20) returns a
+        numpy array over the remaining axes (here, loci), or a scalar if every axis is given.
+        """
+        index = []
+        for i, axis in enumerate(self.axes):
+            if axis in labels:
+                index.append(self._positions[i][_normalize_label(labels[axis])])
+            else:
+                index.append(slice(None))
+        return self.values[tuple(index)]
+
+    def __getitem__(self, label):
+        values = self.values[self._positions[0][_normalize_label(label)]]
+        if len(self.axes) == 1:
+            return _value(values)
+        return StatisticArray(self.axes[1:], self.labels[1:], values)
+
+    def __len__(self):
+        return len(self.labels[0])
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def keys(self):
+        return [str(label) for label in self.labels[0]]
+
+    def __repr__(self):
+        return "StatisticArray(axes=%s, labels=%s, values=%s)" % (self.axes, self.labels, self.values.tolist())
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Batched subsampling of count maps without replacement.  Taking a sample of n items from counts N_1..N_k is a
+multivariate hypergeometric draw, so the counts are never expanded into individual items, however large they
+are (e.g., time averaged counts, which sum a count over every tick of a window).
+
+The draw uses the conditional (marginal) construction: X_1 ~ Hypergeometric(N_1, N - N_1, n), then X_2 from the
+remaining items and sample, and so on.  Every row of a count matrix (e.g., every interval x locus x sample size)
+advances one category at a time, so a whole matrix costs one vectorized numpy.random.hypergeometric call per
+category, drawing from the global numpy RNG which the simulation scripts seed.  sample_counters() draws count maps
+of similar widths together, so that each matrix is padded only to the widest map of its group.
+
+"""
+
+from collections import Counter, defaultdict
+
+import numpy as np
+import numpy.random as npr
+
+
+def sample_count_matrix(counts, sample_sizes):
+    """
+    Returns an integer matrix of the same shape as counts (rows x categories), where row r is a sample of
+    sample_sizes[r] items drawn without replacement from the counts in row r.  Sample sizes larger than the
+    total of a row are reduced to the total.
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    (num_rows, num_categories) = counts.shape
+    sampled = np.zeros(counts.shape, dtype=np.int64)
+    remaining_items = counts.sum(axis=1)
+    remaining_sample = np.minimum(np.asarray(sample_sizes, dtype=np.int64), remaining_items)
+
+    for j in xrange(num_categories):
+        good = counts[:, j]
+        bad = remaining_items - good
+        # numpy requires a sample of at least one, so rows which are done (or have none of this category) skip
+        active = (remaining_sample > 0) & (good > 0)
+        if not active.any():
+            remaining_items -= good
+            continue
+        drawn = np.zeros(num_rows, dtype=np.int64)
+        drawn[active] = npr.hypergeometric(good[active], bad[active], remaining_sample[active])
+        sampled[:, j] = drawn
+        remaining_sample -= drawn
+        remaining_items -= good
+
+    return sampled
+
+
+def _width_class(width):
+    # counters whose widths are within the same power of two are drawn together
+    return int(max(width - 1, 0)).bit_length()
+
+
+def sample_counters(counters, ssize_list):
+    """
+    Takes a list of count maps (dicts or Counters of key:count), and returns a list with a dict of
+    ssize:Counter for each map, holding a sample of each size drawn without replacement from the map.  The maps
+    are grouped by their number of keys, to within a factor of two, and every map and sample size in a group is
+    drawn in one batched call to sample_count_matrix(), so a few wide maps (e.g., configuration counts) do not
+    pad the rows of the many narrow ones.
+    """
+    keys = [list(counter.keys()) for counter in counters]
+    groups = defaultdict(list)
+    for i, counter_keys in enumerate(keys):
+        groups[_width_class(len(counter_keys))].append(i)
+
+    result = [None] * len(counters)
+    for width_class in sorted(groups):
+        members = groups[width_class]
+        width = max(len(keys[i]) for i in members)
+        counts = np.zeros((len(members) * len(ssize_list), width), dtype=np.int64)
+        sizes = np.tile(np.asarray(ssize_list, dtype=np.int64), len(members))
+        for m, i in enumerate(members):
+            counts[m * len(ssize_list):(m + 1) * len(ssize_list), :len(keys[i])] = [counters[i][key]
+                                                                                  for key in keys[i]]
+
+        sampled = sample_count_matrix(counts, sizes)
+
+        for m, i in enumerate(members):
+            by_ssize = dict()
+            for s, ssize in enumerate(ssize_list):
+                row = sampled[m * len(ssize_list) + s]
+                by_ssize[ssize] = Counter(dict((key, int(row[j])) for j, key in enumerate(keys[i]) if row[j] > 0))
+            result[i] = by_ssize
+    return result
+
+
+def get_sampled_counter(ssize_list, counter):
+    """
+    Returns a dict of ssize:Counter, with a sample of each size drawn without replacement from a count map.
+    """
+    return sample_counters([counter], ssize_list)[0]
@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Time averaging of trait and configuration counts, implemented natively rather than through the pytransmission
+TimeAverager classes.  The class here has the same constructor and method signatures as
+pytransmission.aggregation.MoranCumulativeTimeAverager, so it can be selected through TIME_AVERAGING_CLASS.
+
+"""
+
+from collections import Counter
+
+
+class PiecewiseConstantTimeAverager(object):
+    """
+    Accumulates trait counts and configuration counts over a set of time averaging windows, where the result
+    for each window is the sum, over every tick in the window, of the count of each trait at that tick (i.e., the
+    integral of a piecewise constant count over time).  Window durations are given in generations, and a window
+    of d generations covers d * popsize ticks.  If ending_interval is True, each window starts at index_time and
+    covers [index_time, index_time + d * popsize), otherwise each window ends at index_time and covers
+    [index_time - d * popsize, index_time).
+
+    Trait counts only change at copying and innovation events, and most ticks change at most one or two counts.
+    So instead of adding full count maps on every tick, the averager stores the current count of each trait
+    and the tick since which it has held, and credits count x duration only when a count changes
+    (record_trait_count_changes()).  Open segments are closed analytically when results are requested.  The
+    cost is proportional to the number of change events, not to ticks x traits.
+
+    The windows of an averager are nested (they share a start tick, or an end tick), so the averager keeps a
+    single cumulative track of count x duration for each trait, and snapshots it as time passes each window
+    boundary.  The result for a window is the difference between the snapshots at its end and its start, so
+    adding durations costs one snapshot each, rather than another accumulation on every change.
+
+    record_trait_count_sample() is also supported, for callers which pass full count maps, and treats the maps
+    as the state of the population from that tick onward.
+    """
+
+    records_trait_count_changes = True
+
+    def __init__(self, index_time, interval_list, popsize, num_loci, ending_interval=True):
+        self.index_time = index_time
+        self.interval_list = interval_list
+        self.popsize = popsize
+        self.num_loci = num_loci
+        self.ending_interval = ending_interval
+
+        self.windows = dict()
+        for interval in interval_list:
+            ticks = interval * popsize
+            if ending_interval:
+                self.windows[interval] = (index_time, index_time + ticks)
+            else:
+                self.windows[interval] = (index_time - ticks, index_time)
+
+        self.earliest_tick = min(start for (start, end) in self.windows.values())
+        self.latest_tick = max(end for (start, end) in self.windows.values())
+
+        # window start and end ticks not yet passed, in order, and the cumulative tracks at boundaries passed
+        self._boundaries = sorted(set(tick for window in self.windows.values() for tick in window))
+        self._snapshots = dict()
+
+        # current counts, and the tick since which each count has held, by locus and for configurations
+        self._current = None
+        self._since = None
+        self._config_current = None
+        self._config_since = None
+        self._last_timestep = None
+
+        # cumulative count x ticks since the averager started
+        self._area = [Counter() for locus in xrange(num_loci)]
+        self._config_area = Counter()
+
+
+    def get_interval_tuples(self):
+        return [self.windows[interval] for interval in self.interval_list]
+
+    def get_earliest_tick_for_all_intervals(self):
+        return self.earliest_tick
+
+    def get_latest_tick_for_all_intervals(self):
+        return self.latest_tick
+
+    def is_within_intervals(self, timestep):
+        return self.earliest_tick <= timestep < self.latest_tick
+
+    def is_started(self):
+        return self._current is not None
+
+
+    def record_trait_count_sample(self, timestep, countmap, config_counts):
+        """
+        Records the full trait counts (a dict of locus:dict of trait:count) and configuration counts
+        (a dict of configuration:count) of the population at timestep.
+        """
+        if self.is_started():
+            self._pass_boundaries(timestep)
+            self._close_segments(timestep)
+        self._current = [dict(countmap[locus]) for locus in xrange(self.num_loci)]
+        self._since = [dict.fromkeys(self._current[locus], timestep) for locus in xrange(self.num_loci)]
+        self._config_current = dict(config_counts)
+        self._config_since = dict.fromkeys(self._config_current, timestep)
+        self._last_timestep = timestep
+
+
+    def record_trait_count_changes(self, timestep, changes):
+        """
+        Records the changes to trait counts which took effect at timestep, as a list of tuples
+        (locus, old_trait, new_trait, old_configuration, new_configuration).  The averager must already have
+        been started with a full sample, by record_trait_count_sample().
+        """
+        if self._boundaries and self._boundaries[0] <= timestep:
+            self._pass_boundaries(timestep)
+
+        current = self._current
+        since = self._since
+        for (locus, old_trait, new_trait, old_config, new_config) in changes:
+            self._change_count(self._area[locus], current[locus], since[locus], old_trait, -1, timestep)
+            self._change_count(self._area[locus], current[locus], since[locus], new_trait, 1, timestep)
+            self._change_count(self._config_area, self._config_current, self._config_since, old_config, -1, timestep)
+            self._change_count(self._config_area, self._config_current, self._config_since, new_config, 1, timestep)
+        self._last_timestep = timestep
+
+
+    def _change_count(self, area, current, since, key, delta, timestep):
+        count = current.get(key, 0)
+        if count > 0:
+            # credit the count which held over ticks [since, timestep)
+            area[key] += count * (timestep - since[key])
+        count += delta
+        if count == 0:
+            del current[key]
+            del since[key]
+        else:
+            current[key] = count
+            since[key] = timestep
+
+
+    def _close_segments(self, end_tick):
+        for locus in xrange(self.num_loci):
+            area = self._area[locus]
+            since = self._since[locus]
+            for trait, count in self._current[locus].iteritems():
+                area[trait] += count * (end_tick - since[trait])
+                since[trait] = end_tick
+        for config, count in self._config_current.iteritems():
+            self._config_area[config] += count * (end_tick - self._config_since[config])
+            self._config_since[config] = end_tick
+
+
+    def _pass_boundaries(self, timestep):
+        """
+        Snapshots the cumulative tracks at each window boundary at or before timestep.  The current counts
+        have held since the previous record, so each snapshot covers exactly the ticks before its boundary.
+        """
+        while self._boundaries and self._boundaries[0] <= timestep:
+            boundary = self._boundaries.pop(0)
+            self._close_segments(boundary)
+            self._snapshots[boundary] = ([Counter(area) for area in self._area], Counter(self._config_area))
+
+
+    def _get_snapshot(self, tick):
+        # boundaries not yet passed fall after the last recorded tick, so the current tracks apply
+        if tick in self._snapshots:
+            return self._snapshots[tick]
+        return (self._area, self._config_area)
+
+
+    def _close_open_segments(self):
+        # the current counts hold through the last recorded tick
+        if self.is_started():
+            self._close_segments(self._last_timestep + 1)
+
+
+    def get_counts_for_generation_intervals(self):
+        """
+        Returns a dict of interval:dict of locus:Counter of trait:accumulated count.
+        """
+        self._close_open_segments()
+        result = dict()
+        for interval in self.interval_list:
+            (start, end) = self.windows[interval]
+            (start_area, start_config) = self._get_snapshot(start)
+            (end_area, end_config) = self._get_snapshot(end)
+            result[interval] = dict((locus, end_area[locus] - start_area[locus]) for locus in xrange(self.num_loci))
+        return result
+
+
+    def get_configuration_counts_for_generation_intervals(self):
+        """
+        Returns a dict of interval:Counter of configuration:accumulated count.
+        """
+        self._close_open_segments()
+        result = dict()
+        for interval in self.interval_list:
+            (start, end) = self.windows[interval]
+            (start_area, start_config) = self._get_snapshot(start)
+            (end_area, end_config) = self._get_snapshot(end)
+            result[interval] = end_config - start_config
+        return result
@@ -8,6 +8,13 @@ Description here
 
 """
 from ctmixtures.data.dbutils import *
+from ctmixtures.data.storage import (MONGODB, SQLITE, INSERTION_WATERMARK_LAG, SQLiteDocumentStore, configure_storage,
+                                     get_sqlite_store, get_storage_label, get_worker_sqlite_path, insert_documents,
+                                     find_documents, find_document, get_insertion_watermark, find_run_ids,
+                                     get_run_id_ranges, merge_sqlite_stores)
+from ctmixtures.data.write_behind import (WriteBehindWriter, configure_write_behind, get_write_behind_writer,
+                                          insert_document, flush_write_behind)
+from ctmixtures.data.summary_stats import get_population_summary, get_sampled_summary, get_ta_sampled_summary
 from ctmixtures.data.simulation_timing import SimulationTiming, store_simulation_timing
 from ctmixtures.data.mixture_model_stats import MixtureModelStats, store_stats_mixture_model
 
@@ -16,6 +16,8 @@ from ming import Session, Field, schema
 from ming.declarative import Document
 
 from ctmixtures.data.dbutils import generate_collection_id
+from ctmixtures.data.write_behind import insert_document
+from ctmixtures.data.summary_stats import get_population_summary, get_sampled_summary, get_ta_sampled_summary
 
 
 __author__ = 'mark'
@@ -34,6 +36,13 @@ def _get_collection_id():
 
 
 
+def _to_document(value):
+    # columnar statistics (ctmixtures.analysis.StatisticArray) are stored in their compact document form
+    if hasattr(value, 'to_document'):
+        return value.to_document()
+    return value
+
+
 def store_stats_mixture_model(config, timestep, num_configs,
                                  config_counts,slatkin,entropy,iqv,
                                  unlabeled_freq, unlabeled_count, conf_slatkin,richness,
@@ -42,10 +51,17 @@ def store_stats_mixture_model(config, timestep, num_configs,
                                  kandler_interval,kandler_remaining_count,unlab_freq_tassize,
                                  richness_tassize,slatkin_tassize,entropy_tassize,iqv_tassize,
                                  unlab_ccount_tassize,config_richness_tassize,config_slatkin_tassize,
-                                 config_entropy_tassize,config_iqv_tassize,kandler_remaining_tassize):
-    """Stores the parameters and metadata for a simulation run in the database.
+                                 config_entropy_tassize,config_iqv_tassize,kandler_remaining_tassize,
+                                 slatkin_replicates=None):
+    """Stores the parameters and metadata for a simulation run in the database.  Statistics given as
+    StatisticArray objects are stored as compact documents of axis labels and flat value lists, which the
+    exporter reads with StatisticArray.from_document().  The summary statistics which the exporter writes
+    (see ctmixtures.data.summary_stats) are computed here, while the data are in memory, and stored alongside
+    the raw statistics.  slatkin_replicates, if given, is a dict of the number of Monte Carlo replicates behind
+    each Slatkin statistic, keyed by the statistic's field (see PopulationTraitAnalyzer.get_slatkin_replicates()),
+    and is stored with the record.  The document is queued for a bulk insert if write-behind storage is configured.
     """
-    MixtureModelStats(dict(
+    record = dict(
         simulation_run_id = config.sim_id,
         sample_time = timestep,
         script_filename = config.script,
@@ -73,28 +89,35 @@ def store_stats_mixture_model(config, timestep, num_configs,
         unlabeled_counts = unlabeled_count,
         configuration_slatkin = conf_slatkin,
         pop_richness = richness,
-        unlabeled_counts_ssize = unlabeled_count_ssize,
-        unlabeled_freq_ssize = unlabeled_freq_ssize,
-        unlabeled_config_counts_ssize = unlabeled_config_ssize,
-        config_slatkin_ssize = config_slatkin_ssize,
-        entropy_ssize = entropy_ssize,
-        iqv_ssize = iqv_ssize,
-        slatkin_ssize = slatkin_ssize,
-        richness_ssize = richness_ssize,
+        unlabeled_counts_ssize = _to_document(unlabeled_count_ssize),
+        unlabeled_freq_ssize = _to_document(unlabeled_freq_ssize),
+        unlabeled_config_counts_ssize = _to_document(unlabeled_config_ssize),
+        config_slatkin_ssize = _to_document(config_slatkin_ssize),
+        entropy_ssize = _to_document(entropy_ssize),
+        iqv_ssize = _to_document(iqv_ssize),
+        slatkin_ssize = _to_document(slatkin_ssize),
+        richness_ssize = _to_document(richness_ssize),
         kandler_interval = kandler_interval,
         kandler_remaining_count = kandler_remaining_count,
-        unlabeled_freq_ta_ssize = unlab_freq_tassize,
-        richness_ta_ssize = richness_tassize,
-        slatkin_ta_ssize = slatkin_tassize,
-        entropy_ta_ssize = entropy_tassize,
-        iqv_ta_ssize = iqv_tassize,
-        unlabeled_config_counts_ta_ssize = unlab_ccount_tassize,
-        num_configurations_ta_ssize = config_richness_tassize,
-        config_slatkin_ta_ssize = config_slatkin_tassize,
-        config_entropy_ta_ssize = config_entropy_tassize,
-        config_iqv_ta_ssize = config_iqv_tassize,
-        kandler_remaining_tassize = kandler_remaining_tassize
-        )).m.insert()
+        unlabeled_freq_ta_ssize = _to_document(unlab_freq_tassize),
+        richness_ta_ssize = _to_document(richness_tassize),
+        slatkin_ta_ssize = _to_document(slatkin_tassize),
+        entropy_ta_ssize = _to_document(entropy_tassize),
+        iqv_ta_ssize = _to_document(iqv_tassize),
+        unlabeled_config_counts_ta_ssize = _to_document(unlab_ccount_tassize),
+        num_configurations_ta_ssize = _to_document(config_richness_tassize),
+        config_slatkin_ta_ssize = _to_document(config_slatkin_tassize),
+        config_entropy_ta_ssize = _to_document(config_entropy_tassize),
+        config_iqv_ta_ssize = _to_document(config_iqv_tassize),
+        kandler_remaining_tassize = _to_document(kandler_remaining_tassize)
+        )
+    if slatkin_replicates is not None:
+        record['slatkin_replicates'] = dict((field, _to_document(replicates))
+                                            for field, replicates in slatkin_replicates.items())
+    record['population_summary'] = get_population_summary(record)
+    record['sampled_summary'] = get_sampled_summary(record)
+    record['ta_sampled_summary'] = get_ta_sampled_summary(record)
+    insert_document(MixtureModelStats(record))
     return True
 
 
@@ -225,6 +248,16 @@ class MixtureModelStats(Document):
     config_iqv_ta_ssize = Field(schema.Anything)
     kandler_remaining_tassize = Field(schema.Anything)
 
+    # summary statistics computed when the record is stored:  a dict for the population, and lists of dicts,
+    # one for each sample size, and for each TA interval and sample size
+    population_summary = Field(schema.Anything)
+    sampled_summary = Field(schema.Anything)
+    ta_sampled_summary = Field(schema.Anything)
+
+    # the number of Monte Carlo replicates behind each Slatkin statistic, keyed by the statistic's field, and
+    # zero where exact tables answered the test
+    slatkin_replicates = Field(schema.Anything)
+
 
 # TODO - add final set of fields to storage function above
 
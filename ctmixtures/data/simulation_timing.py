@@ -16,6 +16,7 @@ from ming import Session, Field, schema
 from ming.declarative import Document
 
 from ctmixtures.data.dbutils import generate_collection_id
+from ctmixtures.data.write_behind import insert_document
 
 
 __author__ = 'mark'
@@ -39,7 +40,7 @@ def store_simulation_timing(sim_id,rulemap,popclass,script,exp,elapsed,length,po
     """Stores the parameters and metadata for a simulation run in the database.
 
     """
-    SimulationTiming(dict(
+    insert_document(SimulationTiming(dict(
         script_filename = script,
         rule_class = str(rulemap),
         pop_class = popclass,
@@ -48,7 +49,7 @@ def store_simulation_timing(sim_id,rulemap,popclass,script,exp,elapsed,length,po
         elapsed_time = elapsed,
         run_length = length,
         popsize = popsize
-    )).m.insert()
+    )))
     return True
 
 
@@ -0,0 +1,320 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Storage backends for data objects.  By default documents are stored in MongoDB through Ming.  Alternatively,
+documents can be stored in a local SQLite file, so that simulation runs on compute nodes need no database
+server:  each worker writes its own file, and the files are merged into one with merge_sqlite_stores() before
+export.  Documents are validated against their Ming schema with either backend, so records read back have the
+same fields and types.
+
+"""
+
+import datetime
+import logging as log
+import os
+import socket
+import sqlite3
+import threading
+
+from bson import json_util
+from bson.objectid import ObjectId
+
+from ctmixtures.data import dbutils
+
+
+MONGODB = 'mongodb'
+SQLITE = 'sqlite'
+
+# seconds by which a MongoDB insertion watermark trails the clock, so that documents stored by other hosts
+# around the time it is taken (whose ObjectIds may sort below it) are left for the next watermark
+INSERTION_WATERMARK_LAG = 300
+
+
+class SQLiteDocumentStore(object):
+    """
+    Stores documents as JSON text (in MongoDB extended JSON, so that ObjectIds and dates survive) in an SQLite
+    file, in a single table keyed by collection name and document _id.  Documents are returned in insertion
+    order.  Inserting a document whose _id is already stored is ignored, so merges can be repeated safely.
+
+    The connection is shared by the threads of a process (e.g., the write-behind writer), under a lock, and
+    reopened in a forked child process.
+    """
+
+    page_size = 500
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = None
+        self._connection_pid = None
+
+    def _get_connection(self):
+        if self._connection is None or self._connection_pid != os.getpid():
+            self._connection = sqlite3.connect(self.path, timeout=60, check_same_thread=False)
+            self._connection_pid = os.getpid()
+            self._connection.execute("CREATE TABLE IF NOT EXISTS documents (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                                     "collection TEXT, object_id TEXT, simulation_run_id TEXT, document TEXT, "
+                                     "UNIQUE (collection, object_id))")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS documents_run_id ON documents "
+                                     "(collection, simulation_run_id)")
+            self._connection.commit()
+        return self._connection
+
+    def insert(self, collection, records):
+        """
+        Inserts a list of validated documents into a collection, in one transaction.
+        """
+        rows = [(collection, str(record['_id']), record.get('simulation_run_id'), json_util.dumps(record))
+                for record in records]
+        with self._lock:
+            conn = self._get_connection()
+            conn.executemany("INSERT OR IGNORE INTO documents (collection, object_id, simulation_run_id, document) "
+                             "VALUES (?, ?, ?, ?)", rows)
+            conn.commit()
+
+    def find(self, collection, run_id_range=None, insertion_range=None):
+        """
+        Returns an iterator over the documents (as dicts) in a collection, read from the file in pages.  If
+        run_id_range or insertion_range are given, only documents in those ranges are returned (see
+        find_documents()).
+        """
+        (conditions, params) = _get_range_conditions("simulation_run_id", run_id_range, ">=", "<")
+        (insertion_conditions, insertion_params) = _get_range_conditions("id", insertion_range, ">", "<=")
+        conditions += insertion_conditions
+        params += insertion_params
+        query = ("SELECT id, document FROM documents WHERE collection = ? AND id > ?%s "
+                 "ORDER BY id LIMIT ?" % conditions)
+        last_id = 0
+        while True:
+            with self._lock:
+                rows = self._get_connection().execute(query, (collection, last_id) + params +
+                                                      (self.page_size,)).fetchall()
+            if len(rows) == 0:
+                return
+            for (last_id, document) in rows:
+                yield json_util.loads(document)
+
+    def find_one(self, collection, object_id):
+        """
+        Returns the document in a collection with the given _id, or None.
+        """
+        with self._lock:
+            row = self._get_connection().execute("SELECT document FROM documents WHERE collection = ? AND "
+                                                 "object_id = ?", (collection, str(object_id))).fetchone()
+        if row is None:
+            return None
+        return json_util.loads(row[0])
+
+    def get_insertion_watermark(self, collection):
+        with self._lock:
+            return self._get_connection().execute("SELECT MAX(id) FROM documents WHERE collection = ?",
+                                                  (collection,)).fetchone()[0]
+
+    def find_run_ids(self, collection):
+        with self._lock:
+            rows = self._get_connection().execute("SELECT simulation_run_id FROM documents WHERE collection = ?",
+                                                  (collection,)).fetchall()
+        return [run_id for (run_id,) in rows]
+
+    def count(self, collection):
+        with self._lock:
+            return self._get_connection().execute("SELECT COUNT(*) FROM documents WHERE collection = ?",
+                                                  (collection,)).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+def _get_range_conditions(column, value_range, low_op, high_op):
+    conditions = ""
+    params = ()
+    if value_range is not None:
+        (low, high) = value_range
+        if low is not None:
+            conditions += " AND %s %s ?" % (column, low_op)
+            params += (low,)
+        if high is not None:
+            conditions += " AND %s %s ?" % (column, high_op)
+            params += (high,)
+    return (conditions, params)
+
+
+def _get_range_spec(value_range, low_op, high_op):
+    bounds = dict()
+    if value_range is not None:
+        (low, high) = value_range
+        if low is not None:
+            bounds[low_op] = low
+        if high is not None:
+            bounds[high_op] = high
+    return bounds
+
+
+def merge_sqlite_stores(target_path, source_paths):
+    """
+    Copies the documents in each of the SQLite files in source_paths into the file at target_path, which is
+    created if necessary.  Documents already in the target are skipped.  Returns the number of documents added.
+    """
+    target = SQLiteDocumentStore(target_path)
+    conn = target._get_connection()
+    added = 0
+    for path in source_paths:
+        if os.path.abspath(path) == os.path.abspath(target_path):
+            continue
+        conn.execute("ATTACH DATABASE ? AS source", (path,))
+        try:
+            cursor = conn.execute("INSERT OR IGNORE INTO documents (collection, object_id, simulation_run_id, document) "
+                                  "SELECT collection, object_id, simulation_run_id, document FROM source.documents "
+                                  "ORDER BY id")
+            added += cursor.rowcount
+            conn.commit()
+        finally:
+            conn.execute("DETACH DATABASE source")
+        log.debug("Merged %s into %s", path, target_path)
+    target.close()
+    return added
+
+
+# the SQLite store used in place of MongoDB, if configured by a simulation or export script
+sqlite_store = None
+
+
+def configure_storage(backend, path=None):
+    """
+    Selects the storage backend:  MONGODB (through Ming, which scripts configure separately), or SQLITE, with
+    documents stored in the SQLite file at path.
+    """
+    global sqlite_store
+    if backend == SQLITE:
+        sqlite_store = SQLiteDocumentStore(path)
+    elif backend == MONGODB:
+        sqlite_store = None
+    else:
+        raise ValueError("Unknown storage backend: %s" % backend)
+
+
+def get_storage_label():
+    """
+    Returns a label for the configured backend and database, which identifies the sequence of insertion
+    watermarks (see get_insertion_watermark()).
+    """
+    if sqlite_store is not None:
+        return "%s:%s" % (SQLITE, os.path.abspath(sqlite_store.path))
+    return "%s://%s:%s/%s" % (MONGODB, dbutils.dbhost, dbutils.dbport, dbutils.experiment_name)
+
+
+def get_worker_sqlite_path(experiment, directory="."):
+    """
+    Returns a path for the SQLite file of one worker process, unique to the experiment, host, and process.
+    """
+    filename = "%s-%s-%s.sqlite" % (experiment, socket.gethostname(), os.getpid())
+    return os.path.join(directory, filename)
+
+
+def get_sqlite_store():
+    return sqlite_store
+
+
+def insert_documents(cls, docs):
+    """
+    Inserts a list of documents of a Ming data object class, validated against its schema, in one bulk insert
+    into the configured backend.
+    """
+    records = [cls.m.make(dict(doc)) for doc in docs]
+    if sqlite_store is not None:
+        sqlite_store.insert(cls.m.collection_name, records)
+    else:
+        cls.m.collection.insert(records, safe=True)
+
+
+def find_documents(cls, fields=None, run_id_range=None, insertion_range=None):
+    """
+    Returns an iterable over every document of a Ming data object class in the configured backend.  If a list
+    of fields is given, documents hold only those fields (and _id), which for MongoDB are the only fields sent
+    by the server.  If run_id_range is given, as a tuple (low, high), only documents with low <= simulation_run_id
+    < high are returned, and if insertion_range is given, only documents stored after the insertion watermark
+    low, up to and including high.  Either bound of a range may be None for no bound.
+    """
+    if sqlite_store is not None:
+        documents = sqlite_store.find(cls.m.collection_name, run_id_range, insertion_range)
+        if fields is None:
+            return documents
+        return (_project(doc, fields) for doc in documents)
+
+    spec = dict()
+    run_id_bounds = _get_range_spec(run_id_range, '$gte', '$lt')
+    if len(run_id_bounds) > 0:
+        spec['simulation_run_id'] = run_id_bounds
+    insertion_bounds = _get_range_spec(insertion_range, '$gt', '$lte')
+    if len(insertion_bounds) > 0:
+        spec['_id'] = insertion_bounds
+    if fields is None:
+        return cls.m.find(spec, dict(timeout=False))
+    # documents were validated when stored, and validating again would fill in every unprojected field
+    return cls.m.find(spec, list(fields), timeout=False, validate=False)
+
+
+def _project(document, fields):
+    fields = set(fields) | set(['_id'])
+    return dict((k, v) for k, v in document.iteritems() if k in fields)
+
+
+def find_document(cls, object_id, fields=None):
+    """
+    Returns the document of a Ming data object class with the given _id from the configured backend, or None,
+    holding only the given fields (and _id) if a list of fields is given, as with find_documents().
+    """
+    if sqlite_store is not None:
+        document = sqlite_store.find_one(cls.m.collection_name, object_id)
+        if document is None or fields is None:
+            return document
+        return _project(document, fields)
+    return cls.m.collection.find_one(dict(_id=object_id), None if fields is None else list(fields))
+
+
+def get_insertion_watermark(cls, lag=INSERTION_WATERMARK_LAG):
+    """
+    Returns a value which orders documents of a Ming data object class by when they were stored, such that
+    every document stored later orders above it, or None if there are no documents.  For SQLite this is the row
+    id of the most recently stored document, which increases with every insert.
+
+    For MongoDB it is an _id.  ObjectIds are made by the storing host, and begin with its clock (in seconds),
+    followed by machine, process and counter bytes, so a document stored after the most recent _id was read can
+    still sort below it.  The watermark is therefore the most recent _id, but no later than the ObjectId of
+    lag seconds ago, and documents stored since then are left for the next watermark.  Documents are only
+    missed if they are stored by a host whose clock lags by more than lag seconds.
+    """
+    if sqlite_store is not None:
+        return sqlite_store.get_insertion_watermark(cls.m.collection_name)
+    latest = list(cls.m.collection.find(dict(), ['_id']).sort('_id', -1).limit(1))
+    if len(latest) == 0:
+        return None
+    settled = ObjectId.from_datetime(datetime.datetime.utcnow() - datetime.timedelta(seconds=lag))
+    return min(latest[0]['_id'], settled)
+
+
+def find_run_ids(cls):
+    """
+    Returns a list of the simulation_run_id of every document of a Ming data object class in the configured
+    backend.
+    """
+    if sqlite_store is not None:
+        return sqlite_store.find_run_ids(cls.m.collection_name)
+    return [doc['simulation_run_id'] for doc in find_documents(cls, ['simulation_run_id'])]
+
+
+def get_run_id_ranges(cls, num_shards):
+    """
+    Returns a list of at most num_shards (low, high) ranges of simulation_run_id, for find_documents(), which
+    together cover every document of a Ming data object class, with about the same number of documents in each.
+    The ranges are in order, so exporting each range and concatenating the results is deterministic.
+    """
+    run_ids = sorted(find_run_ids(cls))
+    bounds = sorted(set(run_ids[(len(run_ids) * i) // num_shards] for i in xrange(1, num_shards)))
+    return zip([None] + bounds, bounds + [None])
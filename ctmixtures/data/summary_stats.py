@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Summary statistics of a MixtureModelStats record, in the columns of the exported CSV files:  the min, max, and
+mean over loci of each per-locus statistic, and the diversity of trait configurations, for the whole population,
+for each sample size, and for each TA interval and sample size.  store_stats_mixture_model() computes them when
+a record is stored, and the exporter computes them from the raw fields for records stored before they existed.
+
+Each function takes a record (a dict of the stored fields) and returns plain Python values, so the results can
+be stored in the record itself.  Statistics which a run did not compute (stored as None, e.g., the TA fields of
+runs without time averaging) are left out of the summaries.
+
+"""
+
+import numpy as np
+
+from ctmixtures.analysis.diversity import batch_diversity, batch_neiman_tf
+from ctmixtures.analysis.statistic_array import StatisticArray, INTERVAL, LOCUS, SSIZE
+
+
+def _scalar(value):
+    # numpy scalars (e.g., from StatisticArray.select()) to Python values, for storage
+    return np.asarray(value).item()
+
+
+def _add_locus_summary(summary, name, values, suffix=""):
+    if values is None:
+        return
+    values = np.asarray(values).tolist()
+    summary['%s_locus_min%s' % (name, suffix)] = min(values)
+    summary['%s_locus_max%s' % (name, suffix)] = max(values)
+    summary['%s_locus_mean%s' % (name, suffix)] = float(np.average(values))
+
+
+def get_population_summary(record):
+    """
+    Returns a dict of the summary statistics of the whole population census.
+    """
+    summary = dict()
+    _add_locus_summary(summary, 'slatkin', record['slatkin_exact'])
+    _add_locus_summary(summary, 'entropy', record['shannon_entropy'])
+    _add_locus_summary(summary, 'iqv', record['iqv_diversity'])
+    _add_locus_summary(summary, 'richness', record['pop_richness'])
+    _add_locus_summary(summary, 'kandler', record['kandler_remaining_count'])
+
+    # entropy, IQV and Neiman's t_f of the trait configuration counts, in one kernel call
+    (entropy, iqv, richness, tf) = batch_diversity([record['trait_configuration_counts']])
+    summary['config_entropy'] = float(entropy[0])
+    summary['config_iqv'] = float(iqv[0])
+    summary['config_neiman_tf'] = float(tf[0])
+
+    num_loci = int(record['num_features'])
+    _add_locus_summary(summary, 'neiman_tf', batch_neiman_tf(record['unlabeled_frequencies'][:num_loci]))
+    return summary
+
+
+def get_sampled_summary(record):
+    """
+    Returns a list with a dict of summary statistics for each sample size, in the order of the record's
+    sample sizes.
+    """
+    config_slatkin = StatisticArray.from_document(record['config_slatkin_ssize'], (SSIZE,))
+    richness = StatisticArray.from_document(record['richness_ssize'], (SSIZE, LOCUS))
+    slatkin = StatisticArray.from_document(record['slatkin_ssize'], (SSIZE, LOCUS))
+    entropy = StatisticArray.from_document(record['entropy_ssize'], (SSIZE, LOCUS))
+    iqv = StatisticArray.from_document(record['iqv_ssize'], (SSIZE, LOCUS))
+    config_counts = StatisticArray.from_document(record['unlabeled_config_counts_ssize'], (SSIZE,))
+
+    summaries = []
+    for ssize in record['sample_size']:
+        summary = dict(sample_size=ssize)
+        summary['config_slatkin_ssize'] = _scalar(config_slatkin.select(ssize=ssize))
+        summary['num_configurations_ssize'] = len(config_counts.select(ssize=ssize))
+        _add_locus_summary(summary, 'richness', richness.select(ssize=ssize))
+        _add_locus_summary(summary, 'slatkin', slatkin.select(ssize=ssize))
+        _add_locus_summary(summary, 'entropy', entropy.select(ssize=ssize))
+        _add_locus_summary(summary, 'iqv', iqv.select(ssize=ssize))
+        summaries.append(summary)
+    return summaries
+
+
+def get_ta_sampled_summary(record):
+    """
+    Returns a list with a dict of summary statistics for each TA interval and sample size, ordered by interval
+    and then by the record's sample sizes.  The list is empty for records without time averaged statistics.
+    """
+    if record.get('config_slatkin_ta_ssize') is None:
+        return []
+    config_slatkin = StatisticArray.from_document(record['config_slatkin_ta_ssize'], (INTERVAL, SSIZE))
+    num_configurations = StatisticArray.from_document(record['num_configurations_ta_ssize'], (INTERVAL, SSIZE))
+    config_iqv = StatisticArray.from_document(record['config_iqv_ta_ssize'], (INTERVAL, SSIZE))
+    config_entropy = StatisticArray.from_document(record['config_entropy_ta_ssize'], (INTERVAL, SSIZE))
+    richness = StatisticArray.from_document(record['richness_ta_ssize'], (INTERVAL, LOCUS, SSIZE))
+    entropy = StatisticArray.from_document(record['entropy_ta_ssize'], (INTERVAL, LOCUS, SSIZE))
+    iqv = StatisticArray.from_document(record['iqv_ta_ssize'], (INTERVAL, LOCUS, SSIZE))
+    slatkin = StatisticArray.from_document(record['slatkin_ta_ssize'], (INTERVAL, LOCUS, SSIZE))
+    kandler = StatisticArray.from_document(record['kandler_remaining_tassize'], (INTERVAL, SSIZE, LOCUS))
+    config_counts = StatisticArray.from_document(record['unlabeled_config_counts_ta_ssize'], (INTERVAL, SSIZE))
+    unlabeled_freq = StatisticArray.from_document(record['unlabeled_freq_ta_ssize'], (INTERVAL, LOCUS, SSIZE))
+    num_loci = int(record['num_features'])
+
+    summaries = []
+    # TA interval isn't explicitly recorded in the database, so it is inferred from the labels
+    for tadur in config_slatkin.get_labels(INTERVAL):
+        for ssize in record['sample_size']:
+            summary = dict(ta_duration=tadur, sample_size=ssize)
+            summary['config_slatkin_ta_ssize'] = _scalar(config_slatkin.select(interval=tadur, ssize=ssize))
+            summary['num_configurations_ta_ssize'] = _scalar(num_configurations.select(interval=tadur, ssize=ssize))
+            summary['config_iqv_ta_ssize'] = _scalar(config_iqv.select(interval=tadur, ssize=ssize))
+            summary['config_entropy_ta_ssize'] = _scalar(config_entropy.select(interval=tadur, ssize=ssize))
+
+            _add_locus_summary(summary, 'richness', richness.select(interval=tadur, ssize=ssize), '_tassize')
+            _add_locus_summary(summary, 'entropy', entropy.select(interval=tadur, ssize=ssize), '_tassize')
+            _add_locus_summary(summary, 'iqv', iqv.select(interval=tadur, ssize=ssize), '_tassize')
+            _add_locus_summary(summary, 'slatkin', slatkin.select(interval=tadur, ssize=ssize), '_tassize')
+            _add_locus_summary(summary, 'kandler', kandler.select(interval=tadur, ssize=ssize), '_tassize')
+
+            config_count_map = config_counts.select(interval=tadur, ssize=ssize)
+            (c_entropy, c_iqv, c_richness, tf) = batch_diversity([config_count_map.values()])
+            summary['config_neiman_tf_tassize'] = float(tf[0])
+
+            locus_freq = [unlabeled_freq.select(interval=tadur, locus=locus, ssize=ssize) for locus in xrange(num_loci)]
+            locus_tf = batch_neiman_tf(locus_freq)
+            _add_locus_summary(summary, 'neiman_tf', locus_tf, '_tassize')
+            summaries.append(summary)
+    return summaries
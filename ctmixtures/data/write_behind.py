@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Write-behind storage of data objects.  Rather than inserting each document synchronously, the store functions
+can hand documents to a background thread, which inserts them in batches (one bulk insert per data object class
+per batch), so that simulation runs do not wait on database round trips.  The queue is bounded, so a slow
+database eventually blocks the simulation rather than letting the queue grow without limit, and the queue is
+flushed when the process exits.
+
+"""
+
+import atexit
+import logging as log
+import os
+import threading
+import Queue
+from collections import OrderedDict
+
+from ctmixtures.data.storage import insert_documents
+
+
+# placed on the queue to tell the writer thread to finish
+_STOP = object()
+
+
+class WriteBehindWriter(object):
+    """
+    Inserts Ming documents on a background thread, in bulk inserts of at most batch_size documents into the
+    configured storage backend.  At most max_queued documents wait in the queue, after which put() blocks until
+    the writer catches up.
+
+    Documents are validated against their schema when written, by insert_documents().  If a batch fails, the error
+    is logged, and raised by the next put() or flush(), so that a failure is not silently lost.  The writer
+    thread is started lazily, and restarted in a forked child process.
+    """
+
+    def __init__(self, batch_size=100, max_queued=1000):
+        self.batch_size = batch_size
+        self.max_queued = max_queued
+        self.documents_written = 0
+        self.batches_written = 0
+        self.error = None
+        self._queue = None
+        self._thread = None
+        self._thread_pid = None
+
+    def _start(self):
+        if self._thread is None or self._thread_pid != os.getpid():
+            self._queue = Queue.Queue(self.max_queued)
+            self._thread = threading.Thread(target=self._run, args=(self._queue,), name="write-behind")
+            self._thread.daemon = True
+            self._thread.start()
+            self._thread_pid = os.getpid()
+
+    def put(self, doc):
+        """
+        Queues a document for insertion, blocking while the queue is full.
+        """
+        self._raise_error()
+        self._start()
+        self._queue.put(doc)
+
+    def flush(self):
+        """
+        Blocks until every queued document has been written, and stops the writer thread, which is started
+        again by the next put().
+        """
+        if self._thread is not None and self._thread_pid == os.getpid():
+            self._queue.put(_STOP)
+            self._thread.join()
+        self._thread = None
+        self._raise_error()
+
+    def _raise_error(self):
+        if self.error is not None:
+            error = self.error
+            self.error = None
+            raise error
+
+    def _run(self, queue):
+        while True:
+            batch = [queue.get()]
+            while len(batch) < self.batch_size and batch[-1] is not _STOP:
+                try:
+                    batch.append(queue.get_nowait())
+                except Queue.Empty:
+                    break
+
+            docs = [doc for doc in batch if doc is not _STOP]
+            try:
+                if len(docs) > 0:
+                    self._write(docs)
+            except Exception as e:
+                log.exception("Write-behind insert of %s documents failed", len(docs))
+                self.error = e
+
+            if batch[-1] is _STOP:
+                return
+
+    def _write(self, docs):
+        by_class = OrderedDict()
+        for doc in docs:
+            by_class.setdefault(type(doc), []).append(doc)
+        for cls, cls_docs in by_class.items():
+            insert_documents(cls, cls_docs)
+        self.documents_written += len(docs)
+        self.batches_written += 1
+        log.debug("Write-behind inserted %s documents", len(docs))
+
+
+# the writer used by insert_document(); if None, documents are inserted synchronously.  simulation scripts
+# configure it from the simulation configuration
+write_behind_writer = None
+
+
+def configure_write_behind(batch_size, max_queued=1000):
+    """
+    Turns on write-behind storage, with bulk inserts of at most batch_size documents and at most max_queued
+    documents waiting, or turns it off (after flushing) if batch_size is 0.
+    """
+    global write_behind_writer
+    flush_write_behind()
+    if batch_size > 0:
+        write_behind_writer = WriteBehindWriter(batch_size, max_queued)
+    else:
+        write_behind_writer = None
+
+
+def get_write_behind_writer():
+    return write_behind_writer
+
+
+def insert_document(doc):
+    """
+    Inserts a Ming document into the configured storage backend, through the write-behind writer if one is
+    configured.
+    """
+    if write_behind_writer is None:
+        insert_documents(type(doc), [doc])
+    else:
+        write_behind_writer.put(doc)
+
+
+def flush_write_behind():
+    """
+    Blocks until every document queued for write-behind storage has been inserted.
+    """
+    if write_behind_writer is not None:
+        write_behind_writer.flush()
+
+
+atexit.register(flush_write_behind)
@@ -7,4 +7,4 @@
 Description here
 
 """
-from ctmixtures.dynamics.moran_dynamics import MoranDynamics
\ No newline at end of file
+from ctmixtures.dynamics.moran_dynamics import MoranDynamics, BatchedMoranDynamics
\ No newline at end of file
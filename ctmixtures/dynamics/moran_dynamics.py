@@ -9,6 +9,8 @@ Description here
 """
 import logging as log
 
+import numpy as np
+
 class MoranDynamics(object):
 
     def __init__(self, config, model, innovation_rule):
@@ -29,16 +31,82 @@ class MoranDynamics(object):
 
         :returns timestep of the model at the conclusion of the step
         """
-        random_agent = self.model.get_random_agent()
-        rule = random_agent.rule
-        #log.info("entering copying step %s with agent %s", self._timestep, random_agent)
-        rule.step(random_agent, self._timestep)
+        random_agent_id = self.model.get_random_agent_id()
+        rule = self.model.get_agent_rule(random_agent_id)
+        #log.info("entering copying step %s with agent %s", self._timestep, random_agent_id)
+        rule.step(random_agent_id, self._timestep)
 
         #log.info("entering mutation rule")
         # choose a different random agent, pass it to the innovation rule and see if it triggers this timestep
-        self.innovation_rule.step(self.model.get_random_agent(), self._timestep)
+        self.innovation_rule.step(self.model.get_random_agent_id(), self._timestep)
 
         # increment the time in our dynamics
         self._timestep += 1
         return self._timestep
 
+
+
+class BatchedMoranDynamics(MoranDynamics):
+    """
+    Moran dynamics which draw the random numbers needed for a block of time steps at once, as numpy arrays,
+    rather than making several small RNG calls on every tick.  For each tick in a block, we draw the focal
+    agent, the locus, a uniform deviate for neighbor selection, a uniform deviate for the rule's own
+    probabilistic choice (e.g., conformism strength), and the innovation deviate.  Ticks on which an
+    innovation fires are identified for the whole block in one vectorized comparison, and only those
+    ticks receive a (separately drawn, independent) random agent and locus for the innovation rule.
+
+    Each call to update() still applies exactly one copying step followed by one innovation opportunity,
+    in order, so the process is the same Moran process as MoranDynamics, and callers may sample the
+    population between any two ticks.  The block length is given by DYNAMICS_BATCH_SIZE in the configuration.
+    Random numbers are drawn from the model's generator, as MoranDynamics does, so that a seeded run does not
+    depend on other users of the global numpy stream.
+    """
+
+    def __init__(self, config, model, innovation_rule):
+        super(BatchedMoranDynamics, self).__init__(config, model, innovation_rule)
+        self.batch_size = int(config.DYNAMICS_BATCH_SIZE)
+        self._batch_position = self.batch_size
+
+    def _draw_batch(self):
+        n = self.batch_size
+        popsize = self.model.get_population_size()
+        num_loci = self.config.num_features
+        prng = self.model.prng
+
+        self._agents = prng.randint(0, popsize, size=n).tolist()
+        self._loci = prng.randint(0, num_loci, size=n).tolist()
+        self._neighbor_draws = prng.random_sample(n).tolist()
+        self._rule_draws = prng.random_sample(n).tolist()
+
+        # innovation events are rare, so we only keep the ticks on which one occurs, keyed by position in the block
+        innovation_draws = prng.random_sample(n)
+        events = np.flatnonzero(innovation_draws < self.config.innovation_rate)
+        innovation_agents = prng.randint(0, popsize, size=len(events)).tolist()
+        innovation_loci = prng.randint(0, num_loci, size=len(events)).tolist()
+        self._innovations = dict(zip(events.tolist(), zip(innovation_agents, innovation_loci,
+                                                          innovation_draws[events].tolist())))
+        self._batch_position = 0
+
+    def update(self):
+        """
+        Applies one Moran step using the next set of pre-drawn random values, drawing a new block
+        when the current one is exhausted.
+
+        :returns timestep of the model at the conclusion of the step
+        """
+        if self._batch_position == self.batch_size:
+            self._draw_batch()
+        i = self._batch_position
+
+        random_agent_id = self._agents[i]
+        rule = self.model.get_agent_rule(random_agent_id)
+        rule.step_with_draws(random_agent_id, self._timestep, self._loci[i], self._neighbor_draws[i], self._rule_draws[i])
+
+        innovation = self._innovations.get(i)
+        if innovation is not None:
+            (innovation_agent_id, innovation_locus, innovation_draw) = innovation
+            self.innovation_rule.step_with_draws(innovation_agent_id, self._timestep, innovation_locus, innovation_draw)
+
+        self._batch_position += 1
+        self._timestep += 1
+        return self._timestep
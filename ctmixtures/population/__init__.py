@@ -7,7 +7,8 @@
 Description here
 
 """
-from ctmixtures.population.population_spatial_models import SquareLatticeFactory, CompleteGraphFactory
-from ctmixtures.population.base_population_classes import FixedTraitStructurePopulation
+from ctmixtures.population.population_spatial_models import SquareLatticeFactory, CompleteGraphFactory, WellMixedFactory
+from ctmixtures.population.base_population_classes import FixedTraitStructurePopulation, ArrayTraitStructurePopulation
 from ctmixtures.population.watts_strogatz_sw import WattsStrogatzSmallWorldFactory
-from ctmixtures.population.agent import Agent
\ No newline at end of file
+from ctmixtures.population.agent import Agent
+from ctmixtures.population.trait_registry import LocusTraitRegistry
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Adjacency indexes used by population classes for neighbor selection, so that choosing a random neighbor or
+gathering a neighborhood does not go through NetworkX dict lookups and list construction on every copy event.
+
+"""
+
+import itertools
+
+import numpy as np
+
+
+class CSRAdjacencyIndex(object):
+    """
+    Compressed sparse row (CSR) representation of a graph whose nodes are labeled 0..N-1.  The neighbors of
+    node i are neighbors[offsets[i]:offsets[i+1]].  Graph factories construct this index from the NetworkX
+    graph when the population is built, via from_graph().
+
+    The offset and neighbor arrays are also kept as Python lists, because indexing a list with a scalar
+    is considerably faster than indexing a numpy array, and neighbor selection happens on nearly every tick.
+    """
+
+    is_complete = False
+
+    def __init__(self, offsets, neighbors):
+        self.offsets = offsets
+        self.neighbors = neighbors
+        self._offsets_list = offsets.tolist()
+        self._neighbors_list = neighbors.tolist()
+
+    @classmethod
+    def from_graph(cls, graph):
+        num_nodes = graph.number_of_nodes()
+        neighbor_lists = [graph.neighbors(node) for node in xrange(num_nodes)]
+
+        offsets = np.zeros(num_nodes + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(nlist) for nlist in neighbor_lists])
+        neighbors = np.fromiter(itertools.chain.from_iterable(neighbor_lists), dtype=np.int32, count=offsets[-1])
+        return cls(offsets, neighbors)
+
+    def get_number_of_nodes(self):
+        return len(self._offsets_list) - 1
+
+    def get_degree(self, node):
+        return self._offsets_list[node + 1] - self._offsets_list[node]
+
+    def get_neighbors(self, node):
+        """
+        Returns the neighbors of node as a numpy array view into the index (no copy is made).
+        """
+        return self.neighbors[self._offsets_list[node]:self._offsets_list[node + 1]]
+
+    def get_neighbor_for_draw(self, node, draw):
+        """
+        Returns the neighbor of node selected by a uniform [0,1) deviate.
+        """
+        start = self._offsets_list[node]
+        degree = self._offsets_list[node + 1] - start
+        return self._neighbors_list[start + int(draw * degree)]
+
+
+
+class ImplicitCompleteAdjacency(object):
+    """
+    Adjacency for a complete graph (i.e., a well-mixed population) on nodes 0..N-1, which never materializes
+    the N(N-1)/2 edges.  A random neighbor is a uniformly chosen node other than the focal node.  Populations
+    check is_complete and answer neighborhood queries (e.g., trait counts among all neighbors) from
+    population-wide counts rather than by gathering neighbors.
+    """
+
+    is_complete = True
+
+    def __init__(self, num_nodes):
+        self.num_nodes = num_nodes
+
+    def get_number_of_nodes(self):
+        return self.num_nodes
+
+    def get_degree(self, node):
+        return self.num_nodes - 1
+
+    def get_neighbors(self, node):
+        """
+        Returns all nodes other than node.  This allocates an array of size N-1 and is provided only for
+        completeness; population classes should avoid calling it on an implicit complete graph.
+        """
+        return np.delete(np.arange(self.num_nodes, dtype=np.int32), node)
+
+    def get_neighbor_for_draw(self, node, draw):
+        """
+        Returns the node selected by a uniform [0,1) deviate from among the N-1 nodes other than node.
+        """
+        other = int(draw * (self.num_nodes - 1))
+        if other >= node:
+            other += 1
+        return other
@@ -9,10 +9,63 @@ Description here
 """
 
 import pprint as pp
-from collections import defaultdict
+from collections import defaultdict, Mapping
 
+import numpy as np
 import numpy.random as npr
 
+from ctmixtures.population.agent import Agent
+from ctmixtures.population.trait_registry import LocusTraitRegistry
+from ctmixtures.population.configuration_keys import locus_trait_hash, configuration_key, configuration_keys_for_array
+
+
+###################################################################################
+
+class NeighborTraitCounts(Mapping):
+    """
+    Read-only view of the live trait counts at a locus, less one agent's own trait, which gives the trait counts
+    among all of that agent's neighbors in a well-mixed population without copying the counts.  The view reads
+    the population's counts directly, so it is only valid until the population next changes.
+    """
+
+    def __init__(self, counts, own_trait):
+        self.counts = counts
+        self.own_trait = own_trait
+
+    def __getitem__(self, trait):
+        count = self.counts.get(trait, 0)
+        if trait == self.own_trait:
+            count -= 1
+        if count <= 0:
+            raise KeyError(trait)
+        return count
+
+    def __iter__(self):
+        own_trait = self.own_trait
+        for trait, count in self.counts.iteritems():
+            if trait != own_trait or count > 1:
+                yield trait
+
+    def __len__(self):
+        if self.counts.get(self.own_trait) == 1:
+            return len(self.counts) - 1
+        return len(self.counts)
+
+    def iteritems(self):
+        own_trait = self.own_trait
+        for trait, count in self.counts.iteritems():
+            if trait == own_trait:
+                count -= 1
+                if count == 0:
+                    continue
+            yield (trait, count)
+
+    def items(self):
+        return list(self.iteritems())
+
+    def values(self):
+        return [count for trait, count in self.iteritems()]
+
 
 ###################################################################################
 
@@ -32,13 +85,24 @@ class BaseGraphPopulation(object):
         self.innovations = 0
         self.losses = 0
         self.time_step_last_interaction = 0
-        self.prng = npr.RandomState()  # allow the library to choose a seed via OS specific mechanism
+        # seeded from the simulation's seed if one was given, so that seeded runs are reproducible, and otherwise
+        # the library chooses a seed via OS specific mechanism
+        self.prng = npr.RandomState(simconfig.random_seed)
         self.graph_factory = graph_factory
         self.trait_factory = trait_factory
         self._interaction_rules = None
-
-        # initialize the graph structure via the factory object
+        self.trait_counts = None
+        self.configuration_keys = None
+        self.configuration_counts = None
+        self.trait_change_journal = None
+        # position of the first journal entry in the whole sequence of changes, and of each reader's next read
+        self._journal_start = 0
+        self._journal_readers = dict()
+
+        # initialize the graph structure via the factory object, and index its adjacency structure so that
+        # neighbor selection is an array lookup
         self.agentgraph = self.graph_factory.get_graph()
+        self.adjacency = self.graph_factory.get_adjacency_index(self.agentgraph)
 
     @property
     def interaction_rules(self):
@@ -52,6 +116,20 @@ class BaseGraphPopulation(object):
     def get_agent_by_id(self, agent_id):
         return self.agentgraph.node[agent_id]['agent']
 
+    def get_population_size(self):
+        return self.adjacency.get_number_of_nodes()
+
+    def get_agent_ids(self):
+        return self.agentgraph.nodes()
+
+    def get_random_agent_id(self):
+        """
+        Returns the ID of a random agent chosen from the population.  Rules, dynamics, and analyzers
+        work with agent ID's and the trait accessor methods below, so they are independent of how a
+        given population class stores agent state.
+        """
+        return self.prng.randint(0, self.simconfig.popsize)
+
     def get_random_agent(self):
         """
         Returns a random agent chosen from the population, in the form of a tuple of two elements
@@ -59,26 +137,137 @@ class BaseGraphPopulation(object):
 
         To modify the traits, change one or more elements in the array, and then call set_agent_traits(agent_id, new_list)
         """
-        rand_agent_id = self.prng.randint(0, self.simconfig.popsize)
-        return self.get_agent_by_id(rand_agent_id)
+        return self.get_agent_by_id(self.get_random_agent_id())
+
+    def get_random_neighbor_id_for_agent(self, agent_id):
+        """
+        Returns the ID of a random agent chosen from among the neighbors of agent_id.
+        """
+        return self.get_neighbor_id_for_draw(agent_id, self.prng.random_sample())
+
+    def get_neighbor_id_for_draw(self, agent_id, draw):
+        """
+        Returns the ID of the neighbor of agent_id selected by a uniform [0,1) deviate, so that
+        callers can draw the random numbers for neighbor selection in advance.
+        """
+        return self.adjacency.get_neighbor_for_draw(agent_id, draw)
 
     def get_random_neighbor_for_agent(self, agent_id):
         """
         Returns a random agent chosen from among the neighbors of agent_id.  The format is the same as
         get_random_agent -- a two element tuple with the neighbor's ID and their trait list.
         """
-        neighbor_list = self.agentgraph.neighbors(agent_id)
-        num_neighbors = len(neighbor_list)
-        rand_neighbor_id = neighbor_list[self.prng.randint(0,num_neighbors)]
-        return self.get_agent_by_id(rand_neighbor_id)
+        return self.get_agent_by_id(self.get_random_neighbor_id_for_agent(agent_id))
+
+    def get_all_neighbor_ids_for_agent(self, agent_id):
+        return self.adjacency.get_neighbors(agent_id)
 
     def get_all_neighbors_for_agent(self, agent_id):
-        agents = self.agentgraph.neighbors(agent_id)
+        agents = self.get_all_neighbor_ids_for_agent(agent_id)
         agent_list = []
         for agent in agents:
             agent_list.append(self.get_agent_by_id(agent))
         return agent_list
 
+    def get_neighbor_trait_counts(self, agent_id, locus):
+        """
+        Returns a dict of trait:count for the traits held at a locus by the neighbors of agent_id.
+        """
+        trait_cnts = defaultdict(int)
+        for neighbor_id in self.get_all_neighbor_ids_for_agent(agent_id):
+            trait_cnts[self.get_agent_trait(neighbor_id, locus)] += 1
+        return trait_cnts
+
+
+    def get_locus_trait_counts(self):
+        """
+        Returns the live trait counts for the population, as a list indexed by locus, where each element is
+        a dict of trait:count.  The counts are maintained by the trait accessors as rules copy and innovate
+        traits, so reading them costs nothing per agent.  The dicts may be updated in place, so callers which
+        need a snapshot across time steps must copy them, and must not modify them.
+        """
+        return self.trait_counts
+
+    def get_configuration_counts(self):
+        """
+        Returns the live counts of trait configurations (the combination of traits an agent holds across
+        all loci), as a dict of configuration key:count.  Keys are integers computed by the functions in
+        configuration_keys, and like the locus counts, the dict is updated in place.
+        """
+        return self.configuration_counts
+
+    def get_agent_configuration_key(self, agent_id):
+        return self.configuration_keys[agent_id]
+
+    def enable_trait_change_journal(self, reader):
+        """
+        Starts recording every change to the trait counts for reader (any hashable object, e.g., an analyzer),
+        so that observers such as time averagers can follow the counts by their changes instead of by copying
+        them.  Each entry is a tuple (locus, old_trait, new_trait, old_configuration_key, new_configuration_key).
+        Each reader has its own position in the journal, so readers do not take changes from one another.
+        """
+        if self.trait_change_journal is None:
+            self.trait_change_journal = []
+        self._journal_readers[reader] = self._journal_start + len(self.trait_change_journal)
+
+    def drain_trait_change_journal(self, reader):
+        """
+        Returns the changes recorded since reader's last call (or since it enabled the journal), or None if
+        reader has not enabled the journal.  Changes which every reader has been given are discarded.
+        """
+        if reader not in self._journal_readers:
+            return None
+        end = self._journal_start + len(self.trait_change_journal)
+        changes = self.trait_change_journal[self._journal_readers[reader] - self._journal_start:]
+        self._journal_readers[reader] = end
+
+        read = min(self._journal_readers.values()) - self._journal_start
+        if read > 0:
+            del self.trait_change_journal[:read]
+            self._journal_start += read
+        return changes
+
+    def _initialize_trait_counts(self, configuration_keys):
+        """
+        Builds the per-locus trait counts and configuration counts after the population's traits are
+        initialized, given the configuration key of each agent (indexed by agent ID).
+        """
+        self.trait_counts = [defaultdict(int) for locus in xrange(self.simconfig.num_features)]
+        for agent_id in self.get_agent_ids():
+            for locus, trait in enumerate(self.get_agent_traits(agent_id)):
+                self.trait_counts[locus][int(trait)] += 1
+
+        self.configuration_keys = configuration_keys
+        self.configuration_counts = defaultdict(int)
+        for key in configuration_keys:
+            self.configuration_counts[key] += 1
+
+    def _record_trait_change(self, agent_id, locus, old_trait, new_trait):
+        """
+        Moves one unit of count at a locus from old_trait to new_trait, and moves the agent from its old
+        configuration to its new one.  Traits and configurations whose count drops to zero are removed, so
+        the keys of each count dict are exactly the traits or configurations present in the population.
+        """
+        counts = self.trait_counts[locus]
+        counts[old_trait] -= 1
+        if counts[old_trait] == 0:
+            del counts[old_trait]
+        counts[new_trait] += 1
+
+        self._record_configuration_change(agent_id, locus, old_trait, new_trait)
+
+    def _record_configuration_change(self, agent_id, locus, old_trait, new_trait):
+        old_key = self.configuration_keys[agent_id]
+        new_key = old_key ^ locus_trait_hash(locus, old_trait) ^ locus_trait_hash(locus, new_trait)
+        self.configuration_keys[agent_id] = new_key
+        counts = self.configuration_counts
+        counts[old_key] -= 1
+        if counts[old_key] == 0:
+            del counts[old_key]
+        counts[new_key] += 1
+
+        if self.trait_change_journal is not None:
+            self.trait_change_journal.append((locus, old_trait, new_trait, old_key, new_key))
 
     def get_coordination_number(self):
         return self.graph_factory.get_lattice_coordination_number()
@@ -121,12 +310,32 @@ class BaseGraphPopulation(object):
 
     def initialize_population(self):
         self.trait_factory.initialize_population(self.agentgraph,self._interaction_rules)
+        self._initialize_trait_counts([configuration_key(self.get_agent_traits(agent_id))
+                                       for agent_id in xrange(self.get_population_size())])
 
 
     ### Abstract methods - derived classes need to override
     def draw_network_colored_by_culture(self):
         raise NotImplementedError
 
+    def get_agent_rule(self, agent_id):
+        raise NotImplementedError
+
+    def get_agent_traits(self, agent_id):
+        raise NotImplementedError
+
+    def get_agent_trait(self, agent_id, locus):
+        raise NotImplementedError
+
+    def set_agent_trait(self, agent_id, locus, trait):
+        raise NotImplementedError
+
+    def copy_agent_trait(self, agent_id, source_id, locus):
+        raise NotImplementedError
+
+    def copy_agent_traits(self, agent_id, source_id):
+        raise NotImplementedError
+
     def get_traits_packed(self,agent_traits):
         raise NotImplementedError
 
@@ -152,6 +361,9 @@ class FixedTraitStructurePopulation(BaseGraphPopulation):
 
     def __init__(self, simconfig,graph_factory, trait_factory):
         super(FixedTraitStructurePopulation, self).__init__(simconfig, graph_factory, trait_factory)
+        if self.agentgraph is None:
+            raise ValueError("%s builds no graph to hold agents; use ArrayTraitStructurePopulation with it"
+                             % type(graph_factory).__name__)
 
     # def draw_network_colored_by_culture(self):
     #     nodes, colors = zip(*nx.get_node_attributes(self.agentgraph, 'traits').items())
@@ -165,6 +377,30 @@ class FixedTraitStructurePopulation(BaseGraphPopulation):
         #return '1-1-1-1'
         return str(tuple(agent_traits))
 
+    def get_agent_rule(self, agent_id):
+        return self.agentgraph.node[agent_id]['agent'].rule
+
+    def get_agent_traits(self, agent_id):
+        return self.agentgraph.node[agent_id]['agent'].traits
+
+    def get_agent_trait(self, agent_id, locus):
+        return self.agentgraph.node[agent_id]['agent'].traits[locus]
+
+    def set_agent_trait(self, agent_id, locus, trait):
+        traits = self.agentgraph.node[agent_id]['agent'].traits
+        old_trait = int(traits[locus])
+        trait = int(trait)
+        if old_trait != trait:
+            self._record_trait_change(agent_id, locus, old_trait, trait)
+            traits[locus] = trait
+
+    def copy_agent_trait(self, agent_id, source_id, locus):
+        self.set_agent_trait(agent_id, locus, self.get_agent_trait(source_id, locus))
+
+    def copy_agent_traits(self, agent_id, source_id):
+        for locus, trait in enumerate(self.get_agent_traits(source_id)):
+            self.set_agent_trait(agent_id, locus, trait)
+
 
     def set_agent_traits(self, agent_id, trait_list):
         """
@@ -196,3 +432,122 @@ class FixedTraitStructurePopulation(BaseGraphPopulation):
         pass
 
 
+
+###################################################################################
+
+class ArrayTraitStructurePopulation(BaseGraphPopulation):
+    """
+    Population with a fixed number of features and traits per feature, like FixedTraitStructurePopulation,
+    but which does not construct an Agent object for each node of the graph.  Instead, the traits of all
+    agents are stored as rows of a single N x F integer matrix, and the interaction rule of each agent is
+    stored as a small integer code, which indexes the list of rule objects constructed for the population.
+
+    The matrix does not hold trait ID's directly.  Each locus has a LocusTraitRegistry, which maps the traits
+    present at the locus to dense slots (recycling the slots of extinct traits) and keeps the count of each
+    trait, and the matrix holds slots.  Copying a trait is thus a copy of a slot, and the traits of an agent's
+    neighbors are counted with a bincount over their slots.  The accessor methods translate slots to and from
+    trait ID's, which remain the stable identity of traits for rules, analyzers, and time averaging.
+
+    Agents are identified by row index, which is also their node ID in the NetworkX graph.  Rules, dynamics,
+    and analyzers reach agent state only through the ID-based accessor methods (get_agent_trait(),
+    copy_agent_trait(), etc.), so the same rule objects operate on either population class.  Methods which
+    return Agent objects (get_agent_by_id(), get_random_agent(), etc.) return detached Agent objects built from
+    the matrix, whose traits are copies, and which do not need the graph (there is none with WellMixedFactory).
+
+    Like all populations, this class keeps live per-locus trait counts and configuration counts (see
+    get_locus_trait_counts()).  When the graph factory supplies an implicit complete adjacency (i.e.,
+    WellMixedFactory), the counts of traits among "all neighbors" of an agent are the population counts
+    less the agent itself, so no neighborhood is ever gathered.
+
+    """
+
+    def __init__(self, simconfig, graph_factory, trait_factory):
+        super(ArrayTraitStructurePopulation, self).__init__(simconfig, graph_factory, trait_factory)
+        self.traits = None
+        self.rule_codes = None
+        self.rule_objects = None
+        self.registries = None
+
+    def initialize_population(self):
+        (traits, self.rule_codes, self.rule_objects) = \
+            self.trait_factory.initialize_population_arrays(self.get_population_size(), self._interaction_rules)
+
+        self.configuration_keys = configuration_keys_for_array(traits)
+        (keys, counts) = np.unique(self.configuration_keys, return_counts=True)
+        self.configuration_counts = defaultdict(int, zip(keys.tolist(), counts.tolist()))
+
+        self.registries = []
+        self.traits = np.empty_like(traits)
+        for locus in xrange(traits.shape[1]):
+            (registry, slots) = LocusTraitRegistry.from_traits(traits[:, locus])
+            self.registries.append(registry)
+            self.traits[:, locus] = slots
+        # the registries keep live counts by trait ID, which serve as the population's per-locus trait counts
+        self.trait_counts = [registry.get_trait_counts() for registry in self.registries]
+
+    def get_agent_ids(self):
+        return xrange(self.get_population_size())
+
+    def get_agent_by_id(self, agent_id):
+        """
+        Returns a detached Agent holding a copy of the agent's traits and its rule.  Changing the Agent's traits
+        does not change the population; use set_agent_trait() and the other ID-based accessors for that.
+        """
+        agent = Agent(self.simconfig, agent_id)
+        agent.traits = self.get_agent_traits(agent_id)
+        agent.rule = self.get_agent_rule(agent_id)
+        return agent
+
+    def get_traits_packed(self,agent_traits):
+        return str(tuple(agent_traits))
+
+    def get_agent_rule(self, agent_id):
+        return self.rule_objects[self.rule_codes[agent_id]]
+
+    def get_agent_traits(self, agent_id):
+        return [registry.trait_for_slot[slot] for registry, slot in zip(self.registries, self.traits[agent_id].tolist())]
+
+    def get_agent_trait(self, agent_id, locus):
+        return self.registries[locus].trait_for_slot[self.traits[agent_id, locus]]
+
+    def set_agent_trait(self, agent_id, locus, trait):
+        self._replace_slot(agent_id, locus, self.registries[locus].get_slot(int(trait)))
+
+    def copy_agent_trait(self, agent_id, source_id, locus):
+        self._replace_slot(agent_id, locus, int(self.traits[source_id, locus]))
+
+    def copy_agent_traits(self, agent_id, source_id):
+        for locus, slot in enumerate(self.traits[source_id].tolist()):
+            self._replace_slot(agent_id, locus, slot)
+
+    def _replace_slot(self, agent_id, locus, slot):
+        old_slot = int(self.traits[agent_id, locus])
+        if old_slot != slot:
+            registry = self.registries[locus]
+            old_trait = registry.trait_for_slot[old_slot]
+            new_trait = registry.trait_for_slot[slot]
+            registry.increment(slot)
+            registry.decrement(old_slot)
+            self.traits[agent_id, locus] = slot
+            self._record_configuration_change(agent_id, locus, old_trait, new_trait)
+
+    def get_neighbor_trait_counts(self, agent_id, locus):
+        registry = self.registries[locus]
+        if self.adjacency.is_complete:
+            # every other agent is a neighbor, so neighborhood counts are the live population counts less the
+            # focal agent, read through a view rather than copied on every conformist event
+            own_trait = registry.trait_for_slot[self.traits[agent_id, locus]]
+            return NeighborTraitCounts(registry.get_trait_counts(), own_trait)
+
+        slots = self.traits[self.adjacency.get_neighbors(agent_id), locus]
+        return defaultdict(int, registry.get_trait_counts_for_slots(slots))
+
+    def __repr__(self):
+        rep = 'ArrayTraitStructurePopulation: ['
+        for agent_id in self.get_agent_ids():
+            rep += "{node %s: " % agent_id
+            rep += pp.pformat(self.get_agent_traits(agent_id))
+            rep += " rule: %s " % self.get_agent_rule(agent_id)
+            rep += "},\n"
+        rep += ' ]'
+        return rep
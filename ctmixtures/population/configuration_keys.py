@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Integer keys for trait configurations (the combination of traits an agent holds across all loci), which let
+populations keep configuration counts incrementally instead of packing every agent's traits into a string.
+
+The key of a configuration is the XOR, over loci, of a 63-bit mixing hash of each (locus, trait) pair
+(i.e., Zobrist hashing).  When an agent's trait changes at one locus, its key is updated in O(1) by XOR'ing
+out the hash of the old trait and XOR'ing in the hash of the new one.  Keys are non-negative and fit in a
+numpy int64.
+
+"""
+
+import numpy as np
+
+_MASK64 = 0xFFFFFFFFFFFFFFFF
+_MASK63 = 0x7FFFFFFFFFFFFFFF
+
+# constants of the splitmix64 finalizer
+_GOLDEN = 0x9E3779B97F4A7C15
+_MIX1 = 0xBF58476D1CE4E5B9
+_MIX2 = 0x94D049BB133111EB
+
+# traits are packed below the locus in a 64-bit word before mixing
+_LOCUS_SHIFT = 40
+
+
+def locus_trait_hash(locus, trait):
+    """
+    Returns the 63-bit hash of a trait held at a locus.
+    """
+    z = ((locus << _LOCUS_SHIFT) + trait + _GOLDEN) & _MASK64
+    z = ((z ^ (z >> 30)) * _MIX1) & _MASK64
+    z = ((z ^ (z >> 27)) * _MIX2) & _MASK64
+    return int((z ^ (z >> 31)) & _MASK63)
+
+
+def configuration_key(traits):
+    """
+    Returns the key of the configuration given by a sequence of traits, one per locus.
+    """
+    key = 0
+    for locus, trait in enumerate(traits):
+        key ^= locus_trait_hash(locus, int(trait))
+    return key
+
+
+def configuration_keys_for_array(traits):
+    """
+    Returns a list of configuration keys, one for each row of an N x F trait matrix.  Computes the same
+    values as configuration_key(), vectorized over agents (uint64 arithmetic in numpy wraps modulo 2^64).
+    """
+    keys = np.zeros(traits.shape[0], dtype=np.uint64)
+    for locus in xrange(traits.shape[1]):
+        z = traits[:, locus].astype(np.uint64) + np.uint64(((locus << _LOCUS_SHIFT) + _GOLDEN) & _MASK64)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(_MIX1)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(_MIX2)
+        keys ^= (z ^ (z >> np.uint64(31))) & np.uint64(_MASK63)
+    return keys.astype(np.int64).tolist()
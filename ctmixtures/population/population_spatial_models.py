@@ -13,6 +13,8 @@ import math as m
 
 import networkx as nx
 
+from ctmixtures.population.adjacency import CSRAdjacencyIndex, ImplicitCompleteAdjacency
+
 
 class CompleteGraphFactory(object):
     """
@@ -27,7 +29,7 @@ class CompleteGraphFactory(object):
 
     This factory is dynamically loaded from its fully qualified name in a configuration file,
      and passed the simulation configuration object in its constructor.  The instantiating
-     code then calls get_graph()
+     code then calls get_graph(), and get_adjacency_index() to build a CSR neighbor index from the graph.
 
     """
 
@@ -39,6 +41,9 @@ class CompleteGraphFactory(object):
     def get_lattice_coordination_number(self):
         return self.lattice_coordination_number
 
+    def get_adjacency_index(self, graph):
+        return CSRAdjacencyIndex.from_graph(graph)
+
     def get_graph(self):
         model = nx.complete_graph(self.simconfig.popsize)
         # now convert the resulting graph to have simple nodenames to use as keys
@@ -53,6 +58,42 @@ class CompleteGraphFactory(object):
 
 
 
+class WellMixedFactory(object):
+    """
+    Defines a well-mixed population, in which every agent is a neighbor of every other agent, as with
+    CompleteGraphFactory.  Unlike CompleteGraphFactory, no graph or edge structure is constructed:  get_graph()
+    returns None, and get_adjacency_index() returns an implicit complete adjacency, so a random neighbor is
+    simply a uniformly chosen other agent.  Memory use is therefore independent of the number of edges, and
+    very large well-mixed populations are practical.
+
+    Because there is no graph to hold Agent objects, this factory is used with ArrayTraitStructurePopulation,
+    which also answers "all neighbors" queries (e.g., for conformist rules) from its population-wide trait counts.
+
+    There are no boundary conditions, and the lattice coordination number is n-1.
+
+    This factory is dynamically loaded from its fully qualified name in a configuration file,
+     and passed the simulation configuration object in its constructor.
+
+    """
+
+    def __init__(self, simconfig):
+        self.simconfig = simconfig
+        self.lattice_dimension = 0
+        self.lattice_coordination_number = simconfig.popsize - 1
+
+    def get_lattice_coordination_number(self):
+        return self.lattice_coordination_number
+
+    def get_adjacency_index(self, graph):
+        return ImplicitCompleteAdjacency(self.simconfig.popsize)
+
+    def get_graph(self):
+        log.debug("Well-mixed model:  popsize %s, no graph constructed", self.simconfig.popsize)
+        return None
+
+
+
+
 class SquareLatticeFactory(object):
     """
     Defines a population of agents, each of which is represented by an array of integers.
@@ -68,7 +109,7 @@ class SquareLatticeFactory(object):
 
     This factory is dynamically loaded from its fully qualified name in a configuration file,
      and passed the simulation configuration object in its constructor.  The instantiating
-     code then calls get_graph()
+     code then calls get_graph(), and get_adjacency_index() to build a CSR neighbor index from the graph.
 
     """
 
@@ -80,6 +121,9 @@ class SquareLatticeFactory(object):
     def get_lattice_coordination_number(self):
         return self.lattice_coordination_number
 
+    def get_adjacency_index(self, graph):
+        return CSRAdjacencyIndex.from_graph(graph)
+
     def get_graph(self):
         lattice_coord_num = 4
         side_length = 0
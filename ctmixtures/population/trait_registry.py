@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Registry which maps the traits (alleles) present at a locus to dense integer slots.
+
+"""
+
+import numpy as np
+
+
+class LocusTraitRegistry(object):
+    """
+    Maps the traits present in the population at a single locus to dense, small integer slots, and counts the
+    number of agents holding each trait.  Infinite-alleles innovation hands out ever-increasing trait ID's, so
+    trait ID's are unbounded and sparse, but the number of traits present at any time is small.  When the count
+    of a trait drops to zero (i.e., the trait goes extinct), its slot is released and reused by the next new
+    trait, so slots stay in the range [0, get_capacity()), and the traits held by a set of agents can be counted
+    with a bincount over their slots (see get_trait_counts_for_slots()).
+
+    The trait ID itself is the stable, external identity of a trait, and is used for reporting, configuration
+    keys, and time averaging, since a recycled slot may hold several different traits over a run.  The counts
+    are kept by trait ID, updated in place, so that analyzers can read them without rebuilding a dict (see
+    get_trait_counts()).
+    """
+
+    def __init__(self):
+        self.slot_for_trait = dict()
+        self.trait_for_slot = []
+        self.free_slots = []
+        self.trait_counts = dict()
+
+    @classmethod
+    def from_traits(cls, traits):
+        """
+        Constructs a registry for the traits in a 1-D array (one entry per agent), and returns a tuple of the
+        registry and an array of the slot for each entry.
+        """
+        registry = cls()
+        (unique_traits, slots, counts) = np.unique(traits, return_inverse=True, return_counts=True)
+        registry.trait_for_slot = unique_traits.tolist()
+        registry.slot_for_trait = dict((trait, slot) for slot, trait in enumerate(registry.trait_for_slot))
+        registry.trait_counts = dict(zip(registry.trait_for_slot, counts.tolist()))
+        return (registry, slots)
+
+    def get_capacity(self):
+        return len(self.trait_for_slot)
+
+    def get_number_of_traits(self):
+        return len(self.slot_for_trait)
+
+    def get_trait(self, slot):
+        return self.trait_for_slot[slot]
+
+    def get_slot(self, trait):
+        """
+        Returns the slot for a trait, assigning a free slot if the trait is not present (its count is zero until
+        the slot is incremented).
+        """
+        slot = self.slot_for_trait.get(trait)
+        if slot is None:
+            if self.free_slots:
+                slot = self.free_slots.pop()
+                self.trait_for_slot[slot] = trait
+            else:
+                slot = len(self.trait_for_slot)
+                self.trait_for_slot.append(trait)
+            self.slot_for_trait[trait] = slot
+        return slot
+
+    def increment(self, slot):
+        trait = self.trait_for_slot[slot]
+        self.trait_counts[trait] = self.trait_counts.get(trait, 0) + 1
+
+    def decrement(self, slot):
+        """
+        Decrements the count of the trait in a slot, releasing the slot for reuse if the trait is now extinct.
+        """
+        trait = self.trait_for_slot[slot]
+        count = self.trait_counts[trait] - 1
+        if count == 0:
+            del self.slot_for_trait[trait]
+            del self.trait_counts[trait]
+            self.trait_for_slot[slot] = None
+            self.free_slots.append(slot)
+        else:
+            self.trait_counts[trait] = count
+
+    def get_count(self, trait):
+        return self.trait_counts.get(trait, 0)
+
+    def get_trait_counts(self):
+        """
+        Returns the live dict of trait:count for the traits present, which is updated in place, and must not be
+        modified by callers.
+        """
+        return self.trait_counts
+
+    def get_trait_counts_for_slots(self, slots):
+        """
+        Returns a dict of trait:count for the traits held in a list of slots (e.g., the slots of an agent's neighbors).
+        """
+        trait_cnts = dict()
+        trait_for_slot = self.trait_for_slot
+        for slot, count in enumerate(np.bincount(slots).tolist()):
+            if count > 0:
+                trait_cnts[trait_for_slot[slot]] = count
+        return trait_cnts
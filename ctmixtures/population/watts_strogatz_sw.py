@@ -12,6 +12,8 @@ import logging as log
 
 import networkx as nx
 
+from ctmixtures.population.adjacency import CSRAdjacencyIndex
+
 
 class WattsStrogatzSmallWorldFactory(object):
     """
@@ -28,7 +30,7 @@ class WattsStrogatzSmallWorldFactory(object):
 
     This factory is dynamically loaded from its fully qualified name in a configuration file,
      and passed the simulation configuration object in its constructor.  The instantiating
-     code then calls get_graph()
+     code then calls get_graph(), and get_adjacency_index() to build a CSR neighbor index from the graph.
 
     """
 
@@ -41,6 +43,9 @@ class WattsStrogatzSmallWorldFactory(object):
     def get_lattice_coordination_number(self):
         return self.lattice_coordination_number
 
+    def get_adjacency_index(self, graph):
+        return CSRAdjacencyIndex.from_graph(graph)
+
 
     def get_graph(self):
 
@@ -10,12 +10,22 @@ Description here
 
 class BaseInteractionRule(object):
     """
-    Abstract base class for interaction rules.  Each rule needs to implement step(agent, timestep).
+    Abstract base class for interaction rules.  Each rule needs to implement step(agent_id, timestep),
+    operating on the agent through the population's ID-based trait accessors.
     """
 
 
     def __init__(self,simconfig):
         self.simconfig = simconfig
 
-    def step(self, agent, timestep):
-        raise NotImplementedError
\ No newline at end of file
+    def step(self, agent_id, timestep):
+        raise NotImplementedError
+
+    def step_with_draws(self, agent_id, timestep, locus, neighbor_draw, rule_draw):
+        """
+        Performs the same step as step(), but with the random values the rule needs supplied by the caller:
+        a locus, a uniform [0,1) deviate used to select a neighbor, and a uniform [0,1) deviate for any
+        probabilistic choice made by the rule itself.  Rules ignore values they do not need.  This allows
+        dynamics classes to draw random numbers for many steps at once.
+        """
+        raise NotImplementedError
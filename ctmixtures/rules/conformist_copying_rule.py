@@ -15,7 +15,6 @@ This rule implements the original Axelrod model on a lattice, given descriptions
 
 """
 
-from collections import defaultdict
 import logging as log
 from collections import OrderedDict
 import numpy.random as npr
@@ -31,7 +30,7 @@ class BaseNeighborConformismRule(BaseInteractionRule):
     """
 
 
-    def step(self, agent, timestep):
+    def step(self, agent_id, timestep):
         """
         Implements a single time step in the neutral drift Moran model, starting from a focal agent,
         and then one of the focal agent's neighbors at random (this rule knows nothing about
@@ -40,22 +39,22 @@ class BaseNeighborConformismRule(BaseInteractionRule):
 
         """
 
+        rule_draw = npr.random()
+        num_loci = self.sc.num_features
+        rand_locus = npr.randint(0,num_loci)
+        self.step_with_draws(agent_id, timestep, rand_locus, npr.random(), rule_draw)
+
+    def step_with_draws(self, agent_id, timestep, locus, neighbor_draw, rule_draw):
+
         # self.strength is either conformism or anticonformism strength, depending upon which class it is.
         # this allows asymmetric strengths
 
-        if npr.random() < self.strength:
+        if rule_draw < self.strength:
             # execute a local conformism rule among neighbors
-                # choose a random locus
-            num_loci = self.sc.num_features
-            rand_locus = npr.randint(0,num_loci)
-            #log.debug("(anti)conformism - random locus: %s with type: %s", rand_locus, self.ruletype)
-
-            # get the traits from all neighbors at that locus
-            neighbors = self.model.get_all_neighbors_for_agent(agent.id)
-            trait_cnts = defaultdict(int)
-            for neighbor in neighbors:
-                ntrait = neighbor.traits[rand_locus]
-                trait_cnts[ntrait] += 1
+            #log.debug("(anti)conformism - random locus: %s with type: %s", locus, self.ruletype)
+
+            # get the counts of traits from all neighbors at that locus
+            trait_cnts = self.model.get_neighbor_trait_counts(agent_id, locus)
 
             ordered_cnts = sorted(trait_cnts.items(), key=itemgetter(1), reverse=self.CONFORMISM_FLAG)
             target_trait = ordered_cnts[0]
@@ -65,20 +64,17 @@ class BaseNeighborConformismRule(BaseInteractionRule):
             #log.debug("sorted traits: %s", ordered_cnts)
             #log.debug("selected trait: %s", target_trait_key)
 
-            agent.traits[rand_locus] = target_trait_key
+            self.model.set_agent_trait(agent_id, locus, target_trait_key)
 
         else:
             # execute a normal random copy
-            neighbor = self.model.get_random_neighbor_for_agent(agent.id)
-            num_loci = self.sc.num_features
-            rand_locus = npr.randint(0,num_loci)
-            #log.debug("a/conformism but below rate, copy randomly - random locus: %s", rand_locus)
+            neighbor_id = self.model.get_neighbor_id_for_draw(agent_id, neighbor_draw)
+            #log.debug("a/conformism but below rate, copy randomly - random locus: %s", locus)
 
-            neighbor_trait = neighbor.traits[rand_locus]
-            agent.traits[rand_locus] = neighbor_trait
+            self.model.copy_agent_trait(agent_id, neighbor_id, locus)
 
         # track the interaction and time
-        self.model.update_interactions(rand_locus, timestep)
+        self.model.update_interactions(locus, timestep)
 
 
 
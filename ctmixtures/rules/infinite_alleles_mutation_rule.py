@@ -37,22 +37,30 @@ class InfiniteAllelesMutationRule(object):
         for locus in xrange(self.sc.num_features):
             self.highest_trait[locus] = self.sc.num_traits
 
-    def step(self, agent, timestep):
+    def step(self, agent_id, timestep):
         """
         Implements infinite-alleles mutation for a locus, taking a randomly chosen agent, and giving them
         a new (never before seen) trait at a random locus.
 
         """
 
-        if npr.random() < self.sc.innovation_rate:
+        innovation_draw = npr.random()
+        if innovation_draw < self.sc.innovation_rate:
             num_loci = self.sc.num_features
-            rand_locus = npr.randint(0,num_loci)
+            self.step_with_draws(agent_id, timestep, npr.randint(0,num_loci), innovation_draw)
+
+    def step_with_draws(self, agent_id, timestep, locus, innovation_draw):
+        """
+        Performs the same step as step(), with the locus and the uniform [0,1) deviate which determines
+        whether an innovation occurs supplied by the caller.
+        """
+        if innovation_draw < self.sc.innovation_rate:
             # create new trait
-            self.highest_trait[rand_locus] += 1
-            agent.traits[rand_locus] = self.highest_trait[rand_locus]
+            self.highest_trait[locus] += 1
+            self.model.set_agent_trait(agent_id, locus, self.highest_trait[locus])
 
             # track the interaction and time
-            self.model.update_innovations(rand_locus)
+            self.model.update_innovations(locus)
 
 
 
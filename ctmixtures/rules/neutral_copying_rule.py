@@ -16,7 +16,6 @@ This rule implements the original Axelrod model on a lattice, given descriptions
 """
 
 import numpy.random as npr
-import copy
 
 from base_rule import BaseInteractionRule
 
@@ -32,7 +31,7 @@ class NeutralRandomLocusCopyingRule(BaseInteractionRule):
         self.model = model
         self.sc = self.model.simconfig
 
-    def step(self, agent, timestep):
+    def step(self, agent_id, timestep):
         """
         Implements a single time step in the neutral drift Moran model, starting from a focal agent,
         and then one of the focal agent's neighbors at random (this rule knows nothing about
@@ -45,12 +44,14 @@ class NeutralRandomLocusCopyingRule(BaseInteractionRule):
         rand_locus = npr.randint(0,num_loci)
         #log.info("neutrality - random locus: %s", rand_locus)
 
-        neighbor = self.model.get_random_neighbor_for_agent(agent.id)
-        neighbor_trait = neighbor.traits[rand_locus]
-        agent.traits[rand_locus] = neighbor_trait
+        self.step_with_draws(agent_id, timestep, rand_locus, npr.random(), None)
+
+    def step_with_draws(self, agent_id, timestep, locus, neighbor_draw, rule_draw):
+        neighbor_id = self.model.get_neighbor_id_for_draw(agent_id, neighbor_draw)
+        self.model.copy_agent_trait(agent_id, neighbor_id, locus)
 
         # track the interaction and time
-        self.model.update_interactions(rand_locus, timestep)
+        self.model.update_interactions(locus, timestep)
 
 
 
@@ -65,7 +66,7 @@ class NeutralAllLociCopyingRule(BaseInteractionRule):
         self.model = model
         self.sc = self.model.simconfig
 
-    def step(self, agent, timestep):
+    def step(self, agent_id, timestep):
         """
         Implements a single time step in the neutral drift Moran model, starting from a focal agent,
         and then one of the focal agent's neighbors at random (this rule knows nothing about
@@ -74,10 +75,13 @@ class NeutralAllLociCopyingRule(BaseInteractionRule):
 
         """
 
+        self.step_with_draws(agent_id, timestep, None, npr.random(), None)
+
+    def step_with_draws(self, agent_id, timestep, locus, neighbor_draw, rule_draw):
         num_loci = self.sc.num_features
 
-        neighbor = self.model.get_random_neighbor_for_agent(agent.id)
-        agent.traits = copy.deepcopy(neighbor.traits)
+        neighbor_id = self.model.get_neighbor_id_for_draw(agent_id, neighbor_draw)
+        self.model.copy_agent_traits(agent_id, neighbor_id)
 
         # track the interaction and time
         self.model.update_interactions_for_loci(range(0,num_loci), timestep)
@@ -12,6 +12,7 @@ import logging as log
 import random as random
 import math
 
+import numpy as np
 from numpy.random import RandomState
 
 import ctmixtures.population as pop
@@ -61,26 +62,51 @@ class LocusAlleleTraitFactory(object):
 
 
 
+    def initialize_population_arrays(self,popsize,rule_list):
+        """
+        Initializes a population whose state is held in arrays rather than Agent objects.  Returns a tuple
+        of (traits, rule_codes, rule_objects), where traits is a popsize x F integer matrix, rule_codes is a
+        vector of length popsize, and rule_objects is the list of rule objects indexed by rule_codes.
+        """
+        nf = self.simconfig.num_features
+        nt = self.simconfig.num_traits
+
+        rule_objects = [rule["class"] for rule in rule_list]
+        rule_codes = np.array(self._initialize_random_mixture_codes(popsize,rule_list)[:popsize], dtype=np.int8)
+        traits = self.prng.randint(1, nt, size=(popsize, nf)).astype(np.int32)
+
+        return (traits, rule_codes, rule_objects)
+
+
     def _initialize_random_mixture(self,n,rule_list):
         """
         Takes a list of rules and proportions, and returns a shuffled list of rule objects in the correct
         proportions
         """
-        obj_list = []
-        for rule in rule_list:
+        codes = self._initialize_random_mixture_codes(n,rule_list)
+        return [rule_list[code]["class"] for code in codes]
+
+
+    def _initialize_random_mixture_codes(self,n,rule_list):
+        """
+        Takes a list of rules and proportions, and returns a shuffled list of rule codes (i.e., positions
+        in rule_list) in the correct proportions
+        """
+        code_list = []
+        for code, rule in enumerate(rule_list):
             prop = float(rule["proportion"])
             num = int(math.ceil(n * prop))
             log.debug("creating %s obj for rule %s", num, rule["name"])
             for i in xrange(num):
-                obj_list.append(rule["class"])
+                code_list.append(code)
 
         # check if the result has the right number of entries, it could be off by one, say if the proportions are
         # 0.3, 0.3, 0.3.  Arbitrarily we add an extra of the first rule to break such ties.
 
-        if (len(obj_list) < n):
-            log.debug("obj_list size %s vs requested size %s", len(obj_list), n)
-            obj_list.append(rule_list[0]["class"])
+        if (len(code_list) < n):
+            log.debug("obj_list size %s vs requested size %s", len(code_list), n)
+            code_list.append(0)
 
-        random.shuffle(obj_list)
-        #log.debug("%s", pp.pformat(obj_list))
-        return obj_list
+        random.shuffle(code_list)
+        #log.debug("%s", pp.pformat(code_list))
+        return code_list
@@ -43,9 +43,69 @@ class BaseConfiguration(object):
     """
 
     TIME_AVERAGING_CLASS = "pytransmission.aggregation.MoranTimeAverager"
+    """
+    The fully qualified import path for the class which accumulates time averaged trait counts.  Besides the
+    pytransmission TimeAverager classes, ctmixtures.analysis.PiecewiseConstantTimeAverager does the same accumulation
+    from the population's count changes, at a cost proportional to copying events rather than time steps.
+    """
 
     DYNAMICS_CLASS = "ctmixtures.dynamics.MoranDynamics"
 
+    DYNAMICS_BATCH_SIZE = 10000
+    """
+    Number of time steps for which dynamics classes that pre-draw random numbers (e.g., BatchedMoranDynamics)
+    draw values in a single block.
+    """
+
+    SLATKIN_MONTECARLO_REPLICATES = 100000
+    """
+    Number of Monte Carlo replicates used for the Slatkin exact test, and the maximum drawn in adaptive mode.
+    """
+
+    SLATKIN_ADAPTIVE_PRECISION = None
+    """
+    If set, the Slatkin exact test draws replicates in batches of SLATKIN_ADAPTIVE_BATCH_SIZE until the half-width
+    of the 95% confidence interval on the tail probability is at most this value.  If None, every test uses
+    SLATKIN_MONTECARLO_REPLICATES replicates.
+    """
+
+    SLATKIN_ADAPTIVE_BATCH_SIZE = 2000
+
+    SLATKIN_TABLE_PATH = None
+    """
+    Path of an .npz file of exact Slatkin test tables, written by admin/ctmixtures-build-slatkin-tables.py.  Tests
+    on samples whose size is tabulated are looked up rather than run by Monte Carlo.
+    """
+
+    FINAL_SAMPLE_PROCESSES = 0
+    """
+    Number of worker processes used to run the Slatkin exact tests for the final sample of a simulation run.
+    If 0, the tests run serially in the simulation process.
+    """
+
+    WRITE_BEHIND_BATCH_SIZE = 0
+    """
+    If greater than 0, simulation records are inserted into the database by a background thread, in bulk inserts
+    of at most this many documents, and any still queued are written when the process exits.  If 0, each
+    record is inserted synchronously.
+    """
+
+    WRITE_BEHIND_QUEUE_SIZE = 1000
+    """
+    Maximum number of records waiting for write-behind insertion, after which storing a record blocks.
+    """
+
+    SLATKIN_CACHE_SIZE = 10000
+    """
+    Maximum number of Slatkin exact test results held in the in-process cache.
+    """
+
+    SLATKIN_CACHE_PATH = None
+    """
+    Path of an SQLite file in which Slatkin exact test results are cached and shared among simulation processes
+    on the same host.  If None, results are cached only in memory, for the life of the process.
+    """
+
 
     STRUCTURE_PERIODIC_BOUNDARY = [True, False]
 
@@ -72,6 +132,20 @@ class BaseConfiguration(object):
 
     SAMPLE_SIZES_STUDIED = [10,20,40,80,120]
 
+    NESTED_SAMPLES = False
+    """
+    If True, SampledTraitAnalyzer draws one sample of the largest size at each update and takes the smaller
+    sample sizes as its prefixes, rather than drawing an independent sample for each size.
+    """
+
+    RAREFACTION = False
+    """
+    If True, the simulation scripts report the richness, entropy, IQV and number of configurations for each
+    sample size (and TA interval) as their expected values under sampling without replacement, computed
+    analytically from the population's (or the time averaged) counts by ctmixtures.analysis.RarefactionTraitAnalyzer
+    (or TimeAveragedRarefactionTraitAnalyzer), rather than measured on random samples.
+    """
+
 
     base_parameter_labels = {
         'POPULATION_SIZES_STUDIED' : 'Population sizes',
@@ -346,7 +420,10 @@ class MixtureConfiguration(BaseConfiguration):
                       "_innovation_rate", "_max_time", "_num_features", "_num_traits",
                       "INTERACTION_RULE_CLASS", "POPULATION_STRUCTURE_CLASS", "INNOVATION_RULE_CLASS",
                       "NETWORK_FACTORY_CLASS", "TRAIT_FACTORY_CLASS", "_conformism_strength", "_anticonformism_strength", "_sample_size", "TIME_AVERAGING_CLASS",
-                      "DYNAMICS_CLASS"]
+                      "DYNAMICS_CLASS", "DYNAMICS_BATCH_SIZE", "SLATKIN_CACHE_SIZE", "SLATKIN_CACHE_PATH",
+                      "SLATKIN_MONTECARLO_REPLICATES", "SLATKIN_ADAPTIVE_PRECISION", "SLATKIN_ADAPTIVE_BATCH_SIZE",
+                      "SLATKIN_TABLE_PATH", "FINAL_SAMPLE_PROCESSES", "NESTED_SAMPLES", "RAREFACTION",
+                      "WRITE_BEHIND_BATCH_SIZE", "WRITE_BEHIND_QUEUE_SIZE"]
     """
     List of variables which are never (or at least currently) pretty-printed into summary tables using the latex or markdown/pandoc methods
 
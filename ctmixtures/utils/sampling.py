@@ -56,7 +56,8 @@ def sample_mixture_model(tfa, ssfa, config, timestep):
                                    None,
                                    None,
                                    None,
-                                   None
+                                   None,
+                                   slatkin_replicates=_get_slatkin_replicates(tfa, ssfa)
     )
 
 
@@ -71,7 +72,12 @@ def stop_kandler_remaining_trait_tracking(tfa, ssfa, timestep):
     tfa.update(timestep)
     tfa.kandler_survival_stop(timestep)
 
-def record_final_samples(tfa, ssfa, config, timestep):
+def record_final_samples(tfa, ssfa, config, timestep, pool=None):
+    """
+    Records the final sample of a simulation run.  If pool (a multiprocessing.Pool) is given, the Slatkin
+    exact tests for the final sample, which are independent and dominate its cost, are run in the pool's
+    processes first, and the statistics are then gathered from the analyzers and stored in one call.
+    """
     tfa.update(timestep)
     ssfa.update(timestep)
     # sample from the time averagers, for later statistics calculation
@@ -79,41 +85,72 @@ def record_final_samples(tfa, ssfa, config, timestep):
     # unknown method call
     tfa.take_sample_snapshot()
 
+    if pool is not None:
+        statistics = analysis.precompute_slatkin_tests(pool, lambda: _get_final_sample_slatkin_tests(tfa, ssfa),
+                                                       lambda: _get_final_sample_statistics(tfa, ssfa))
+    else:
+        statistics = _get_final_sample_statistics(tfa, ssfa)
+    data.store_stats_mixture_model(config, timestep, *statistics,
+                                   slatkin_replicates=_get_slatkin_replicates(tfa, ssfa))
+
+
+def _get_slatkin_replicates(tfa, ssfa):
+    """
+    Returns the number of Monte Carlo replicates behind each Slatkin statistic which the analyzers have computed,
+    keyed by the statistic's field in the stored record.
+    """
+    replicates = dict()
+    for analyzer in [tfa, ssfa]:
+        replicates.update(analyzer.get_slatkin_replicates() or dict())
+    return replicates
+
+
+def _get_final_sample_slatkin_tests(tfa, ssfa):
+    """
+    Returns the Slatkin statistics for the final sample, which are all of the statistics which run Slatkin tests.
+    """
+    return [tfa.get_slatkin_exact_probability(),
+            tfa.get_configuration_slatkin_test(),
+            ssfa.get_configuration_slatkin_by_ssize(),
+            ssfa.get_slatkin_by_ssize(),
+            tfa.get_ta_slatkin_exact_probability(),
+            tfa.get_ta_configuration_slatkin_test()]
+
+
+def _get_final_sample_statistics(tfa, ssfa):
+    """
+    Returns the statistics for the final sample, in the order of the arguments of store_stats_mixture_model
+    which follow the timestep.
+    """
     (interval, remaining_traits) = tfa.get_kandler_remaining_traits_per_locus()
 
-
-    data.store_stats_mixture_model(config,
-                                   timestep,
-                                   tfa.get_number_configurations(),
-                                   tfa.get_unlabeled_configuration_counts(),
-                                   tfa.get_slatkin_exact_probability(),
-                                   tfa.get_trait_evenness_entropy(),
-                                   tfa.get_trait_evenness_iqv(),
-                                   tfa.get_unlabeled_frequency_lists(),
-                                   tfa.get_unlableled_count_lists(),
-                                   tfa.get_configuration_slatkin_test(),
-                                   tfa.get_trait_richness(),
-                                   ssfa.get_unlabeled_freq_by_ssize(),
-                                   ssfa.get_unlabeled_counts_by_ssize(),
-                                   ssfa.get_unlabeled_configuration_counts_by_ssize(),
-                                   ssfa.get_configuration_slatkin_by_ssize(),
-                                   ssfa.get_entropy_by_ssize(),
-                                   ssfa.get_iqv_by_ssize(),
-                                   ssfa.get_slatkin_by_ssize(),
-                                   ssfa.get_richness_by_ssize(),
-                                   interval,
-                                   remaining_traits,
-                                   tfa.get_ta_unlabeled_frequency_lists(),
-                                   tfa.get_ta_trait_richness(),
-                                   tfa.get_ta_slatkin_exact_probability(),
-                                   tfa.get_ta_trait_evenness_entropy(),
-                                   tfa.get_ta_trait_evenness_iqv(),
-                                   tfa.get_ta_unlabeled_configuration_counts(),
-                                   tfa.get_ta_number_configurations(),
-                                   tfa.get_ta_configuration_slatkin_test(),
-                                   tfa.get_ta_configuration_evenness_entropy(),
-                                   tfa.get_ta_configuration_evenness_iqv(),
-                                   tfa.get_ta_kandler_remaining_traits_per_locus()
-    )
-
-
+    return [tfa.get_number_configurations(),
+            tfa.get_unlabeled_configuration_counts(),
+            tfa.get_slatkin_exact_probability(),
+            tfa.get_trait_evenness_entropy(),
+            tfa.get_trait_evenness_iqv(),
+            tfa.get_unlabeled_frequency_lists(),
+            tfa.get_unlableled_count_lists(),
+            tfa.get_configuration_slatkin_test(),
+            tfa.get_trait_richness(),
+            ssfa.get_unlabeled_freq_by_ssize(),
+            ssfa.get_unlabeled_counts_by_ssize(),
+            ssfa.get_unlabeled_configuration_counts_by_ssize(),
+            ssfa.get_configuration_slatkin_by_ssize(),
+            ssfa.get_entropy_by_ssize(),
+            ssfa.get_iqv_by_ssize(),
+            ssfa.get_slatkin_by_ssize(),
+            ssfa.get_richness_by_ssize(),
+            interval,
+            remaining_traits,
+            tfa.get_ta_unlabeled_frequency_lists(),
+            tfa.get_ta_trait_richness(),
+            tfa.get_ta_slatkin_exact_probability(),
+            tfa.get_ta_trait_evenness_entropy(),
+            tfa.get_ta_trait_evenness_iqv(),
+            tfa.get_ta_unlabeled_configuration_counts(),
+            tfa.get_ta_number_configurations(),
+            tfa.get_ta_configuration_slatkin_test(),
+            tfa.get_ta_configuration_evenness_entropy(),
+            tfa.get_ta_configuration_evenness_iqv(),
+            tfa.get_ta_kandler_remaining_traits_per_locus()]
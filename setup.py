@@ -15,6 +15,8 @@ setup(name="ctmixtures",
       scripts = [
           'admin/ctmixtures-planner.py',
           'admin/ctmixtures-priorsampler-runbuilder.py',
+          'admin/ctmixtures-build-slatkin-tables.py',
+          'admin/ctmixtures-merge-sqlite.py',
           'analytics/ctmixtures-export-data.py',
           'simulations/sim-ctmixture-notimeaveraging.py',
           'simulations/sim-ctmixture-timeaveraging.py'
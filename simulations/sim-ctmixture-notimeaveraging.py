@@ -18,6 +18,7 @@ import numpy.random as npr
 import random
 import ming
 import sys
+import multiprocessing
 
 import ctmixtures.utils as utils
 import ctmixtures.data as data
@@ -33,6 +34,8 @@ def setup():
     parser.add_argument("--debug", help="turn on debugging output")
     parser.add_argument("--dbhost", help="database hostname, defaults to localhost", default="localhost")
     parser.add_argument("--dbport", help="database port, defaults to 27017", default="27017")
+    parser.add_argument("--storage", help="storage backend, defaults to mongodb", choices=[data.MONGODB, data.SQLITE], default=data.MONGODB)
+    parser.add_argument("--storagedir", help="directory for the per-process SQLite file written with --storage sqlite, defaults to the current directory", default=".")
     parser.add_argument("--configuration", help="Configuration file for experiment", required=True)
     parser.add_argument("--popsize", help="Population size", required=True)
     parser.add_argument("--numloci", help="Number of loci per individual", required=True)
@@ -63,13 +66,21 @@ def setup():
         simconfig.random_seed = args.seed
 
     simconfig.full_command_line = " ".join(sys.argv)
+    analysis.configure_slatkin_cache(simconfig.SLATKIN_CACHE_SIZE, simconfig.SLATKIN_CACHE_PATH)
+    analysis.configure_slatkin_montecarlo(simconfig.SLATKIN_MONTECARLO_REPLICATES, simconfig.SLATKIN_ADAPTIVE_PRECISION,
+                                          simconfig.SLATKIN_ADAPTIVE_BATCH_SIZE)
+    analysis.configure_slatkin_tables(simconfig.SLATKIN_TABLE_PATH)
 
     log.debug("experiment name: %s", args.experiment)
     data.set_experiment_name(args.experiment)
     data.set_database_hostname(args.dbhost)
     data.set_database_port(args.dbport)
-    config = data.getMingConfiguration(data.modules)
-    ming.configure(**config)
+    # Ming (and so a MongoDB server) is only needed when storing records in MongoDB
+    if args.storage == data.MONGODB:
+        config = data.getMingConfiguration(data.modules)
+        ming.configure(**config)
+    data.configure_storage(args.storage, data.get_worker_sqlite_path(args.experiment, args.storagedir))
+    data.configure_write_behind(simconfig.WRITE_BEHIND_BATCH_SIZE, simconfig.WRITE_BEHIND_QUEUE_SIZE)
 
     simconfig.num_features = int(args.numloci)
     simconfig.num_traits = int(args.maxinittraits)
@@ -99,6 +110,11 @@ def setup():
 def main():
     start = time()
 
+    # worker processes for the Slatkin tests of the final sample, started before the population is built
+    pool = None
+    if simconfig.FINAL_SAMPLE_PROCESSES > 0:
+        pool = multiprocessing.Pool(simconfig.FINAL_SAMPLE_PROCESSES)
+
     kandler_interval_in_generations = int(args.kandlerinterval)
     kandler_interval_timesteps = kandler_interval_in_generations * simconfig.popsize
     kandler_start_time = simconfig.maxtime - kandler_interval_timesteps
@@ -142,7 +158,10 @@ def main():
 
 
     tfa = analysis.PopulationTraitAnalyzer(model)
-    ssfa = analysis.SampledTraitAnalyzer(model)
+    if simconfig.RAREFACTION:
+        ssfa = analysis.RarefactionTraitAnalyzer(model)
+    else:
+        ssfa = analysis.SampledTraitAnalyzer(model)
 
     log.info("Starting %s", simconfig.sim_id)
 
@@ -165,7 +184,10 @@ def main():
         # sample and end the simulation
         if timestep >= simconfig.maxtime:
             utils.stop_kandler_remaining_trait_tracking(tfa, ssfa, timestep)
-            utils.record_final_samples(tfa, ssfa, simconfig, timestep)
+            utils.record_final_samples(tfa, ssfa, simconfig, timestep, pool)
+            if pool is not None:
+                pool.close()
+                pool.join()
             endtime = time()
             elapsed = endtime - start
             log.info("Completed: %s  Elapsed: %s", simconfig.sim_id, elapsed)
@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Description here
+
+"""
+
+import logging as log
+import unittest
+import datetime
+import os
+import shutil
+import tempfile
+
+import ming
+import ming.schema
+from bson.objectid import ObjectId
+
+import ctmixtures.data as data
+
+
+class Namespace(object):
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class DataStorageTest(unittest.TestCase):
+
+    def setUp(self):
+        # Ming's in-memory MongoDB stand-in, so that no database server is needed
+        data.set_experiment_name("test")
+        data.set_database_hostname("localhost")
+        data.set_database_port("27017")
+        config = data.getMingConfiguration(data.modules)
+        ming.configure(**dict((key, "mim:///test") for key in config))
+        data.SimulationTiming.m.remove()
+
+    def tearDown(self):
+        data.configure_write_behind(0)
+        data.configure_storage(data.MONGODB)
+
+    def store_timing(self, i, elapsed=1.0):
+        data.store_simulation_timing("urn:uuid:%s" % i, "rule", "pop", "script", "test", elapsed, 100, 50)
+
+    def store_timing_with_id(self, i, object_id):
+        # as stored by a host whose clock gave the ObjectId
+        data.insert_documents(data.SimulationTiming, [dict(_id=object_id, script_filename="script", rule_class="rule",
+                                                           pop_class="pop", simulation_run_id="urn:uuid:%s" % i,
+                                                           experiment_name="test", elapsed_time=1.0, run_length=100,
+                                                           popsize=50)])
+
+    def store_timing_before(self, i, seconds):
+        self.store_timing_with_id(i, ObjectId.from_datetime(datetime.datetime.utcnow() -
+                                                            datetime.timedelta(seconds=seconds)))
+
+    def test_write_behind(self):
+        data.configure_write_behind(3, 5)
+        for i in xrange(10):
+            self.store_timing(i)
+        data.flush_write_behind()
+
+        self.assertEqual(data.SimulationTiming.m.find().count(), 10)
+        writer = data.get_write_behind_writer()
+        self.assertEqual(writer.documents_written, 10)
+        # at most three documents per bulk insert
+        self.assertTrue(writer.batches_written >= 4)
+
+        # stored documents are validated against the schema, as with a synchronous insert
+        record = data.SimulationTiming.m.find(dict(simulation_run_id="urn:uuid:3")).one()
+        self.assertEqual(record.run_length, 100)
+
+    def test_write_behind_error(self):
+        data.configure_write_behind(2)
+        self.store_timing(0, elapsed="not a number")
+        self.assertRaises(ming.schema.Invalid, data.flush_write_behind)
+
+        # the writer continues with later documents
+        self.store_timing(1)
+        data.flush_write_behind()
+        self.assertEqual(data.SimulationTiming.m.find().count(), 1)
+
+    def test_sqlite_storage(self):
+        tempdir = tempfile.mkdtemp()
+        try:
+            # two worker files, the second written behind, and a repeated merge which lists the target itself
+            paths = [data.get_worker_sqlite_path("test", tempdir) + str(i) for i in xrange(2)]
+            data.configure_storage(data.SQLITE, paths[0])
+            for i in xrange(3):
+                self.store_timing(i)
+            data.configure_storage(data.SQLITE, paths[1])
+            data.configure_write_behind(2)
+            for i in xrange(3, 5):
+                self.store_timing(i)
+            data.flush_write_behind()
+            self.assertEqual(data.get_sqlite_store().count("simulation_timing"), 2)
+
+            merged = os.path.join(tempdir, "merged.sqlite")
+            self.assertEqual(data.merge_sqlite_stores(merged, paths), 5)
+            self.assertEqual(data.merge_sqlite_stores(merged, paths + [merged]), 0)
+
+            data.configure_storage(data.SQLITE, merged)
+            records = list(data.find_documents(data.SimulationTiming))
+            self.assertEqual([r['simulation_run_id'] for r in records], ["urn:uuid:%s" % i for i in xrange(5)])
+            self.assertEqual(records[0]['elapsed_time'], 1.0)
+            self.assertEqual(records[0]['popsize'], 50)
+            # nothing was written to MongoDB
+            self.assertEqual(data.SimulationTiming.m.find().count(), 0)
+
+            records = list(data.find_documents(data.SimulationTiming, ['simulation_run_id', 'popsize']))
+            self.assertEqual(sorted(records[4].keys()), ['_id', 'popsize', 'simulation_run_id'])
+        finally:
+            data.configure_storage(data.MONGODB)
+            shutil.rmtree(tempdir)
+
+    def test_projection(self):
+        for i in xrange(3):
+            self.store_timing(i)
+        records = list(data.find_documents(data.SimulationTiming, ['simulation_run_id', 'run_length']))
+        self.assertEqual(len(records), 3)
+        self.assertEqual(sorted(records[0].keys()), ['_id', 'run_length', 'simulation_run_id'])
+        self.assertEqual(records[0]['run_length'], 100)
+
+    def test_run_id_ranges(self):
+        for i in xrange(10):
+            self.store_timing(i)
+        ranges = data.get_run_id_ranges(data.SimulationTiming, 3)
+        self.assertEqual(len(ranges), 3)
+        self.assertEqual(ranges[0][0], None)
+        self.assertEqual(ranges[-1][1], None)
+
+        # the ranges partition the records, in order
+        run_ids = []
+        for run_id_range in ranges:
+            shard = [r['simulation_run_id'] for r in data.find_documents(data.SimulationTiming, ['simulation_run_id'],
+                                                                         run_id_range)]
+            self.assertTrue(3 <= len(shard) <= 4)
+            run_ids.extend(sorted(shard))
+        self.assertEqual(run_ids, sorted("urn:uuid:%s" % i for i in xrange(10)))
+
+    def test_insertion_watermark(self):
+        self.assertEqual(data.get_insertion_watermark(data.SimulationTiming), None)
+        for i in xrange(3):
+            self.store_timing_before(i, 3600 - i)
+        watermark = data.get_insertion_watermark(data.SimulationTiming)
+        for i in xrange(3, 5):
+            self.store_timing_before(i, 1800 - i)
+
+        records = data.find_documents(data.SimulationTiming, ['simulation_run_id'], insertion_range=(watermark, None))
+        self.assertEqual(sorted(r['simulation_run_id'] for r in records), ["urn:uuid:3", "urn:uuid:4"])
+        records = data.find_documents(data.SimulationTiming, ['simulation_run_id'], insertion_range=(None, watermark))
+        self.assertEqual(len(list(records)), 3)
+
+    def test_late_insertion(self):
+        self.store_timing_before(0, 3600)
+        self.store_timing(1)
+        watermark = data.get_insertion_watermark(data.SimulationTiming)
+        records = data.find_documents(data.SimulationTiming, ['simulation_run_id'], insertion_range=(None, watermark))
+        self.assertEqual([r['simulation_run_id'] for r in records], ["urn:uuid:0"])
+
+        # stored after the watermark was taken, by a host whose ObjectId sorts below the most recent one
+        latest = data.SimulationTiming.m.find(dict(simulation_run_id="urn:uuid:1")).one()._id
+        late = ObjectId.from_datetime(latest.generation_time)
+        self.assertTrue(late < latest)
+        self.store_timing_with_id(2, late)
+
+        records = data.find_documents(data.SimulationTiming, ['simulation_run_id'], insertion_range=(watermark, None))
+        self.assertEqual(sorted(r['simulation_run_id'] for r in records), ["urn:uuid:1", "urn:uuid:2"])
+
+    def test_summary_stats(self):
+        record = dict(num_features=2, sample_size=[20, 30], slatkin_exact=[0.1, 0.3], shannon_entropy=[1.0, 2.0],
+                      iqv_diversity=[0.3, 0.5], pop_richness=[3, 4], kandler_remaining_count=[2, 1],
+                      trait_configuration_counts=[5, 3, 2], unlabeled_frequencies=[[0.5, 0.5], [0.9, 0.1]],
+                      unlabeled_config_counts_ssize={'20': {'a': 1}, '30': {'a': 1, 'b': 2}},
+                      config_slatkin_ssize={'20': 0.1, '30': 0.2}, richness_ssize={'20': [1, 2], '30': [3, 4]},
+                      slatkin_ssize={'20': [0.1, 0.2], '30': [0.3, 0.4]},
+                      entropy_ssize={'20': [1.1, 1.2], '30': [1.3, 1.4]}, iqv_ssize={'20': [0.5, 0.6], '30': [0.7, 0.8]})
+
+        summary = data.get_population_summary(record)
+        self.assertEqual(summary['richness_locus_max'], 4)
+        self.assertAlmostEqual(summary['slatkin_locus_mean'], 0.2)
+        self.assertAlmostEqual(summary['neiman_tf_locus_min'], 1.0 / (0.81 + 0.01) - 1.0)
+
+        summaries = data.get_sampled_summary(record)
+        self.assertEqual([s['sample_size'] for s in summaries], [20, 30])
+        self.assertEqual(summaries[1]['num_configurations_ssize'], 2)
+        self.assertEqual(summaries[1]['richness_locus_min'], 3)
+        self.assertAlmostEqual(summaries[0]['iqv_locus_mean'], 0.55)
+
+        # the summaries are plain values, which can be stored in the record itself
+        record['population_summary'] = summary
+        record['sampled_summary'] = summaries
+        self.assertEqual(data.MixtureModelStats.m.make(record).sampled_summary[1]['config_slatkin_ssize'], 0.2)
+
+    def test_store_without_ta_stats(self):
+        # a run without time averaging or Kandler tracking, whose analyzers return None for those statistics
+        config = Namespace(sim_id="urn:uuid:0", script="script", model_class_label="model", full_command_line="",
+                           random_seed=1, INTERACTION_RULE_CLASS="rule", POPULATION_STRUCTURE_CLASS="pop",
+                           NETWORK_FACTORY_CLASS="network", TRAIT_FACTORY_CLASS="traits",
+                           INNOVATION_RULE_CLASS="innovation", num_features=2, num_traits=10,
+                           conformism_strength=0.1, anticonformism_strength=0.1, configured_innovation_rate=0.01,
+                           SAMPLE_SIZES_STUDIED=[20, 30], popsize=100)
+        data.MixtureModelStats.m.remove()
+        data.store_stats_mixture_model(config, 100, 3, [5, 3, 2], [0.1, 0.3], [1.0, 2.0], [0.3, 0.5],
+                                       [[0.5, 0.5], [0.9, 0.1]], [[50, 50], [90, 10]], 0.2, [3, 4],
+                                       {'20': [[0.5, 0.5]], '30': [[0.5, 0.5]]}, {'20': [[10, 10]], '30': [[15, 15]]},
+                                       {'20': {'a': 1}, '30': {'a': 1, 'b': 2}}, {'20': 0.1, '30': 0.2},
+                                       {'20': [1.1, 1.2], '30': [1.3, 1.4]}, {'20': [0.5, 0.6], '30': [0.7, 0.8]},
+                                       {'20': [0.1, 0.2], '30': [0.3, 0.4]}, {'20': [1, 2], '30': [3, 4]},
+                                       *([None] * 14))
+
+        record = data.MixtureModelStats.m.find().one()
+        self.assertEqual(record.ta_sampled_summary, [])
+        self.assertEqual(len(record.sampled_summary), 2)
+        self.assertFalse('kandler_locus_min' in record.population_summary)
+        self.assertEqual(record.population_summary['richness_locus_max'], 4)
+
+
+if __name__ == "__main__":
+    log.basicConfig(level=log.DEBUG, format='%(asctime)s %(levelname)s: %(message)s')
+    unittest.main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# Copyright (c) 2013.  Mark E. Madsen <mark@madsenlab.org>
+#
+# This work is licensed under the terms of the Apache Software License, Version 2.0.  See the file LICENSE for details.
+
+"""
+Description here
+
+"""
+
+import logging as log
+import unittest
+from collections import defaultdict
+
+import numpy.random as npr
+
+import ctmixtures.utils as utils
+import ctmixtures.traits as traits
+import ctmixtures.population as pop
+import ctmixtures.rules as rules
+import ctmixtures.dynamics as dynamics
+from ctmixtures.population.configuration_keys import configuration_key
+
+
+class DynamicsTest(unittest.TestCase):
+    filename = "test/test.json"
+
+    def _build_model(self, population_class, random_seed=None):
+        config = utils.MixtureConfiguration(self.filename)
+        config.random_seed = random_seed
+        config.popsize = 100
+        config.num_features = 3
+        config.num_traits = 10
+        config.periodic = 1
+        config.conformism_strength = 0.2
+        config.anticonformism_strength = 0.1
+        config.innovation_rate = 0.01
+        irule = config.INTERACTION_RULE_CLASS
+        parsed = utils.parse_interaction_rule_map(irule)
+
+        tf = traits.LocusAlleleTraitFactory(config)
+        lf = pop.SquareLatticeFactory(config)
+        p = population_class(config,lf,tf)
+
+        constructed = utils.construct_rule_objects(parsed,p)
+        p.interaction_rules = constructed
+        p.initialize_population()
+        return (config, p)
+
+
+    def test_batched_dynamics(self):
+        log.info("entering test_batched_dynamics")
+
+        for population_class in [pop.FixedTraitStructurePopulation, pop.ArrayTraitStructurePopulation]:
+            (config, p) = self._build_model(population_class)
+            config.DYNAMICS_BATCH_SIZE = 1000
+            innovation_rule = rules.InfiniteAllelesMutationRule(p)
+            d = dynamics.BatchedMoranDynamics(config, p, innovation_rule)
+
+            # run across several block boundaries
+            timestep = 0
+            while timestep < 5500:
+                timestep = d.update()
+
+            self.assertEqual(timestep, 5500)
+            self.assertEqual(p.get_interactions(), 5500)
+            self.assertEqual(sum(p.get_innovations_by_locus()), p.get_innovations())
+
+
+    def test_batched_dynamics_seeded(self):
+        log.info("entering test_batched_dynamics_seeded")
+
+        draws = []
+        for i in xrange(0, 2):
+            (config, p) = self._build_model(pop.FixedTraitStructurePopulation, random_seed=42)
+            config.DYNAMICS_BATCH_SIZE = 100
+            d = dynamics.BatchedMoranDynamics(config, p, rules.InfiniteAllelesMutationRule(p))
+            # other users of the global stream do not change the dynamics' draws
+            npr.random_sample(i + 1)
+            d._draw_batch()
+            draws.append((d._agents, d._loci, d._neighbor_draws, d._rule_draws, d._innovations))
+        self.assertEqual(draws[0], draws[1])
+
+
+    def test_live_trait_counts(self):
+        log.info("entering test_live_trait_counts")
+
+        for population_class in [pop.FixedTraitStructurePopulation, pop.ArrayTraitStructurePopulation]:
+            (config, p) = self._build_model(population_class)
+            innovation_rule = rules.InfiniteAllelesMutationRule(p)
+            d = dynamics.MoranDynamics(config, p, innovation_rule)
+            for i in xrange(0, 2000):
+                d.update()
+
+            live_counts = p.get_locus_trait_counts()
+            for locus in xrange(0, config.num_features):
+                scanned = defaultdict(int)
+                for agent_id in p.get_agent_ids():
+                    scanned[p.get_agent_trait(agent_id, locus)] += 1
+                self.assertEqual(dict(scanned), dict(live_counts[locus]))
+
+            scanned = defaultdict(int)
+            for agent_id in p.get_agent_ids():
+                key = configuration_key(p.get_agent_traits(agent_id))
+                self.assertEqual(key, p.get_agent_configuration_key(agent_id))
+                scanned[key] += 1
+            self.assertEqual(dict(scanned), dict(p.get_configuration_counts()))
+
+
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -10,6 +10,9 @@ Description here
 
 import logging as log
 import unittest
+from collections import defaultdict
+
+import numpy as np
 
 import ctmixtures.utils as utils
 import ctmixtures.traits as traits
@@ -61,6 +64,128 @@ class PopulationInitializationTest(unittest.TestCase):
         log.debug("initialized population: %s", p)
 
 
+    def test_array_initialization(self):
+        log.info("entering test_array_initialization")
+
+        config = utils.MixtureConfiguration(self.filename)
+        config.popsize = 100
+        config.num_features = 2
+        config.num_traits = 10
+        irule = config.INTERACTION_RULE_CLASS
+        parsed = utils.parse_interaction_rule_map(irule)
+
+        tf = traits.LocusAlleleTraitFactory(config)
+        lf = pop.SquareLatticeFactory(config)
+        p = pop.ArrayTraitStructurePopulation(config,lf,tf)
+
+        constructed = utils.construct_rule_objects(parsed,p)
+        p.interaction_rules = constructed
+
+        p.initialize_population()
+
+        self.assertEqual(p.traits.shape, (config.popsize, config.num_features))
+        self.assertEqual(len(p.rule_codes), config.popsize)
+
+        # every agent's rule is one of the constructed rule objects, and copying works on row indices
+        rule_objects = [rule["class"] for rule in constructed]
+        for agent_id in p.get_agent_ids():
+            self.assertTrue(p.get_agent_rule(agent_id) in rule_objects)
+
+        neighbor_id = p.get_random_neighbor_id_for_agent(0)
+        p.copy_agent_trait(0, neighbor_id, 1)
+        self.assertEqual(p.get_agent_trait(0, 1), p.get_agent_trait(neighbor_id, 1))
+
+
+    def test_csr_adjacency(self):
+        log.info("entering test_csr_adjacency")
+
+        config = utils.MixtureConfiguration(self.filename)
+        config.popsize = 100
+        config.periodic = 0
+
+        lf = pop.SquareLatticeFactory(config)
+        graph = lf.get_graph()
+        index = lf.get_adjacency_index(graph)
+
+        self.assertEqual(index.get_number_of_nodes(), config.popsize)
+        for node in graph.nodes():
+            self.assertEqual(sorted(graph.neighbors(node)), sorted(index.get_neighbors(node).tolist()))
+            self.assertEqual(index.get_degree(node), graph.degree(node))
+            self.assertTrue(index.get_neighbor_for_draw(node, 0.999) in graph.neighbors(node))
+
+
+    def test_well_mixed_population(self):
+        log.info("entering test_well_mixed_population")
+
+        config = utils.MixtureConfiguration(self.filename)
+        config.popsize = 100
+        config.num_features = 3
+        config.num_traits = 10
+        irule = config.INTERACTION_RULE_CLASS
+        parsed = utils.parse_interaction_rule_map(irule)
+
+        tf = traits.LocusAlleleTraitFactory(config)
+        lf = pop.WellMixedFactory(config)
+        p = pop.ArrayTraitStructurePopulation(config,lf,tf)
+
+        constructed = utils.construct_rule_objects(parsed,p)
+        p.interaction_rules = constructed
+        p.initialize_population()
+
+        self.assertEqual(p.get_population_size(), config.popsize)
+        for draw in [0.0, 0.25, 0.5, 0.999]:
+            self.assertNotEqual(p.get_neighbor_id_for_draw(10, draw), 10)
+
+        p.set_agent_trait(10, 0, 1000)
+        p.copy_agent_trait(11, 10, 0)
+        counts = p.get_neighbor_trait_counts(10, 0)
+        self.assertEqual(counts[1000], 1)
+        self.assertEqual(sum(counts.values()), config.popsize - 1)
+
+        # the neighbor counts are a view of the live counts, which matches a scan of the other agents
+        scanned = defaultdict(int)
+        for agent_id in p.get_agent_ids():
+            if agent_id != 10:
+                scanned[p.get_agent_trait(agent_id, 0)] += 1
+        self.assertEqual(dict(counts.items()), dict(scanned))
+        self.assertEqual(len(counts), len(scanned))
+
+        # Agent accessors do not need a graph
+        agent = p.get_agent_by_id(10)
+        self.assertEqual(agent.traits, p.get_agent_traits(10))
+        self.assertTrue(agent.rule is p.get_agent_rule(10))
+        self.assertNotEqual(p.get_random_neighbor_for_agent(10).id, 10)
+
+        self.assertRaises(ValueError, pop.FixedTraitStructurePopulation, config, lf, tf)
+
+
+    def test_trait_registry_recycling(self):
+        log.info("entering test_trait_registry_recycling")
+
+        (registry, slots) = pop.LocusTraitRegistry.from_traits(np.array([5, 7, 5, 9]))
+        live_counts = registry.get_trait_counts()
+        self.assertEqual(live_counts, {5: 2, 7: 1, 9: 1})
+        self.assertEqual([registry.get_trait(slot) for slot in slots.tolist()], [5, 7, 5, 9])
+
+        # trait 7 goes extinct, and the next new trait reuses its slot
+        seven = registry.get_slot(7)
+        registry.decrement(seven)
+        new_slot = registry.get_slot(1000)
+        registry.increment(new_slot)
+        self.assertEqual(new_slot, seven)
+        self.assertEqual(registry.get_capacity(), 3)
+        self.assertEqual(registry.get_count(7), 0)
+        self.assertEqual(registry.get_trait_counts(), {5: 2, 1000: 1, 9: 1})
+        # the counts by trait are kept live, rather than rebuilt for each caller
+        self.assertTrue(registry.get_trait_counts() is live_counts)
+
+        # the last holder of a trait leaves it, and the new trait in its slot is counted from zero
+        registry.decrement(new_slot)
+        self.assertEqual(registry.get_count(1000), 0)
+        registry.increment(registry.get_slot(2000))
+        self.assertEqual(registry.get_trait_counts(), {5: 2, 2000: 1, 9: 1})
+
+
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
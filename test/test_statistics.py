@@ -11,6 +11,12 @@ Description here
 import logging as log
 import unittest
 import pprint as pp
+import os
+import shutil
+import tempfile
+import math
+import numpy as np
+import multiprocessing
 
 import ctmixtures.utils as utils
 import ctmixtures.traits as traits
@@ -105,6 +111,10 @@ class PopulationInitializationTest(unittest.TestCase):
 
         res = tfa.get_slatkin_by_ssize()
         log.info("slatkin by ssize: %s", res)
+        # the replicates behind each test are recorded with the same labels
+        replicates = tfa.get_slatkin_replicates()['slatkin_ssize']
+        self.assertEqual(replicates.axes, res.axes)
+        self.assertEqual(replicates.get_labels('ssize'), res.get_labels('ssize'))
 
         res = tfa.get_richness_by_ssize()
         log.info("richness by ssize: %s", res)
@@ -127,6 +137,161 @@ class PopulationInitializationTest(unittest.TestCase):
         self.assertTrue(True)
 
 
+    def test_rarefaction(self):
+        log.info("test_rarefaction")
+
+        counts = [50, 20, 10, 5, 5, 3, 3, 2, 1, 1]
+        (richness, entropy, iqv) = analysis.rarefy(counts, [1, 2, 100, 500])
+
+        # a single draw has one trait and no diversity, and the whole population is not a sample at all
+        self.assertAlmostEqual(richness[0], 1.0)
+        self.assertAlmostEqual(entropy[0], 0.0)
+        self.assertAlmostEqual(iqv[0], 0.0)
+        # two draws hold distinct traits with probability 1 - sum(N_i (N_i - 1)) / (N (N - 1))
+        same = sum(c * (c - 1) for c in counts) / float(100 * 99)
+        self.assertAlmostEqual(richness[1], 2.0 - same)
+        self.assertAlmostEqual(entropy[1], (1.0 - same) * math.log(2))
+        freqs = [c / 100.0 for c in counts]
+        for i in [2, 3]:
+            self.assertAlmostEqual(richness[i], 10.0)
+            self.assertAlmostEqual(entropy[i], analysis.diversity_shannon_entropy(freqs))
+            self.assertAlmostEqual(iqv[i], analysis.diversity_iqv(freqs))
+
+        # the vectorized log gamma agrees with the math module, for small and large (time averaged) counts
+        for x in [1.0, 2.0, 3.5, 14.0, 15.0, 100.0, 1e9]:
+            expected = math.lgamma(x)
+            self.assertAlmostEqual(analysis.log_gamma([x])[0] / max(expected, 1.0), expected / max(expected, 1.0),
+                                   places=12)
+
+        # time averaged totals (here about 1e10), against probabilities built one draw at a time with log1p
+        counts = [4e9, 3e9, 2e9, 8e8, 1.5e8, 4e7, 9e6, 8e5, 5e4, 3000, 120, 7]
+        total = sum(counts)
+
+        def log_absent(count, start, stop):
+            return sum(math.log1p(-count / (total - j)) for j in xrange(start, stop))
+
+        def pmf(count, n, x):
+            # C(n, x) (N_i)_x (N - N_i)_(n-x) / (N)_n, with the falling factorials summed exactly in log space
+            if x > count:
+                return 0.0
+            terms = [math.lgamma(n + 1), -math.lgamma(x + 1), -math.lgamma(n - x + 1)]
+            terms.extend(math.log(count - j) for j in xrange(x))
+            terms.extend(math.log(total - count - j) for j in xrange(n - x))
+            terms.extend(-math.log(total - j) for j in xrange(n))
+            return math.exp(math.fsum(terms))
+
+        sizes = [10, 120]
+        (richness, entropy, iqv) = analysis.rarefy(counts, sizes)
+        for i, n in enumerate(sizes):
+            expected_richness = sum(1.0 - math.exp(log_absent(c, 0, n)) for c in counts)
+            self.assertAlmostEqual(richness[i], expected_richness, places=9)
+            expected_entropy = 0.0 - sum(pmf(c, n, x) * (float(x) / n) * math.log(float(x) / n)
+                                         for c in counts for x in xrange(1, n + 1))
+            self.assertAlmostEqual(entropy[i], expected_entropy, places=9)
+
+
+    def test_rarefaction_analyzer(self):
+        log.info("test_rarefaction_analyzer")
+
+        config = utils.MixtureConfiguration(self.filename)
+        config.popsize = 100
+        config.num_features = 2
+        config.num_traits = 30
+        irule = config.INTERACTION_RULE_CLASS
+        parsed = utils.parse_interaction_rule_map(irule)
+
+        tf = traits.LocusAlleleTraitFactory(config)
+        lf = pop.SquareLatticeFactory(config)
+        p = pop.FixedTraitStructurePopulation(config,lf,tf)
+
+        constructed = utils.construct_rule_objects(parsed,p)
+        p.interaction_rules = constructed
+
+        p.initialize_population()
+
+        rfa = analysis.RarefactionTraitAnalyzer(p)
+        rfa.update(10)
+        richness = rfa.get_richness_by_ssize()
+        log.info("expected richness by ssize: %s", richness)
+        log.info("expected entropy by ssize: %s", rfa.get_entropy_by_ssize())
+        log.info("expected iqv by ssize: %s", rfa.get_iqv_by_ssize())
+        log.info("expected configurations by ssize: %s", rfa.get_num_configurations_by_ssize())
+
+        # the statistics have the axes of those of SampledTraitAnalyzer, whose samples supply the others
+        ssfa = analysis.SampledTraitAnalyzer(p)
+        ssfa.update(10)
+        self.assertEqual(richness.axes, ssfa.get_richness_by_ssize().axes)
+        self.assertEqual(rfa.get_num_configurations_by_ssize().axes, ssfa.get_num_configurations_by_ssize().axes)
+        self.assertEqual(rfa.get_slatkin_by_ssize().axes, ssfa.get_slatkin_by_ssize().axes)
+
+        sizes = sorted(rfa.sample_sizes)
+        for smaller, larger in zip(sizes, sizes[1:]):
+            for locus in xrange(config.num_features):
+                self.assertTrue(richness.select(ssize=smaller, locus=locus) <=
+                                richness.select(ssize=larger, locus=locus))
+
+
+    def test_batched_subsampling(self):
+        log.info("test_batched_subsampling")
+
+        # huge counts, like those of long time averaging windows, are sampled without expanding them
+        counters = [{'a': 10 ** 9, 'b': 3 * 10 ** 9, 'c': 5}, {17: 4, 23: 1}, {}]
+        samples = analysis.sample_counters(counters, [10, 40])
+        self.assertEqual(len(samples), 3)
+        for ssize in [10, 40]:
+            self.assertEqual(sum(samples[0][ssize].values()), ssize)
+            # a sample larger than its counts is the whole count map
+            self.assertEqual(samples[1][ssize], {17: 4, 23: 1})
+            self.assertEqual(len(samples[2][ssize]), 0)
+
+        # a wide count map, like configuration counts, is drawn apart from the narrow ones, in the same order
+        wide = dict(('config%s' % i, 1) for i in xrange(100))
+        samples = analysis.sample_counters([{17: 4, 23: 1}, wide, {'a': 5}], [10, 40])
+        self.assertEqual(samples[0][40], {17: 4, 23: 1})
+        self.assertEqual(len(samples[1][40]), 40)
+        self.assertTrue(set(samples[1][10]).issubset(wide))
+        self.assertEqual(samples[2][10], {'a': 5})
+
+        sampled = analysis.sample_count_matrix(np.array([[30, 10, 0], [2, 2, 2]]), [20, 6])
+        self.assertEqual(sampled.sum(axis=1).tolist(), [20, 6])
+        self.assertEqual(sampled[1].tolist(), [2, 2, 2])
+        self.assertEqual(sampled[0, 2], 0)
+        self.assertTrue(sampled[0, 1] <= 10)
+
+
+    def test_nested_trait_samples(self):
+        log.info("test_nested_trait_samples")
+
+        config = utils.MixtureConfiguration(self.filename)
+        config.popsize = 100
+        config.num_features = 2
+        config.num_traits = 30
+        config.NESTED_SAMPLES = True
+        irule = config.INTERACTION_RULE_CLASS
+        parsed = utils.parse_interaction_rule_map(irule)
+
+        tf = traits.LocusAlleleTraitFactory(config)
+        lf = pop.SquareLatticeFactory(config)
+        p = pop.FixedTraitStructurePopulation(config,lf,tf)
+
+        constructed = utils.construct_rule_objects(parsed,p)
+        p.interaction_rules = constructed
+
+        p.initialize_population()
+
+        tfa = analysis.SampledTraitAnalyzer(p)
+        tfa.update(10)
+
+        # each sample is a prefix of the next larger one, so no trait count can shrink as the size grows
+        sizes = sorted(tfa.sample_sizes)
+        for smaller, larger in zip(sizes, sizes[1:]):
+            for locus in xrange(config.num_features):
+                self.assertEqual(sum(tfa.counts[smaller][locus].values()), smaller)
+                for trait, count in tfa.counts[smaller][locus].items():
+                    self.assertTrue(tfa.counts[larger][locus][trait] >= count)
+            self.assertEqual(sum(tfa.culture_counts[larger].values()), larger)
+
+
     def test_neiman_tf(self):
         log.info("test_neiman_tf")
 
@@ -137,6 +302,166 @@ class PopulationInitializationTest(unittest.TestCase):
         self.assertAlmostEqual(obs, expected, delta = 0.1)
 
 
+    def test_batch_diversity(self):
+        log.info("test_batch_diversity")
+
+        count_lists = [[5, 5], [10], [6, 3, 1], []]
+        (entropy, iqv, richness, tf) = analysis.batch_diversity(count_lists)
+        self.assertEqual(richness.tolist(), [2, 1, 3, 0])
+
+        # the scalar statistics agree with the batch kernels row by row
+        for i, counts in enumerate(count_lists[:3]):
+            freqs = [float(c) / sum(counts) for c in counts]
+            self.assertAlmostEqual(entropy[i], analysis.diversity_shannon_entropy(freqs))
+            self.assertAlmostEqual(iqv[i], analysis.diversity_iqv(freqs))
+            self.assertAlmostEqual(tf[i], analysis.neiman_tf(freqs))
+
+        self.assertAlmostEqual(entropy[0], math.log(2))
+        self.assertAlmostEqual(iqv[0], 1.0)
+        self.assertEqual(entropy[1], 0.0)
+        self.assertEqual(iqv[1], 0.0)
+        self.assertAlmostEqual(tf[0], 1.0)
+
+
+    def test_slatkin_cache(self):
+        log.info("test_slatkin_cache")
+
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, "slatkin.sqlite")
+            cache = analysis.SlatkinResultCache(2, path)
+            key = cache.make_key([2, 18], "fixed:100000")
+            self.assertEqual(key, ((18, 2), "fixed:100000"))
+            self.assertEqual(cache.get(key), None)
+            cache.put(key, (0.25, 1.5, 100000))
+            self.assertEqual(cache.get(key), (0.25, 1.5, 100000))
+
+            # the least recently used entry is evicted from memory, but remains on disk
+            cache.put(cache.make_key([10, 5], "fixed:100000"), (0.5, 1.0, 100000))
+            cache.put(cache.make_key([3, 3, 3], "fixed:100000"), (0.75, 2.0, 100000))
+            self.assertFalse(key in cache.entries)
+            self.assertEqual(cache.get(key), (0.25, 1.5, 100000))
+
+            # a second cache (i.e., another process) sharing the file sees the results
+            other = analysis.SlatkinResultCache(10, path)
+            self.assertEqual(other.get(cache.make_key([5, 10], "fixed:100000")), (0.5, 1.0, 100000))
+            self.assertEqual(other.disk_hits, 1)
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+    def test_adaptive_slatkin(self):
+        log.info("test_adaptive_slatkin")
+
+        # the interval for a proportion near zero is much narrower than for one near one half
+        self.assertTrue(analysis.wilson_half_width(0.0, 2000) < analysis.wilson_half_width(0.5, 2000))
+
+        (prob, theta, reps) = analysis.adaptive_montecarlo([18, 2], 0.01, 1000, 100000)
+        log.info("adaptive slatkin prob: %s theta: %s reps: %s", prob, theta, reps)
+        self.assertTrue(0.0 <= prob <= 1.0)
+        self.assertEqual(reps % 1000, 0)
+        self.assertTrue(reps == 100000 or analysis.wilson_half_width(prob, reps) <= 0.01)
+
+
+    def test_exact_slatkin_tables(self):
+        log.info("test_exact_slatkin_tables")
+
+        tables = analysis.SlatkinExactTables.build([10, 200], max_size=50)
+        self.assertEqual(tables.get_sample_sizes(), [10])
+        self.assertEqual(tables.lookup([18, 2]), None)
+
+        # an even split is the least likely two-allele configuration, and a single allele is certain
+        self.assertTrue(tables.lookup([5, 5])[0] < tables.lookup([9, 1])[0])
+        self.assertAlmostEqual(tables.lookup([10])[0], 1.0)
+
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, "slatkin.npz")
+            tables.save(path)
+            analysis.configure_slatkin_tables(path)
+            (prob, theta, reps) = analysis.slatkin_test([1, 2, 3, 4])
+            self.assertEqual(reps, 0)
+            self.assertAlmostEqual(prob, tables.lookup([4, 3, 2, 1])[0])
+        finally:
+            analysis.configure_slatkin_tables(None)
+            shutil.rmtree(tmpdir)
+
+
+    def test_parallel_slatkin_precompute(self):
+        log.info("test_parallel_slatkin_precompute")
+
+        analysis.configure_slatkin_cache(100)
+        count_lists = [[18, 2], [2, 18], [10, 5, 5], [7, 7, 6]]
+        compute = lambda: [analysis.slatkin_test(counts) for counts in count_lists]
+
+        pool = multiprocessing.Pool(2)
+        try:
+            analysis.precompute_slatkin_tests(pool, compute)
+
+            # only the three distinct configurations are run, and computing afterwards only hits the cache
+            cache = analysis.get_slatkin_cache()
+            self.assertEqual(len(cache.entries), 3)
+            cache.misses = 0
+            results = compute()
+            self.assertEqual(cache.misses, 0)
+            self.assertEqual(results[0], results[1])
+            for (prob, theta, reps) in results:
+                self.assertTrue(0.0 <= prob <= 1.0)
+
+            # with a cache too small for every result, compute() still uses the precomputed results
+            analysis.configure_slatkin_cache(1)
+            cache = analysis.get_slatkin_cache()
+            precomputed = analysis.precompute_slatkin_tests(pool, compute, compute)
+            self.assertEqual(len(cache.entries), 1)
+            # only the lookups made while collecting the tests miss
+            self.assertEqual(cache.misses, len(count_lists))
+            self.assertEqual(len(precomputed), 4)
+        finally:
+            pool.close()
+            pool.join()
+            analysis.configure_slatkin_cache(100)
+
+    def test_statistic_array(self):
+        items = [((10, 0, 20), 3), ((10, 1, 20), 5), ((10, 0, 30), 4), ((10, 1, 30), 6),
+                 ((50, 0, 20), 7), ((50, 1, 20), 8), ((50, 0, 30), 9), ((50, 1, 30), 2)]
+        axes = (analysis.statistic_array.INTERVAL, analysis.statistic_array.LOCUS, analysis.statistic_array.SSIZE)
+        stat = analysis.StatisticArray.from_items(axes, items)
+        self.assertEqual(stat.values.dtype, np.int64)
+        self.assertEqual(stat.get_labels('interval'), [10, 50])
+        self.assertEqual(list(stat.select(interval=50, ssize=20)), [7, 8])
+        self.assertEqual(stat.select(interval=10, locus=1, ssize=30), 6)
+
+        # nested dict access, as with the stored format the container replaces
+        self.assertEqual(stat['10']['1']['20'], 5)
+        self.assertEqual(sorted(stat.keys()), ['10', '50'])
+
+        # round trip through the database document, and the legacy nested format
+        doc = stat.to_document()
+        restored = analysis.StatisticArray.from_document(doc)
+        self.assertEqual(restored.axes, stat.axes)
+        self.assertTrue(np.array_equal(restored.values, stat.values))
+        legacy = stat.to_nested()
+        self.assertEqual(legacy['50']['0']['30'], 9)
+        converted = analysis.StatisticArray.from_document(legacy, axes)
+        self.assertTrue(np.array_equal(converted.values, stat.values))
+
+        # lists in the nested format are indexed by position, and missing entries are NaN
+        converted = analysis.StatisticArray.from_document({'20': [0.5, 0.25], '30': [0.75]}, ('ssize', 'locus'))
+        self.assertEqual(list(converted.select(ssize=20)), [0.5, 0.25])
+        self.assertTrue(np.isnan(converted.select(ssize=30, locus=1)))
+
+        # lists of equal length and dicts are held as entries of an object array
+        items = [((20, 0), [0.5, 0.5]), ((20, 1), [0.75, 0.25]), ((30, 0), [1.0])]
+        stat = analysis.StatisticArray.from_items(('ssize', 'locus'), items)
+        self.assertEqual(stat.values.shape, (2, 2))
+        restored = analysis.StatisticArray.from_document(stat.to_document())
+        self.assertEqual(restored.select(ssize=20, locus=1), [0.75, 0.25])
+        self.assertEqual(restored.select(ssize=30, locus=1), None)
+        self.assertEqual(sorted(restored.entries())[0], ((20, 0), [0.5, 0.5]))
+        counts = analysis.StatisticArray.from_items(('ssize',), [((20,), {'12': 3, '7': 1}), ((30,), {'12': 4})])
+        self.assertEqual(analysis.StatisticArray.from_document(counts.to_document())['20'], {'12': 3, '7': 1})
+
+
 
 
 
@@ -16,6 +16,8 @@ import ctmixtures.utils as utils
 import ctmixtures.traits as traits
 import ctmixtures.population as pop
 import ctmixtures.analysis as analysis
+import ctmixtures.rules as rules
+import ctmixtures.dynamics as dynamics
 
 import pytransmission.aggregation as agg
 
@@ -88,12 +90,8 @@ class TAStatisticsTest(unittest.TestCase):
 
         unlabeled_freq = tfa.get_ta_unlabeled_frequency_lists()
         log.info("unlabeled freq: %s", unlabeled_freq)
-        for interval, locuslist in unlabeled_freq.items():
-            l = 0
-            for locus in locuslist:
-                s = sum(locus)
-                log.info("interval: %s locus: %s sum: %s", interval, l, s)
-                l += 1
+        for (interval, locus), freqs in unlabeled_freq.entries():
+            log.info("interval: %s locus: %s sum: %s", interval, locus, sum(freqs))
 
 
         # can't test equality because we're assigning initial traits randomly
@@ -185,6 +183,150 @@ class TAStatisticsTest(unittest.TestCase):
         self.assertTrue(True)
 
 
+    def test_piecewise_constant_time_averager(self):
+        log.info("test_piecewise_constant_time_averager")
+
+        config = utils.MixtureConfiguration(self.filename)
+        config.popsize = 25
+        config.num_features = 3
+        config.num_traits = 10
+        config.innovation_rate = 0.05
+        irule = config.INTERACTION_RULE_CLASS
+
+        intervals = [2,5,10]
+        # the analyzers read the change journal independently, so the order in which they are updated
+        # does not matter
+        for reference_first in [False, True]:
+            parsed = utils.parse_interaction_rule_map(irule)
+            tf = traits.LocusAlleleTraitFactory(config)
+            lf = pop.SquareLatticeFactory(config)
+            p = pop.ArrayTraitStructurePopulation(config,lf,tf)
+
+            constructed = utils.construct_rule_objects(parsed,p)
+            p.interaction_rules = constructed
+
+            p.initialize_population()
+            innovation_rule = rules.InfiniteAllelesMutationRule(p)
+            d = dynamics.MoranDynamics(config, p, innovation_rule)
+
+            trackers = []
+            analyzers = []
+            # the second analyzer's averagers are given full samples on every tick, as a reference
+            for record_changes in [True, False]:
+                sta = analysis.PiecewiseConstantTimeAverager(300, intervals, config.popsize, config.num_features, ending_interval=False)
+                eta = analysis.PiecewiseConstantTimeAverager(500, intervals, config.popsize, config.num_features, ending_interval=True)
+                sta.records_trait_count_changes = record_changes
+                eta.records_trait_count_changes = record_changes
+                trackers.append((sta, eta))
+                analyzers.append(analysis.TimeAveragedPopulationTraitAnalyzer(p,sta,eta))
+            if reference_first:
+                analyzers.reverse()
+
+            timestep = 0
+            while timestep < 800:
+                timestep = d.update()
+                for tfa in analyzers:
+                    tfa.update(timestep)
+
+            for (ta, reference) in zip(trackers[0], trackers[1]):
+                counts = ta.get_counts_for_generation_intervals()
+                self.assertEqual(counts, reference.get_counts_for_generation_intervals())
+                self.assertEqual(ta.get_configuration_counts_for_generation_intervals(),
+                                 reference.get_configuration_counts_for_generation_intervals())
+                for interval in intervals:
+                    for locus in xrange(0, config.num_features):
+                        self.assertEqual(sum(counts[interval][locus].values()), config.popsize ** 2 * interval)
+
+
+    def test_ta_report(self):
+        log.info("test_ta_report")
+
+        config = utils.MixtureConfiguration(self.filename)
+        config.popsize = 25
+        config.num_features = 3
+        config.num_traits = 10
+        config.innovation_rate = 0.05
+        irule = config.INTERACTION_RULE_CLASS
+        parsed = utils.parse_interaction_rule_map(irule)
+
+        tf = traits.LocusAlleleTraitFactory(config)
+        lf = pop.SquareLatticeFactory(config)
+        p = pop.FixedTraitStructurePopulation(config,lf,tf)
+
+        constructed = utils.construct_rule_objects(parsed,p)
+        p.interaction_rules = constructed
+
+        p.initialize_population()
+        innovation_rule = rules.InfiniteAllelesMutationRule(p)
+        d = dynamics.MoranDynamics(config, p, innovation_rule)
+
+        intervals = [2,5]
+        sta = analysis.PiecewiseConstantTimeAverager(100, intervals, config.popsize, config.num_features, ending_interval=False)
+        eta = analysis.PiecewiseConstantTimeAverager(200, intervals, config.popsize, config.num_features, ending_interval=True)
+        tfa = analysis.TimeAveragedPopulationTraitAnalyzer(p,sta,eta)
+
+        timestep = 0
+        while timestep < 400:
+            timestep = d.update()
+            tfa.update(timestep)
+
+        # the getters share one cached report, until the next update
+        report = tfa.compute_ta_report()
+        self.assertTrue(tfa.compute_ta_report() is report)
+        self.assertTrue(tfa.get_ta_trait_richness() is report['trait_richness'])
+
+        for interval in intervals:
+            for locus in xrange(0, config.num_features):
+                freqs = tfa.get_ta_trait_frequencies()[str(interval)][str(locus)]
+                self.assertAlmostEqual(sum(freqs.values()), 1.0)
+                self.assertEqual(tfa.get_ta_trait_richness()[str(interval)][str(locus)], len(freqs))
+                self.assertAlmostEqual(tfa.get_ta_trait_evenness_entropy()[str(interval)][str(locus)],
+                                       analysis.diversity_shannon_entropy(freqs.values()))
+            self.assertEqual(tfa.get_ta_number_configurations()[str(interval)],
+                             len(tfa.get_ta_unlabeled_configuration_counts()[str(interval)]))
+
+        tfa.update(d.update())
+        self.assertFalse(tfa.compute_ta_report() is report)
+
+
+    def test_ta_rarefaction(self):
+        log.info("test_ta_rarefaction")
+
+        config = utils.MixtureConfiguration(self.filename)
+        config.popsize = 25
+        config.num_features = 3
+        config.num_traits = 10
+        config.innovation_rate = 0.05
+        parsed = utils.parse_interaction_rule_map(config.INTERACTION_RULE_CLASS)
+
+        tf = traits.LocusAlleleTraitFactory(config)
+        lf = pop.SquareLatticeFactory(config)
+        p = pop.FixedTraitStructurePopulation(config,lf,tf)
+        p.interaction_rules = utils.construct_rule_objects(parsed,p)
+        p.initialize_population()
+        d = dynamics.MoranDynamics(config, p, rules.InfiniteAllelesMutationRule(p))
+
+        intervals = [2,5]
+        sta = analysis.PiecewiseConstantTimeAverager(100, intervals, config.popsize, config.num_features, ending_interval=False)
+        eta = analysis.PiecewiseConstantTimeAverager(200, intervals, config.popsize, config.num_features, ending_interval=True)
+        tfa = analysis.TimeAveragedRarefactionTraitAnalyzer(p,sta,eta)
+
+        timestep = 0
+        while timestep < 400:
+            timestep = d.update()
+            tfa.update(timestep)
+        tfa.take_sample_snapshot()
+
+        # expectations over the same axes as the sampled statistics, computed from the time averaged counts
+        counts = eta.get_counts_for_generation_intervals()
+        richness = tfa.get_ta_trait_richness()
+        self.assertEqual(richness.axes, ('interval', 'locus', 'ssize'))
+        self.assertEqual(tfa.get_ta_number_configurations().axes, ('interval', 'ssize'))
+        self.assertEqual(tfa.get_ta_slatkin_exact_probability().axes, richness.axes)
+        for interval in intervals:
+            for locus in xrange(0, config.num_features):
+                expected = analysis.expected_richness(counts[interval][locus].values(), tfa.ssize_list)
+                self.assertEqual(list(richness.select(interval=interval, locus=locus)), expected.tolist())
 
 
 